@@ -0,0 +1,120 @@
+"""Response times of the sales analytics endpoint over a large sales table.
+
+Seeds --sales sales over two years, then times representative queries
+cold (computed) and warm (from the cache).
+
+    python -m benchmarks.analytics --sales 10000000
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+
+from pharmacy.models import Medicine, PharmacyUser, Role, Sale
+
+DAYS = 730
+
+
+def seed(medicines, sales, cashiers):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:04}', item_description=f'Medicine {i + 1}', quantity=1000,
+                displayed_quantity=20, unit_price=1 + i % 50, selling_price=2 + i % 50 * 1.3,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    role = Role.objects.create(name='cashier', description='Cashier')
+    PharmacyUser.objects.bulk_create(PharmacyUser(username=f'cashier{i}', role=role) for i in range(cashiers))
+    user_ids = list(PharmacyUser.objects.values_list('pk', flat=True))
+
+    rng = np.random.default_rng(0)
+    end = datetime.now(dt_timezone.utc).timestamp()
+    sql = (f'INSERT INTO {Sale._meta.db_table} (uuid, medicine_id, quantity, total_price, created_by_id, '
+           f'created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s)')
+    chunk = 200000
+    for start in range(0, sales, chunk):
+        size = min(chunk, sales - start)
+        # Popular medicines sell far more often than the tail.
+        picks = np.minimum(rng.zipf(1.3, size=size), medicines)
+        quantities = rng.integers(1, 4, size=size)
+        stamps = np.sort(end - rng.random(size) * DAYS * 86400)
+        cashier = rng.integers(0, len(user_ids), size=size)
+        rows = [
+            (uuid.uuid4().hex, int(m), int(q), f'{int(q) * (2 + (int(m) - 1) % 50 * 1.3):.2f}', user_ids[c],
+             when, when)
+            for m, q, c, when in zip(
+                picks, quantities, cashier,
+                (datetime.fromtimestamp(s, dt_timezone.utc).isoformat(' ').replace('+00:00', '') for s in stamps),
+            )
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    call_command('rebuild_sales_rollup', stdout=io.StringIO())
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    admin = PharmacyUser.objects.create_user('admin', password='admin', role=Role.objects.create(name='admin'))
+    return admin
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=10000000)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--cashiers', type=int, default=40)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    admin = seed(args.medicines, args.sales, args.cashiers)
+    print(f'seeded {Sale.objects.count()} sales in {time.perf_counter() - started:.0f}s')
+
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(admin)
+    today = date.today()
+    month = today.replace(day=1).isoformat()
+    year = f'{(today - timedelta(days=364)).isoformat()}&end_date={today.isoformat()}'
+    queries = [
+        ('top 20 medicines, 1 year', f'start_date={year}&group=medicine&top=20'),
+        ('medicine x month, 1 year', f'start_date={year}&period=month&group=medicine'),
+        ('daily totals, 1 year', f'start_date={year}&period=day'),
+        ('cashier x day, this month', f'start_date={month}&period=day&group=cashier'),
+        ('top 20 cashier x medicine by margin, this month',
+         f'start_date={month}&group=cashier&group=medicine&order=margin&top=20'),
+        ('cashier x week, 1 year', f'start_date={year}&period=week&group=cashier'),
+    ]
+    for label, query in queries:
+        timings = []
+        for attempt in range(2):
+            started = time.perf_counter()
+            response = client.get(f'/sales/analytics/?{query}')
+            timings.append((time.perf_counter() - started) * 1000)
+        body = response.json()
+        print(f'{label:<50} {body["source"]:<7} {len(body["rows"]):>6} rows  '
+              f'cold {timings[0]:7.0f} ms  cached {timings[1]:5.1f} ms')
+        cache.clear()
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
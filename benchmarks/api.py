@@ -0,0 +1,124 @@
+"""Serialized rows per second for large JSON API pages.
+
+Pages through /api/sales/ with 100k-row pages, and compares that with
+building model instances for the same rows and encoding those.
+
+    python -m benchmarks.api --sales 300000 --page-size 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('PHARMACY_API_MAX_PAGE_SIZE', '100000')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import Client
+
+from pharmacy.api import RESOURCES
+from pharmacy.models import ApiToken, Medicine, PharmacyUser, Role, Sale
+
+
+def seed(medicines, sales):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:03}', item_description=f'Medicine {i + 1}', quantity=1000,
+                displayed_quantity=20, unit_price=1, selling_price=2,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    rng = np.random.default_rng(0)
+    picks = rng.integers(1, medicines + 1, size=sales)
+    quantities = rng.integers(1, 4, size=sales)
+    for start in range(0, sales, 10000):
+        Sale.objects.bulk_create(
+            Sale(medicine_id=int(m), quantity=int(q), total_price=int(q) * 2)
+            for m, q in zip(picks[start:start + 10000], quantities[start:start + 10000])
+        )
+    admin = PharmacyUser.objects.create_user(
+        'admin', password='admin', role=Role.objects.create(name='admin', description='Administrator'),
+    )
+    return ApiToken.issue(admin, 'benchmark')[1]
+
+
+def page_through(client, token, page_size):
+    url = f'/api/sales/?limit={page_size}'
+    rows = pages = size = elapsed = 0
+    while url:
+        started = time.perf_counter()
+        response = client.get(url, headers={'Authorization': f'Token {token}'})
+        elapsed += time.perf_counter() - started
+        page = json.loads(response.content)
+        rows += len(page['results'])
+        pages += 1
+        size += len(response.content)
+        url = page['next']
+    return rows, pages, size, elapsed
+
+
+def model_instances(page_size):
+    # What a serializer working from model instances would do per page.
+    fields = RESOURCES['sales'].fields
+    rows, last = 0, 0
+    started = time.perf_counter()
+    while True:
+        sales = list(Sale.objects.filter(pk__gt=last).order_by('pk')[:page_size])
+        if not sales:
+            return rows, time.perf_counter() - started
+        json.dumps([
+            {'id': sale.pk, **{name: getattr(sale, Sale._meta.get_field(name).attname) for name in fields}}
+            for sale in sales
+        ], cls=DjangoJSONEncoder)
+        rows += len(sales)
+        last = sales[-1].pk
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=300000)
+    parser.add_argument('--medicines', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    token = seed(args.medicines, args.sales)
+    client = Client(HTTP_HOST='localhost')
+    page_through(client, token, args.page_size)  # warm the page cache
+
+    rows, pages, size, elapsed = page_through(client, token, args.page_size)
+    print(f'/api/sales/:          {rows} rows in {pages} pages, {elapsed:.2f}s '
+          f'({rows / elapsed:,.0f} rows/s, {size / rows:.0f} bytes/row)')
+
+    url = f'/api/sales/?limit={args.page_size}&fields=medicine,quantity'
+    started = time.perf_counter()
+    response = client.get(url, headers={'Authorization': f'Token {token}'})
+    elapsed = time.perf_counter() - started
+    sparse = len(json.loads(response.content)['results'])
+    print(f'?fields=medicine,quantity: {sparse} rows in {elapsed:.2f}s ({sparse / elapsed:,.0f} rows/s)')
+
+    started = time.perf_counter()
+    response = client.get(url, headers={'Authorization': f'Token {token}', 'If-None-Match': response['ETag']})
+    print(f'unchanged page (304):  {(time.perf_counter() - started) * 1000:.0f} ms, status {response.status_code}')
+
+    rows, elapsed = model_instances(args.page_size)
+    print(f'model instances:       {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""What archiving old sales buys: checkout and reports against a small Sale table.
+
+Seeds --history sales spread over the last --years years, then times
+recording sales, a sales report for last month and for a month past the
+horizon, and a day's receipt reprint; archives everything older than
+ARCHIVE_AFTER_DAYS, reporting the rate and the longest chunk transaction
+(how long checkout could wait for the write lock); and times the same
+again, with the Sale and ArchivedSale sizes on disk where SQLite has dbstat.
+
+    python -m benchmarks.archive --history 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from pharmacy import archive
+from pharmacy.models import ArchivedSale, Medicine, PharmacyUser, Role, Sale
+
+
+def stamp(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc).isoformat(' ').replace('+00:00', '')
+
+
+def seed(medicines, history, years):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:04}', item_description=f'Medicine {i + 1}', quantity=10 ** 9,
+                displayed_quantity=20, unit_price=1 + i % 50, selling_price=2 + i % 50,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    admin = PharmacyUser.objects.create_user('admin', password='admin', role=Role.objects.create(name='admin'))
+    rng = np.random.default_rng(0)
+    end = timezone.now().timestamp()
+    sql = (f'INSERT INTO {Sale._meta.db_table} (uuid, medicine_id, quantity, total_price, unit_cost, '
+           f'created_by_id, created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)')
+    for start in range(0, history, 200000):
+        size = min(200000, history - start)
+        picks = rng.integers(1, medicines + 1, size=size)
+        stamps = np.sort(end - rng.random(size) * years * 365 * 86400)
+        rows = [
+            (uuid.uuid4().hex, int(m), 1, f'{2 + (int(m) - 1) % 50}', f'{1 + (int(m) - 1) % 50}', admin.pk,
+             when, when)
+            for m, when in zip(picks, map(stamp, stamps))
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return admin
+
+
+def timed(label, function, per=None):
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    detail = f'  ({elapsed / per * 1000:.2f} ms each)' if per else ''
+    print(f'{label:<50} {elapsed * 1000:10.1f} ms{detail}')
+    return result
+
+
+def sizes():
+    tables = {model._meta.db_table: model for model in (Sale, ArchivedSale)}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tbl_name, name FROM sqlite_schema WHERE type IN (\'table\', \'index\')')
+            owners = {name: table for table, name in cursor.fetchall() if table in tables}
+            cursor.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name')
+            pages = cursor.fetchall()
+    except OperationalError:
+        return
+    totals = {}
+    for name, size in pages:
+        if name in owners:
+            totals.setdefault(owners[name], [0, 0])[name != owners[name]] += size
+    for table, (data, indexes) in sorted(totals.items()):
+        print(f'  {table:<30} table {data / 2 ** 20:8.1f} MB  indexes {indexes / 2 ** 20:8.1f} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--history', type=int, default=2000000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--sales', type=int, default=2000, help='Sales recorded per round')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    admin = seed(args.medicines, args.history, args.years)
+    print(f'seeded {Sale.objects.count()} sales in {time.perf_counter() - started:.0f}s')
+
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(admin)
+    medicines = list(Medicine.objects.order_by('?')[:200])
+    picks = np.random.default_rng(1).integers(0, len(medicines), size=args.sales)
+    today = timezone.localdate()
+    last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    old_month = (today - timedelta(days=settings.ARCHIVE_AFTER_DAYS + 200)).replace(day=1)
+
+    def month(first):
+        end = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return {'start_date': first.isoformat(), 'end_date': end.isoformat()}
+
+    def measure(label):
+        print(f'-- {label}: {Sale.objects.count()} sales in Sale, {ArchivedSale.objects.count()} archived')
+        timed(f'{args.sales} sales recorded', lambda: [
+            Sale.objects.create(medicine=medicines[i], quantity=1, created_by=admin, total_price=0) for i in picks
+        ], per=args.sales)
+        for name, first in [('last month', last_month), ('a month past the horizon', old_month)]:
+            response = timed(f'sales report, {name}', lambda: client.get('/sales/report/', month(first)))
+            assert response.status_code == 200
+        timed("reprint of yesterday's receipts, text", lambda: sum(len(chunk) for chunk in client.get(
+            '/sales/receipts/', {'start_date': today - timedelta(days=1), 'end_date': today - timedelta(days=1),
+                                 'format': 'text'}).streaming_content))
+        sizes()
+
+    measure('before archiving')
+    chunks = []
+
+    def progress(moved):
+        now = time.perf_counter()
+        chunks.append(now - progress.last)
+        progress.last = now
+
+    progress.last = time.perf_counter()
+    moved = timed('archive', lambda: archive.archive(progress=progress))
+    print(f'  {moved} sales in {len(chunks)} chunks of {settings.ARCHIVE_CHUNK_SIZE}, '
+          f'{moved / sum(chunks):.0f} sales/s, longest chunk {max(chunks) * 1000:.1f} ms')
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute('ANALYZE')
+    measure('after archiving and VACUUM')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
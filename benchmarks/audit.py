@@ -0,0 +1,104 @@
+"""Checkout latency with the audit trail off, buffered, and written inline.
+
+Posts --sales sales through the sale form, rotating the three modes in
+rounds so they see the same database: auditing disconnected; the default,
+buffered and written by the background thread; and written by each
+checkout's own commit (AUDIT_FLUSH_INTERVAL=0, AUDIT_BATCH_SIZE=1), as a
+synchronous audit insert would be. Every checkout changes stock, so every
+audited one makes an entry.
+
+    python -m benchmarks.audit --sales 3000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, override_settings
+
+from pharmacy import audit
+from pharmacy.models import AuditEntry, Medicine, PharmacyUser, Role, Sale
+
+MODES = {
+    'off': {},
+    'buffered, background thread': {},
+    'written at each commit': {'AUDIT_FLUSH_INTERVAL': 0, 'AUDIT_BATCH_SIZE': 1},
+}
+
+
+def seed(medicines):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        Medicine(
+            code=f'HM-{i + 1:04}', item_description=f'Medicine {i + 1}', quantity=10 ** 6, displayed_quantity=20,
+            unit_price=1 + i % 50, selling_price=2 + i % 50, expiry_date=date.today() + timedelta(days=365),
+        )
+        for i in range(medicines)
+    )
+    return PharmacyUser.objects.create_user('cashier', role=Role.objects.create(name='cashier'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=3000, help='Checkouts per mode')
+    parser.add_argument('--medicines', type=int, default=500)
+    parser.add_argument('--round', type=int, default=100, help='Checkouts per mode before switching')
+    args = parser.parse_args()
+
+    cashier = seed(args.medicines)
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(cashier)
+    medicine_ids = list(Medicine.objects.values_list('pk', flat=True))
+    timings = {mode: [] for mode in MODES}
+    entries = {mode: 0 for mode in MODES}
+
+    def checkout(i):
+        started = time.perf_counter()
+        response = client.post('/sales/add/', {'medicine': medicine_ids[i % len(medicine_ids)], 'quantity': 1,
+                                               'total_price': 0})
+        elapsed = (time.perf_counter() - started) * 1000
+        assert response.status_code == 302, response.status_code
+        # A browser shows the success message on the page it is sent to;
+        # unread, they would pile up in the cookie and then the session.
+        client.cookies.pop('messages', None)
+        return elapsed
+
+    for i in range(50):
+        checkout(i)
+    audit.flush()
+    warm = AuditEntry.objects.count()
+    for start in range(0, args.sales, args.round):
+        for mode, overrides in MODES.items():
+            if mode == 'off':
+                audit.disconnect()
+            with override_settings(**overrides):
+                audit.flush()
+                before = AuditEntry.objects.count()
+                timings[mode].extend(checkout(start + i) for i in range(min(args.round, args.sales - start)))
+                audit.flush()
+                entries[mode] += AuditEntry.objects.count() - before
+            audit.connect()
+
+    for mode, values in timings.items():
+        values.sort()
+        print(f'{mode:<30} mean {statistics.mean(values):6.2f} ms  p50 {values[len(values) // 2]:6.2f} ms  '
+              f'p95 {values[int(len(values) * 0.95)]:6.2f} ms  p99 {values[int(len(values) * 0.99)]:6.2f} ms  '
+              f'{entries[mode]} entries')
+    assert AuditEntry.objects.count() - warm == sum(entries.values()) == args.sales * 2
+    assert Sale.objects.count() == 50 + args.sales * len(MODES)
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Time branch-scoped stock reads and transfers over many branches.
+
+    python -m benchmarks.branches --branches 50 --medicines 20000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+
+from pharmacy import branches
+from pharmacy.models import Branch, BranchStock, Medicine
+
+
+def seed(branch_count, medicines):
+    call_command('migrate', verbosity=0)
+    rng = np.random.default_rng(0)
+    expiry = date.today() + timedelta(days=365)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:03}', item_description=f'Medicine {i + 1}', quantity=0,
+                displayed_quantity=20, unit_price=1, selling_price=2, expiry_date=expiry,
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    Branch.objects.bulk_create(Branch(code=f'B{i:02}', name=f'Branch {i:02}') for i in range(branch_count))
+    sql = (f'INSERT INTO {BranchStock._meta.db_table} (branch_id, medicine_id, quantity, updated_at) '
+           f'VALUES (%s, %s, %s, CURRENT_TIMESTAMP)')
+    with transaction.atomic(), connection.cursor() as cursor:
+        for branch_id in range(1, branch_count + 1):
+            quantities = rng.integers(0, 200, size=medicines)
+            cursor.executemany(sql, [(branch_id, i + 1, int(q)) for i, q in enumerate(quantities)])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--branches', type=int, default=50)
+    parser.add_argument('--medicines', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    seed(args.branches, args.medicines)
+    branch_list = list(Branch.objects.order_by('pk'))
+    branch = branch_list[len(branch_list) // 2]
+    stock = BranchStock.objects.filter(branch=branch)
+
+    print('plan:', stock.values('quantity').explain())
+    # Make sure every transfer below has stock to move.
+    BranchStock.objects.filter(branch=branch_list[0]).update(quantity=F('quantity') + 1000)
+
+    rng = np.random.default_rng(1)
+    medicine_ids = rng.integers(1, args.medicines + 1, size=args.repeat * 2)
+    medicines = Medicine.objects.in_bulk(medicine_ids.tolist())
+    picks = iter(medicine_ids.tolist())
+
+    results = {
+        'branch stock page (values)': timed(
+            lambda: list(stock.values(
+                'quantity', 'medicine__code', 'medicine__item_description', 'medicine__quantity',
+                'medicine__displayed_quantity', 'medicine__expiry_date', 'medicine__is_expired',
+            ).order_by('medicine__code')), args.repeat),
+        'branch stock page (models)': timed(
+            lambda: list(stock.select_related('medicine').order_by('medicine__code')), args.repeat),
+        'branch low-stock count': timed(
+            lambda: stock.filter(quantity__lte=F('medicine__displayed_quantity')).count(), args.repeat),
+        'single-row sale decrement': timed(
+            lambda: BranchStock.remove(branch.pk, next(picks), 1), args.repeat),
+        'transfer': timed(
+            lambda: branches.transfer(medicines[next(picks)], branch_list[0], branch_list[1], 1), args.repeat),
+    }
+    print(f'{args.branches} branches x {args.medicines} medicines ({args.branches * args.medicines} stock rows)')
+    for label, (median, worst) in results.items():
+        print(f'{label:<28} median {median:8.2f} ms   max {worst:8.2f} ms')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
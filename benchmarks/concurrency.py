@@ -0,0 +1,94 @@
+"""Throughput and latency of `manage.py serve` against `manage.py runserver`.
+
+Each server is started as a subprocess with DEBUG off, then hammered by N
+client threads that each keep one HTTP/1.1 connection open:
+
+    python -m benchmarks.concurrency --clients 1 8 32 --seconds 5
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+SERVERS = {
+    'runserver': ['runserver', '--noreload', '--skip-checks'],
+    'serve (1 x 8 threads)': ['serve', '--threads', '8'],
+    'serve (4 x 8 threads)': ['serve', '--threads', '8', '--processes', '4'],
+}
+
+
+def start(command, port):
+    args = [sys.executable, 'manage.py'] + command
+    args += ['--port', str(port)] if command[0] == 'serve' else [str(port)]
+    env = dict(os.environ, DJANGO_DEBUG='False')
+    process = subprocess.Popen(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/login/')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{command[0]} did not start')
+
+
+def client(port, path, stop_at, latencies):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            connection.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def run(port, path, clients, seconds):
+    latencies = []
+    stop_at = time.monotonic() + seconds
+    threads = [threading.Thread(target=client, args=(port, path, stop_at, latencies)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        'rps': len(latencies) / seconds,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--path', default='/login/')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'server':<24} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, command in SERVERS.items():
+        process = start(command, args.port)
+        try:
+            for clients in args.clients:
+                result = run(args.port, args.path, clients, args.seconds)
+                print(f"{name:<24} {clients:>7} {result['rps']:>8.0f} {result['p50']:>8.1f} {result['p95']:>8.1f}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
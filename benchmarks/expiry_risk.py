@@ -0,0 +1,73 @@
+"""Time `expiry.expiry_risk()` over a large catalogue.
+
+    python -m benchmarks.expiry_risk --medicines 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from pharmacy import expiry
+from pharmacy.models import DailySales, Medicine
+
+
+def seed(medicines, density):
+    call_command('migrate', verbosity=0)
+    rng = np.random.default_rng(0)
+    today = date.today()
+    expires_in = rng.integers(-60, 1000, size=medicines)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:03}', item_description=f'Medicine {i + 1}',
+                quantity=int(rng.integers(0, 500)), unit_price=float(rng.integers(1, 500)),
+                selling_price=1, expiry_date=today + timedelta(days=int(expires_in[i])),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    sql = (f'INSERT INTO {DailySales._meta.db_table} (medicine_id, date, quantity, amount, cost) '
+           f'VALUES (%s, %s, %s, 0, 0)')
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(settings.EXPIRY_VELOCITY_DAYS):
+            day = (today - timedelta(days=offset)).isoformat()
+            ids = np.flatnonzero(rng.random(medicines) < density) + 1
+            cursor.executemany(sql, [(int(i), day, int(rng.integers(1, 10))) for i in ids])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--medicines', type=int, default=100000)
+    parser.add_argument('--density', type=float, default=0.2,
+                        help='Chance that a medicine sells on a given day')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    seed(args.medicines, args.density)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        rows, totals = expiry.expiry_risk()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{args.medicines} medicines, {totals['medicines']} at risk, ETB {totals['value']:,.2f}")
+    print(f'expiry_risk(): median {statistics.median(timings):.0f} ms, max {max(timings):.0f} ms')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
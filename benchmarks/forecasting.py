@@ -0,0 +1,86 @@
+"""Time `forecasting.forecast()` on a large synthetic catalogue.
+
+Fills a throw-away SQLite file with N medicines and a daily sales rollup
+covering D days, where each medicine sells on a given day with probability
+--density:
+
+    python -m benchmarks.forecasting --medicines 50000 --days 730 --density 0.1
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from pharmacy import forecasting
+from pharmacy.models import DailySales, Medicine
+
+
+def seed(medicines, days, density):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i:03}', item_description=f'Medicine {i}', unit_price=1,
+                selling_price=2, expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(1, medicines + 1)
+        ),
+        batch_size=5000,
+    )
+    rng = np.random.default_rng(0)
+    end = date.today() - timedelta(days=1)
+    # Bypass the ORM: millions of rollup rows are only seeding, not what is measured.
+    table = DailySales._meta.db_table
+    sql = f'INSERT INTO {table} (medicine_id, date, quantity, amount, cost) VALUES (%s, %s, %s, %s, 0)'
+    rows = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(days):
+            day = (end - timedelta(days=offset)).isoformat()
+            ids = np.flatnonzero(rng.random(medicines) < density) + 1
+            quantities = rng.poisson(3, size=len(ids)) + 1
+            cursor.executemany(sql, [(int(i), day, int(q), int(q) * 2) for i, q in zip(ids, quantities)])
+            rows += len(ids)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--medicines', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--density', type=float, default=0.1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = seed(args.medicines, args.days, args.density)
+    print(f'seeded {args.medicines} medicines, {rows} rollup rows in {time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    ids, matrix = forecasting.demand_matrix(args.days)
+    loaded = time.perf_counter()
+    forecasting.moving_average(matrix, settings.FORECAST_WINDOW_DAYS)
+    forecasting.exponential_smoothing(matrix, settings.FORECAST_ALPHA)
+    computed = time.perf_counter()
+    print(f'load {matrix.shape[0]}x{matrix.shape[1]} matrix: {loaded - started:.2f}s')
+    print(f'moving average + smoothing:      {computed - loaded:.3f}s')
+
+    started = time.perf_counter()
+    forecasting.forecast(history_days=args.days)
+    print(f'forecast() end to end incl. store: {time.perf_counter() - started:.2f}s')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
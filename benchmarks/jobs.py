@@ -0,0 +1,64 @@
+"""Throughput of the DB-backed job queue.
+
+Enqueues N no-op-sized jobs (expired session purges on an empty table), then
+drains them with `run_workers --burst` at several process counts:
+
+    python -m benchmarks.jobs --jobs 2000 --processes 1 2 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+
+from pharmacy import jobs
+from pharmacy.models import Job
+
+
+def drain(processes):
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, 'manage.py', 'run_workers', '--burst', '--processes', str(processes)],
+        env=dict(os.environ, DJANGO_DEBUG='False'),
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    print(f"{'processes':>9} {'enqueue/s':>10} {'jobs/s':>8} {'failed':>6} {'workers used':>12}")
+    for processes in args.processes:
+        Job.objects.all().delete()
+        started = time.perf_counter()
+        for _ in range(args.jobs):
+            jobs.enqueue('purge_sessions')
+        enqueue_rate = args.jobs / (time.perf_counter() - started)
+        # Includes interpreter and Django start-up of the command, as a cron
+        # or service manager would see it.
+        elapsed = drain(processes)
+        done = Job.objects.filter(status=Job.SUCCEEDED).count()
+        failed = Job.objects.exclude(status=Job.SUCCEEDED).count()
+        workers = Job.objects.values('worker').distinct().count()
+        print(f'{processes:>9} {enqueue_rate:>10.0f} {done / elapsed:>8.0f} {failed:>6} {workers:>12}')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
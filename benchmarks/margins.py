@@ -0,0 +1,154 @@
+"""Backfilling sale costs and reporting margins over a large sales table.
+
+Seeds --sales sales over two years without a unit cost, as recorded
+before costs were kept, plus a monthly inventory receipt per medicine at
+drifting prices. Then times backfill_sale_cost, the rollup rebuild after
+it, and margin queries answered in SQL; one month is also summed sale by
+sale in Python for comparison.
+
+    python -m benchmarks.margins --sales 5000000
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from pharmacy import analytics
+from pharmacy.models import Medicine, MedicineInventory, PharmacyUser, Role, Sale
+
+DAYS = 730
+
+
+def stamp(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc).isoformat(' ').replace('+00:00', '')
+
+
+def seed(medicines, sales, cashiers):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:04}', item_description=f'Medicine {i + 1}', quantity=1000,
+                displayed_quantity=20, unit_price=1 + i % 50, selling_price=2 + i % 50 * 1.3,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    role = Role.objects.create(name='cashier', description='Cashier')
+    PharmacyUser.objects.bulk_create(PharmacyUser(username=f'cashier{i}', role=role) for i in range(cashiers))
+    user_ids = list(PharmacyUser.objects.values_list('pk', flat=True))
+
+    rng = np.random.default_rng(0)
+    end = datetime.now(dt_timezone.utc).timestamp()
+    # A receipt per medicine every 30 days, its price drifting around the list price.
+    receipts = [
+        (m + 1, 100, f'{(1 + m % 50) * drift:.2f}', f'{(1 + m % 50) * drift * 100:.2f}',
+         stamp(end - DAYS * 86400 + month * 30 * 86400), stamp(end - DAYS * 86400 + month * 30 * 86400))
+        for m in range(medicines)
+        for month, drift in enumerate(rng.uniform(0.8, 1.2, size=DAYS // 30))
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {MedicineInventory._meta.db_table} (medicine_id, quantity, unit_price, total_price, '
+            f'created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s)',
+            receipts,
+        )
+
+    sql = (f'INSERT INTO {Sale._meta.db_table} (uuid, medicine_id, quantity, total_price, created_by_id, '
+           f'created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s)')
+    chunk = 200000
+    for start in range(0, sales, chunk):
+        size = min(chunk, sales - start)
+        # Popular medicines sell far more often than the tail.
+        picks = np.minimum(rng.zipf(1.3, size=size), medicines)
+        quantities = rng.integers(1, 4, size=size)
+        stamps = np.sort(end - rng.random(size) * DAYS * 86400)
+        cashier = rng.integers(0, len(user_ids), size=size)
+        rows = [
+            (uuid.uuid4().hex, int(m), int(q), f'{int(q) * (2 + (int(m) - 1) % 50 * 1.3):.2f}', user_ids[c],
+             when, when)
+            for m, q, c, when in zip(picks, quantities, cashier, map(stamp, stamps))
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f'{label:<55} {time.perf_counter() - started:8.2f} s')
+    return result
+
+
+def python_margins(start, end):
+    margins = {}
+    sales = Sale.objects.filter(
+        created_at__gte=analytics.day_start(start), created_at__lt=analytics.day_start(end + timedelta(days=1)),
+    ).select_related('medicine', 'created_by')
+    for sale in sales.iterator(chunk_size=2000):
+        key = (sale.medicine.code, sale.created_by.username)
+        margins[key] = margins.get(key, Decimal(0)) + sale.total_price - sale.quantity * sale.unit_cost
+    return sorted(margins.items(), key=lambda item: item[1], reverse=True)[:20]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=5000000)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--cashiers', type=int, default=40)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.medicines, args.sales, args.cashiers)
+    print(f'seeded {Sale.objects.count()} sales and {MedicineInventory.objects.count()} receipts '
+          f'in {time.perf_counter() - started:.0f}s')
+
+    filled = timed(f'backfill unit cost, batches of {args.batch_size}',
+                   lambda: analytics.backfill_unit_cost(args.batch_size))
+    assert filled == args.sales and not Sale.objects.filter(unit_cost__isnull=True).exists()
+    timed('rebuild sales rollups', lambda: call_command('rebuild_sales_rollup', stdout=io.StringIO()))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    today = date.today()
+    month, year = today.replace(day=1), today - timedelta(days=364)
+    queries = [
+        ('top 20 medicines by margin, 1 year', dict(start=year, group=['medicine'], order='margin', top=20)),
+        ('margin per month, 1 year', dict(start=year, period='month')),
+        ('margin per medicine per month, 1 year', dict(start=year, period='month', group=['medicine'])),
+        ('margin per cashier per week, 1 year', dict(start=year, period='week', group=['cashier'])),
+        ('top 20 medicine x cashier by margin, this month',
+         dict(start=month, group=['medicine', 'cashier'], order='margin', top=20)),
+    ]
+    for label, params in queries:
+        start = params.pop('start')
+        result = timed(label, lambda: analytics.compute(start, today, **params))
+        assert result['totals']['margin'] > 0
+    top = timed('top 20 medicine x cashier, this month, summed in Python', lambda: python_margins(month, today))
+    assert [margin for key, margin in top][0] == result['rows'][0]['margin']
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Page weight of the shared layout assets, first visit vs. repeat visit.
+
+Run `python manage.py collectstatic --noinput` first, then:
+
+    python -m benchmarks.page_weight
+"""
+import os
+import re
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+django.setup()
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, override_settings
+
+ASSET_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+ENCODINGS = [('identity', ''), ('gzip', '.gz'), ('br', '.br')]
+
+
+def layout_assets():
+    request = RequestFactory().get('/')
+    html = render_to_string('pharmacy/base.html', request=request)
+    return ASSET_RE.findall(html)
+
+
+def asset_sizes(url):
+    path = settings.STATIC_ROOT / url.split('/static/', 1)[1]
+    sizes = {}
+    for encoding, suffix in ENCODINGS:
+        variant = path.with_name(path.name + suffix)
+        sizes[encoding] = variant.stat().st_size if variant.exists() else None
+    return sizes
+
+
+def time_asset(client, url, encoding, repeat=50):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        b''.join(response.streaming_content)
+        response.close()
+    return (time.perf_counter() - start) / repeat * 1000, response
+
+
+@override_settings(DEBUG=False)
+def main():
+    client = Client()
+    totals = {encoding: 0 for encoding, _ in ENCODINGS}
+    print(f"{'asset':<66} {'raw':>9} {'gzip':>9} {'br':>9} {'ms (br)':>8}  cache-control")
+    for url in layout_assets():
+        sizes = asset_sizes(url)
+        ms, response = time_asset(client, url, 'br')
+        for encoding, size in sizes.items():
+            totals[encoding] += size or sizes['identity']
+        print(f"{url:<66} {sizes['identity']:>9} {sizes['gzip'] or '-':>9} {sizes['br'] or '-':>9} "
+              f"{ms:>8.3f}  {response.get('Cache-Control')}")
+    print(f"{'first visit total':<66} {totals['identity']:>9} {totals['gzip']:>9} {totals['br']:>9}")
+    print('repeat visit: 0 asset requests (hashed URLs are served as immutable)')
+
+
+if __name__ == '__main__':
+    main()
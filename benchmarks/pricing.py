@@ -0,0 +1,87 @@
+"""Time a catalogue-wide price update: summary, streamed preview and apply.
+
+Compares the set-based update with saving each medicine the way the edit
+form does, measured on a sample.
+
+    python -m benchmarks.pricing --medicines 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+
+from pharmacy import pricing
+from pharmacy.models import Medicine, PriceHistory, PriceUpdate
+
+CATEGORIES = ['Analgesics', 'Antibiotics', 'Antihistamines', 'Vitamins', 'Antacids']
+
+
+def seed(medicines):
+    call_command('migrate', verbosity=0)
+    rng = np.random.default_rng(0)
+    costs = rng.integers(10, 5000, size=medicines)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:06}', item_description=f'Medicine {i + 1}', category=CATEGORIES[i % len(CATEGORIES)],
+                quantity=100, displayed_quantity=20, unit_price=Decimal(int(cost)) / 100,
+                selling_price=Decimal(int(cost)) / 80, expiry_date=date.today() + timedelta(days=365),
+            )
+            for i, cost in enumerate(costs)
+        ),
+        batch_size=5000,
+    )
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f'{label:<32} {time.perf_counter() - started:7.2f}s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--medicines', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=2000, help='Medicines saved one by one for comparison')
+    args = parser.parse_args()
+
+    seed(args.medicines)
+    rule = PriceUpdate(markup_percent=Decimal('30'), rounding=Decimal('0.05'), categories=CATEGORIES[:4])
+    summary = timed('summary', lambda: pricing.summary(rule))
+    print(f'  {summary["medicines"]} prices changing')
+    lines = timed('streamed CSV preview', lambda: sum(1 for _ in pricing.preview_csv(rule)))
+    print(f'  {lines - 1} rows')
+    changed = timed('apply', lambda: pricing.apply(rule))
+    print(f'  {changed} changed, {PriceHistory.objects.count()} history rows')
+
+    factor = Decimal('1.35')
+
+    def save_each():
+        for medicine in Medicine.objects.order_by('pk')[:args.sample]:
+            medicine.selling_price = (medicine.unit_price * factor).quantize(pricing.CENT)
+            medicine.save()
+
+    started = time.perf_counter()
+    save_each()
+    elapsed = time.perf_counter() - started
+    print(f'{f"save() one by one, {args.sample}":<32} {elapsed:7.2f}s')
+    print(f'  extrapolated to {changed}: {elapsed * changed / args.sample:.1f}s')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
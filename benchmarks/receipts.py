@@ -0,0 +1,112 @@
+"""Receipts per second: single receipts, batch reprints, and the sale page.
+
+Seeds --sales sales on one day, then times rendering all of them from
+payloads as text, ESC/POS and PDF; the same as a streamed reprint through
+the view; single receipts through the view; and, for comparison, the
+full sale detail page that was the only way to show a sale before.
+
+    python -m benchmarks.receipts --sales 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+
+from pharmacy import receipts
+from pharmacy.models import Medicine, PharmacyUser, Role, Sale
+
+
+def seed(medicines, sales):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:04}', item_description=f'Medicine {i + 1} 500mg tablets', quantity=1000,
+                displayed_quantity=20, unit_price=1 + i % 50, selling_price=2 + i % 50,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    admin = PharmacyUser.objects.create_user('admin', password='admin', role=Role.objects.create(name='admin'))
+    rng = np.random.default_rng(0)
+    start = datetime.combine(date.today(), datetime.min.time(), dt_timezone.utc).timestamp()
+    stamps = np.sort(start + rng.random(sales) * 3600 * 12)
+    rows = [
+        (uuid.uuid4().hex, int(m), int(q), f'{int(q) * (2 + (int(m) - 1) % 50)}', admin.pk, when, when)
+        for m, q, when in zip(
+            rng.integers(1, medicines + 1, size=sales), rng.integers(1, 4, size=sales),
+            (datetime.fromtimestamp(s, dt_timezone.utc).isoformat(' ').replace('+00:00', '') for s in stamps),
+        )
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {Sale._meta.db_table} (uuid, medicine_id, quantity, total_price, created_by_id, '
+            f'created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+    return admin
+
+
+def timed(label, count, function):
+    started = time.perf_counter()
+    size = function()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<45} {count:>7} receipts {elapsed:7.2f} s {count / elapsed:9.0f}/s {size / count:7.0f} B each')
+
+
+def consume(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=100000)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--pages', type=int, default=500, help='Single receipts and sale pages to fetch')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    admin = seed(args.medicines, args.sales)
+    print(f'seeded {Sale.objects.count()} sales in {time.perf_counter() - started:.0f}s')
+
+    sales = Sale.objects.order_by('created_at', 'pk')
+    timed('payloads only', args.sales, lambda: sum(1 for receipt in receipts.payloads(sales)))
+    payloads = list(receipts.payloads(sales))
+    for format in receipts.FORMATS:
+        timed(f'render {format} from payloads', args.sales, lambda: consume(receipts.render(payloads, format)))
+
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(admin)
+    for format in receipts.FORMATS:
+        timed(f'reprint view, streamed {format}', args.sales,
+              lambda: consume(client.get(f'/sales/receipts/?format={format}').streaming_content))
+
+    pks = list(sales.values_list('pk', flat=True)[:args.pages])
+    timed('single receipt view, text', len(pks),
+          lambda: sum(len(client.get(f'/sales/{pk}/receipt/').content) for pk in pks))
+    timed('single receipt view, pdf', len(pks),
+          lambda: sum(len(client.get(f'/sales/{pk}/receipt/?format=pdf').content) for pk in pks))
+    timed('sale detail page (base.html)', len(pks),
+          lambda: sum(len(client.get(f'/sales/{pk}/').content) for pk in pks))
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
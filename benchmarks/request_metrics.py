@@ -0,0 +1,77 @@
+"""Overhead of RequestMetricsMiddleware, enabled vs. disabled.
+
+    python -m benchmarks.request_metrics --requests 300
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+
+from pharmacy.models import Medicine, PharmacyUser, Role
+
+PATHS = ['/', '/medicines/', '/users/', '/sales/add/']
+
+
+def seed():
+    call_command('migrate', verbosity=0)
+    call_command('setup_roles', stdout=open(os.devnull, 'w'))
+    PharmacyUser.objects.create_user('admin', password='admin', role=Role.objects.get(name='admin'))
+    Medicine.objects.bulk_create(
+        Medicine(
+            code=f'HM-{i:03}', item_description=f'Medicine {i}', quantity=i,
+            displayed_quantity=50, unit_price=1, selling_price=2,
+            expiry_date=date.today() + timedelta(days=i),
+        )
+        for i in range(1, 201)
+    )
+
+
+def time_requests(enabled, requests):
+    with override_settings(PERF_METRICS=enabled):
+        client = Client()
+        client.login(username='admin', password='admin')
+        for path in PATHS:
+            client.get(path)
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            client.get(PATHS[i % len(PATHS)])
+            timings.append(time.perf_counter() - started)
+    return statistics.mean(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    seed()
+    off, on = [], []
+    # Interleave rounds so drift (cache warm-up, GC) hits both sides equally.
+    for _ in range(args.rounds):
+        off.append(time_requests(False, args.requests))
+        on.append(time_requests(True, args.requests))
+    off_ms, on_ms = statistics.median(off), statistics.median(on)
+    print(f'disabled: {off_ms:.3f} ms/request')
+    print(f'enabled:  {on_ms:.3f} ms/request ({(on_ms - off_ms) / off_ms * 100:+.2f}%)')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
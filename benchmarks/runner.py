@@ -0,0 +1,194 @@
+"""Latency, query count and memory for every named URL in pharmacy/urls.py.
+
+Seeds a throw-away SQLite file with `seed_perf_data`, logs in as an admin and
+GETs each page through the test client. Save a baseline, then compare later
+runs against it; the compare run exits 1 when any page regressed:
+
+    python -m benchmarks.runner --medicines 10000 --output baseline.json
+    python -m benchmarks.runner --medicines 10000 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import URLPattern, reverse
+
+from pharmacy import urls
+from pharmacy.models import Branch, Job, Medicine, MedicineInventory, PharmacyUser, Role, Sale, Shift, StockTake
+
+PASSWORD = 'perf-password'
+# Views that change state on GET; timing them would alter the data under test.
+SKIP = {'logout', 'deactivate_user'}
+# Which row a <pk> route is exercised with.
+MODELS = {
+    'user_update': PharmacyUser,
+    'role_update': Role,
+    'edit_medicine': Medicine,
+    'delete_medicine': Medicine,
+    'sale_detail': Sale,
+    'edit_sale': Sale,
+    'delete_sale': Sale,
+    'medicine_inventory_detail': MedicineInventory,
+    'sale_receipt': Sale,
+    'branch_update': Branch,
+    'stock_take_detail': StockTake,
+    'stock_take_upload': StockTake,
+    'stock_take_post': StockTake,
+    'stock_take_cancel': StockTake,
+    'shift_detail': Shift,
+    'shift_close': Shift,
+    'job_status': Job,
+    'api_item': Medicine,
+}
+# Other URL arguments.
+ARGS = {
+    'api_collection': {'resource': 'medicines'},
+    'api_item': {'resource': 'medicines'},
+}
+
+
+def seed(options):
+    call_command('migrate', verbosity=0)
+    call_command(
+        'seed_perf_data', medicines=options.medicines, years=options.years,
+        sales_per_day=options.sales_per_day, password=PASSWORD, seed=options.seed,
+        stdout=open(os.devnull, 'w'),
+    )
+
+
+def targets():
+    """(name, path) for each page to measure; routes that cannot be filled in are reported and skipped."""
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIP:
+            continue
+        kwargs = dict(ARGS.get(pattern.name, {}))
+        if 'pk' in pattern.pattern.converters and pattern.name in MODELS:
+            model = MODELS[pattern.name]
+            kwargs['pk'] = model.objects.order_by('pk').values_list('pk', flat=True).first()
+            if kwargs['pk'] is None:
+                print(f'skipped {pattern.name}: no {model.__name__} rows in the dataset', file=sys.stderr)
+                continue
+        missing = set(pattern.pattern.converters) - set(kwargs)
+        if missing:
+            print(f"skipped {pattern.name}: add {', '.join(sorted(missing))} to MODELS or ARGS", file=sys.stderr)
+            continue
+        yield pattern.name, reverse(pattern.name, kwargs=kwargs)
+
+
+def measure(client, path, repeat):
+    response = client.get(path)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    with CaptureQueriesContext(connection) as context:
+        client.get(path)
+    # Read now: the next request's request_started signal empties the query log.
+    queries = len(context.captured_queries)
+    # Traced separately: tracemalloc slows allocation-heavy code several-fold.
+    tracemalloc.start()
+    client.get(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'path': path,
+        'status': response.status_code,
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95)], 2),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        if result['median_ms'] > before['median_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: median {before['median_ms']} -> {result['median_ms']} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+        if result['peak_kb'] > before['peak_kb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {before['peak_kb']} -> {result['peak_kb']} KB")
+        if result['status'] != before['status']:
+            regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--medicines', type=int, default=10000)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--sales-per-day', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative slowdown before a page counts as regressed')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    seed(args)
+    username = PharmacyUser.objects.filter(role__name='admin').values_list('username', flat=True).first()
+    results = {}
+    # DEBUG off so templates and static URLs behave as in production.
+    with override_settings(DEBUG=False):
+        client = Client(raise_request_exception=False)
+        client.login(username=username, password=PASSWORD)
+        print(f"{'url':<28} {'status':>6} {'median ms':>10} {'p95 ms':>8} {'queries':>7} {'peak KB':>9}")
+        for name, path in targets():
+            result = results[name] = measure(client, path, args.repeat)
+            print(f"{name:<28} {result['status']:>6} {result['median_ms']:>10.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['queries']:>7} {result['peak_kb']:>9.1f}")
+    os.remove(settings.DATABASES['default']['NAME'])
+
+    report = {
+        'dataset': {
+            'medicines': args.medicines, 'years': args.years,
+            'sales_per_day': args.sales_per_day, 'seed': args.seed,
+        },
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['dataset'] != report['dataset']:
+            print(f"warning: baseline was recorded with {baseline['dataset']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against', args.compare)
+
+
+if __name__ == '__main__':
+    main()
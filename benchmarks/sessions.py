@@ -0,0 +1,128 @@
+"""Queries per request and checkout contention for each session profile.
+
+Runs against a throw-away SQLite file, never the real database:
+
+    python -m benchmarks.sessions --threads 8 --seconds 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from pharmacy.models import Medicine, PharmacyUser, Role
+
+PROFILES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+PASSWORD = 'bench-password'
+
+
+def seed(cashiers):
+    call_command('migrate', verbosity=0)
+    call_command('setup_roles', stdout=open(os.devnull, 'w'))
+    role = Role.objects.get(name='cashier')
+    for i in range(cashiers):
+        PharmacyUser.objects.create_user(f'cashier{i}', password=PASSWORD, role=role)
+    Medicine.objects.bulk_create(
+        Medicine(
+            code=f'HM-{i:03}', item_description=f'Medicine {i}', quantity=10 ** 6,
+            unit_price=1, selling_price=2, expiry_date=date.today() + timedelta(days=365),
+        )
+        for i in range(1, 51)
+    )
+
+
+def logged_in_client(username):
+    client = Client()
+    client.login(username=username, password=PASSWORD)
+    return client
+
+
+def queries_per_request(client, path, repeat=20):
+    client.get(path)
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(repeat):
+            client.get(path)
+    writes = [q for q in context.captured_queries if not q['sql'].startswith('SELECT')]
+    return len(context.captured_queries) / repeat, len(writes) / repeat
+
+
+def checkout_worker(username, stop_at, medicine_ids, results):
+    client = logged_in_client(username)
+    latencies, locked = [], 0
+    i = 0
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            client.get('/sales/add/')
+            client.post('/sales/add/', {'medicine': medicine_ids[i % len(medicine_ids)], 'quantity': 1, 'total_price': 2})
+        except OperationalError:
+            locked += 1
+        latencies.append(time.perf_counter() - started)
+        i += 1
+    connections.close_all()
+    results.append((latencies, locked))
+
+
+def checkout_contention(threads, seconds):
+    medicine_ids = list(Medicine.objects.values_list('pk', flat=True))
+    stop_at = time.monotonic() + seconds
+    results = []
+    workers = [
+        threading.Thread(target=checkout_worker, args=(f'cashier{i}', stop_at, medicine_ids, results))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    return {
+        'checkouts': len(latencies) / seconds,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+        'locked': sum(locked for _, locked in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    seed(args.threads)
+    print(f"{'profile':<16} {'queries/req':>11} {'writes/req':>10} {'checkouts/s':>11} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'locked':>6}")
+    for profile, engine in PROFILES.items():
+        with override_settings(SESSION_ENGINE=engine):
+            cache.clear()
+            queries, writes = queries_per_request(logged_in_client('cashier0'), '/sales/')
+            result = checkout_contention(args.threads, args.seconds)
+        print(f"{profile:<16} {queries:>11.1f} {writes:>10.1f} {result['checkouts']:>11.1f} "
+              f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['locked']:>6}")
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
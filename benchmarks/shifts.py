@@ -0,0 +1,121 @@
+"""What cashier shifts cost per sale, and closing one against rescanning it.
+
+Records --sales sales through Sale.save() with no shift open and then
+with one open, so the difference is the Z-report upkeep each sale pays.
+The shift is then closed, and its report recomputed from Sale for
+comparison, over a table padded with --history older sales.
+
+    python -m benchmarks.shifts --sales 5000 --history 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from pharmacy import shifts
+from pharmacy.models import Medicine, PharmacyUser, Role, Sale
+
+
+def stamp(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc).isoformat(' ').replace('+00:00', '')
+
+
+def seed(medicines, history):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:04}', item_description=f'Medicine {i + 1}', quantity=10 ** 9,
+                displayed_quantity=20, unit_price=1 + i % 50, selling_price=2 + i % 50,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    cashier = PharmacyUser.objects.create_user(
+        'cashier', role=Role.objects.create(name='cashier', description='Cashier'),
+    )
+    rng = np.random.default_rng(0)
+    end = datetime.now(dt_timezone.utc).timestamp() - 86400
+    sql = (f'INSERT INTO {Sale._meta.db_table} (uuid, medicine_id, quantity, total_price, unit_cost, '
+           f'created_by_id, created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)')
+    for start in range(0, history, 200000):
+        size = min(200000, history - start)
+        picks = rng.integers(1, medicines + 1, size=size)
+        stamps = end - rng.random(size) * 365 * 86400
+        rows = [
+            (uuid.uuid4().hex, int(m), 1, f'{2 + (int(m) - 1) % 50}', f'{1 + (int(m) - 1) % 50}', cashier.pk,
+             when, when)
+            for m, when in zip(picks, map(stamp, stamps))
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return cashier
+
+
+def timed(label, function, per=None):
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    detail = f'  ({elapsed / per * 1000:.2f} ms each)' if per else ''
+    print(f'{label:<55} {elapsed * 1000:10.1f} ms{detail}')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=5000)
+    parser.add_argument('--history', type=int, default=2000000)
+    parser.add_argument('--medicines', type=int, default=2000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    cashier = seed(args.medicines, args.history)
+    print(f'seeded {Sale.objects.count()} sales in {time.perf_counter() - started:.0f}s')
+
+    medicines = list(Medicine.objects.order_by('?')[:200])
+    picks = np.random.default_rng(1).integers(0, len(medicines), size=args.sales)
+
+    def sell():
+        for i in picks:
+            Sale.objects.create(medicine=medicines[i], quantity=1, created_by=cashier, total_price=0)
+
+    timed(f'{args.sales} sales, no shift open', sell, per=args.sales)
+    shift = shifts.open_shift(cashier, opening_cash=100)
+    timed(f'{args.sales} sales, shift open', sell, per=args.sales)
+
+    shift = timed('close the shift', lambda: shifts.close(shift, Decimal(0)))
+    sales = Sale.objects.filter(created_by=cashier, created_at__gte=shift.opened_at, created_at__lte=shift.closed_at)
+    scanned = timed(
+        'its report recomputed from Sale, by medicine',
+        lambda: list(sales.values('medicine__code').annotate(
+            sale_count=Count('pk'), quantity=Sum('quantity'), amount=Sum('total_price'),
+        )),
+    )
+    assert sum(row['amount'] for row in scanned) == shift.amount, shift
+    lines = timed('read the Z-report lines', lambda: list(shift.lines.select_related('medicine')))
+    assert sum(line.quantity for line in lines) == args.sales
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
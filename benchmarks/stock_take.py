@@ -0,0 +1,79 @@
+"""Time a large stock take: parse an uploaded count, review it and post it.
+
+    python -m benchmarks.stock_take --lines 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['PHARMACY_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+
+from pharmacy import stocktake
+from pharmacy.models import Branch, BranchStock, Medicine, StockAdjustment, StockTake
+
+
+def seed(medicines):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:05}', item_description=f'Medicine {i + 1}', quantity=500,
+                displayed_quantity=20, unit_price=1, selling_price=2,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    branch = Branch.objects.create(code='B01', name='Branch 01')
+    BranchStock.objects.bulk_create(
+        (BranchStock(branch=branch, medicine_id=i + 1, quantity=200) for i in range(medicines)),
+        batch_size=5000,
+    )
+    return branch
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f'{label:<28} {time.perf_counter() - started:7.2f}s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=20000)
+    args = parser.parse_args()
+
+    branch = seed(args.lines)
+    rng = np.random.default_rng(0)
+    # Most counts match; a fifth are off by a few units either way.
+    drift = np.where(rng.random(args.lines) < 0.2, rng.integers(-5, 6, size=args.lines), 0)
+    lines = ['code,count'] + [f'HM-{i + 1:05},{200 + int(d)}' for i, d in enumerate(drift)]
+
+    for location in (branch, None):
+        print(f'{args.lines} lines, {location or "central stock"}:')
+        stock_take = StockTake.objects.create(branch=location)
+        counts, _ = timed('  parse', lambda: stocktake.parse_counts(lines))
+        timed('  record counts', lambda: stocktake.record_counts(stock_take, counts))
+        summary = timed('  summary', lambda: stocktake.summary(stock_take))
+        timed('  largest variances page', lambda: list(stocktake.largest_variances(stock_take, 500)))
+        adjusted = timed('  post', lambda: stocktake.post(stock_take))
+        print(f'  {summary["differing"]} variances, {adjusted} adjusted, '
+              f'{StockAdjustment.objects.filter(stock_take=stock_take).count()} ledger rows')
+    os.remove(settings.DATABASES['default']['NAME'])
+
+
+if __name__ == '__main__':
+    main()
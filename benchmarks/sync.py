@@ -0,0 +1,133 @@
+"""Sync queued offline sales from a branch instance to a central instance.
+
+Runs two instances on this machine: this process is the branch (its own
+SQLite file and outbox) and `manage.py serve` on a second file is the
+central server.
+
+    python -m benchmarks.sync --sales 100000
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+WORKDIR = tempfile.mkdtemp()
+PORT = 8765
+TOKEN = 'bench-token'
+os.environ.update(
+    PHARMACY_DB_PATH=os.path.join(WORKDIR, 'branch.sqlite3'),
+    PHARMACY_SYNC_URL=f'http://127.0.0.1:{PORT}/sync/sales/',
+    PHARMACY_SYNC_TOKEN=TOKEN,
+    PHARMACY_SYNC_BRANCH='B01',
+)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from pharmacy import sync
+from pharmacy.models import Branch, Medicine, Sale, SyncOutbox
+
+CENTRAL_DB = os.path.join(WORKDIR, 'central.sqlite3')
+
+
+def seed(medicines, sales):
+    call_command('migrate', verbosity=0)
+    Medicine.objects.bulk_create(
+        (
+            Medicine(
+                code=f'HM-{i + 1:03}', item_description=f'Medicine {i + 1}', quantity=1000,
+                displayed_quantity=20, unit_price=1, selling_price=2,
+                expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in range(medicines)
+        ),
+        batch_size=5000,
+    )
+    Branch.objects.create(code='B01', name='Branch 01')
+    # Both instances start from the same catalogue.
+    connections.close_all()
+    shutil.copy(settings.DATABASES['default']['NAME'], CENTRAL_DB)
+
+    rng = np.random.default_rng(0)
+    picks = rng.integers(1, medicines + 1, size=sales)
+    quantities = rng.integers(1, 4, size=sales)
+    for start in range(0, sales, 10000):
+        created = Sale.objects.bulk_create(
+            Sale(medicine_id=int(m), quantity=int(q), total_price=int(q) * 2)
+            for m, q in zip(picks[start:start + 10000], quantities[start:start + 10000])
+        )
+        SyncOutbox.objects.bulk_create(SyncOutbox(sale=sale) for sale in created)
+
+
+def start_central():
+    env = dict(os.environ, PHARMACY_DB_PATH=CENTRAL_DB, PHARMACY_SYNC_URL='', DJANGO_DEBUG='False',
+               PHARMACY_PERF_METRICS='False')
+    server = subprocess.Popen(
+        [sys.executable, 'manage.py', 'serve', '--port', str(PORT), '--threads', '4'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', PORT), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('central instance did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sales', type=int, default=100000)
+    parser.add_argument('--medicines', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    seed(args.medicines, args.sales)
+    sample = json.dumps(sync.payload(list(sync.pending().values_list('sale_id', flat=True)[:args.batch_size])))
+    raw, compressed = len(sample.encode()), len(gzip.compress(sample.encode()))
+    print(f'batch of {args.batch_size}: {raw / 1e3:.0f} KB JSON, {compressed / 1e3:.0f} KB gzipped ({raw / compressed:.1f}x)')
+
+    server = start_central()
+    try:
+        started = time.perf_counter()
+        totals = sync.push(batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"first sync: {totals} in {elapsed:.1f}s ({totals['accepted'] / elapsed:,.0f} sales/s)")
+
+        # Resend everything, as after a lost acknowledgement.
+        SyncOutbox.objects.update(sent_at=None)
+        started = time.perf_counter()
+        totals = sync.push(batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"resend:     {totals} in {elapsed:.1f}s ({totals['duplicates'] / elapsed:,.0f} sales/s)")
+    finally:
+        server.terminate()
+        server.wait()
+
+    central = sqlite3.connect(CENTRAL_DB)
+    count, = central.execute('SELECT COUNT(*) FROM pharmacy_sale').fetchone()
+    stock, = central.execute('SELECT SUM(quantity) FROM pharmacy_medicine').fetchone()
+    central.close()
+    sold = sum(Sale.objects.values_list('quantity', flat=True))
+    print(f'central: {count} sales, stock {stock} (expected {args.medicines * 1000 - sold})')
+    shutil.rmtree(WORKDIR)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,125 @@
 import os
 import sys
-import django
-from django.core.management import execute_from_command_line
-from django.core.wsgi import get_wsgi_application
-from django.conf import settings
+import time
+
+# Django and the WSGI server are imported inside main() so that argument
+# handling and the startup profiler are in place before the heavy imports run.
+STARTED = time.perf_counter()
+
+
+class ImportProfiler:
+    """Records how long each module takes to import (self time, children excluded)."""
+
+    def __init__(self):
+        self.timings = {}
+        self._stack = []
+
+    def install(self):
+        profiler = self
+
+        class TimedFinder:
+            @classmethod
+            def find_spec(cls, name, path=None, target=None):
+                for finder in sys.meta_path:
+                    if finder is cls or not hasattr(finder, 'find_spec'):
+                        continue
+                    spec = finder.find_spec(name, path, target)
+                    if spec is not None:
+                        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                            spec.loader = TimedLoader(spec.loader, name)
+                        return spec
+                return None
+
+        class TimedLoader:
+            def __init__(self, loader, name):
+                self._loader = loader
+                self._name = name
+
+            def __getattr__(self, attr):
+                return getattr(self._loader, attr)
+
+            def create_module(self, spec):
+                return self._loader.create_module(spec)
+
+            def exec_module(self, module):
+                profiler._stack.append(0.0)
+                start = time.perf_counter()
+                try:
+                    self._loader.exec_module(module)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    children = profiler._stack.pop()
+                    profiler.timings[self._name] = elapsed - children
+                    if profiler._stack:
+                        profiler._stack[-1] += elapsed
+
+        sys.meta_path.insert(0, TimedFinder)
+
+    def report(self, limit=20):
+        total = sum(self.timings.values())
+        print(f'Imported {len(self.timings)} modules in {total * 1000:.0f} ms; slowest:')
+        slowest = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in slowest[:limit]:
+            print(f'  {seconds * 1000:8.1f} ms  {name}')
+
 
 def main():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharmacy_management.settings')
-    django.setup()
-    
-    # Disable autoreloader and run the server
-    if len(sys.argv) == 1:
-        sys.argv.extend(['runserver', '8000', '--noreload'])
-    
+
+    args = sys.argv[1:]
+    profiler = None
+    if '--profile-startup' in args:
+        args.remove('--profile-startup')
+        profiler = ImportProfiler()
+        profiler.install()
+
+    # Any other arguments are passed through as a management command, e.g.
+    # `main.py serve --threads 16` or `main.py migrate`.
+    if args:
+        from django.core.management import execute_from_command_line
+        execute_from_command_line([sys.argv[0]] + args)
+        return
+
+    os.environ.setdefault('DJANGO_DEBUG', 'False')
+
+    phases = []
+    mark = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    phases.append(('django setup', time.perf_counter() - mark))
+
+    mark = time.perf_counter()
+    from pharmacy.server import serve, warm_up
+    phases.append(('import server', time.perf_counter() - mark))
+
+    mark = time.perf_counter()
+    warm_up(application)
+    phases.append(('warm-up request', time.perf_counter() - mark))
+
+    if profiler:
+        profiler.report()
+        for name, seconds in phases:
+            print(f'{name:>16}: {seconds * 1000:8.1f} ms')
+        print(f'{"ready to serve":>16}: {(time.perf_counter() - STARTED) * 1000:8.1f} ms after launch')
+
+    from django.conf import settings
+    print(f'Pharmacy Management System running at http://{settings.SERVER_HOST}:{settings.SERVER_PORT}/')
+    serve(
+        application,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        processes=settings.SERVER_PROCESSES,
+        threads=settings.SERVER_THREADS,
+        connection_limit=settings.SERVER_CONNECTION_LIMIT,
+        backlog=settings.SERVER_BACKLOG,
+        channel_timeout=settings.SERVER_KEEP_ALIVE,
+        shutdown_timeout=settings.SERVER_SHUTDOWN_TIMEOUT,
+    )
+
+
+if __name__ == '__main__':
     try:
-        execute_from_command_line(sys.argv)
+        main()
     except Exception as e:
         print(f"Error: {e}")
         input("Press Enter to exit...")
-
-if __name__ == '__main__':
-    main()
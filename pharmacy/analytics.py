@@ -0,0 +1,225 @@
+"""Sales analytics: units, revenue and margin grouped by period, medicine and cashier.
+
+Each query is answered from the smallest table holding every dimension it
+asks for:
+
+- CashierDailySales, a few rows per day, when medicines are not broken out
+- DailySales, one row per medicine per day, for medicines across all branches
+- Sale itself for medicine by cashier or medicine by branch; the created_at
+  index limits the scan to the date range. Archived sales are grouped by
+  the same query on ArchivedSale and merged in, when the range has any.
+
+Margin is revenue less cost, both summed in the same grouped query. Cost
+is quantity times the unit cost kept on each sale, so later price changes
+do not rewrite past margins. Sales from before unit costs were kept fall
+back to today's unit price until backfill_sale_cost has run. Results are
+cached per parameter set for ANALYTICS_CACHE_SECONDS.
+"""
+import hashlib
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import CharField, DateField, F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, Substr, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import ArchivedSale, CashierDailySales, DailySales, Medicine, MedicineInventory, Sale
+
+PERIODS = {'day': TruncDate, 'week': TruncWeek, 'month': TruncMonth}
+DIMENSIONS = ['medicine', 'cashier']
+# ?order= choices, and the annotation each sorts on.
+METRICS = {'quantity': 'units', 'amount': 'revenue', 'margin': 'margin'}
+CENT = Decimal('0.01')
+
+
+def day_start(day):
+    """The aware datetime at which local date `day` begins."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def source(group, branch):
+    """Which table answers: 'cashier_rollup', 'medicine_rollup' or 'sales'."""
+    if 'medicine' not in group:
+        return 'cashier_rollup'
+    if 'cashier' not in group and branch is None:
+        return 'medicine_rollup'
+    return 'sales'
+
+
+def filtered(name, start, end, branch=None, sales=None):
+    """Rows of source `name` for `start`..`end` (inclusive dates), and how to read them.
+
+    Returns the queryset, its date column, the grouping columns per
+    dimension (with their output names) and the quantity/amount/cost
+    expressions to sum. `sales` is the manager the 'sales' source reads,
+    Sale.objects unless given.
+    """
+    if name == 'cashier_rollup':
+        rows = CashierDailySales.objects.filter(date__range=(start, end))
+        if branch is not None:
+            rows = rows.filter(branch=branch)
+        dimensions = {'cashier': {'cashier_id': 'cashier', 'cashier__username': 'cashier_name'}}
+        return rows, 'date', dimensions, F('quantity'), F('amount'), F('cost')
+
+    dimensions = {'medicine': {'medicine_id': 'medicine', 'medicine__code': 'code',
+                               'medicine__item_description': 'description'}}
+    if name == 'medicine_rollup':
+        rows = DailySales.objects.filter(date__range=(start, end))
+        return rows, 'date', dimensions, F('quantity'), F('amount'), F('cost')
+
+    # A range on created_at itself, not on its date, so the index is used.
+    rows = (sales or Sale.objects).filter(
+        created_at__gte=day_start(start), created_at__lt=day_start(end + timedelta(days=1)),
+    )
+    if branch is not None:
+        rows = rows.filter(branch=branch)
+    dimensions['cashier'] = {'created_by_id': 'cashier', 'created_by__username': 'cashier_name'}
+    cost = F('quantity') * Coalesce('unit_cost', 'medicine__unit_price')
+    return rows, 'created_at', dimensions, F('quantity'), F('total_price'), cost
+
+
+def metrics(quantity, amount, cost):
+    price = Medicine.unit_price.field
+    # Not named after the columns they sum: Django refuses annotations
+    # that shadow a field.
+    return {
+        'units': Coalesce(Sum(quantity), 0),
+        'revenue': Coalesce(Sum(amount), 0, output_field=price),
+        'spent': Coalesce(Sum(cost), 0, output_field=price),
+    }
+
+
+def money(row):
+    # SQLite returns computed decimals unquantized.
+    amount, cost = (Decimal(row[metric]).quantize(CENT) for metric in ('revenue', 'spent'))
+    margin = amount - cost
+    return {
+        'quantity': row['units'], 'amount': amount, 'cost': cost, 'margin': margin,
+        'margin_percent': (margin * 100 / amount).quantize(Decimal('0.1')) if amount else None,
+    }
+
+
+def compute(start, end, period=None, group=(), branch=None, order='amount', top=None):
+    name = source(group, branch)
+    queryset, when, dimensions, *sums = filtered(name, start, end, branch)
+    # Every source sums to the same totals; the cashier rollup has the fewest rows.
+    totals_queryset, _, _, *totals_sums = filtered('cashier_rollup', start, end, branch)
+    totals = money(totals_queryset.aggregate(**metrics(*totals_sums)))
+
+    columns = {column: output for dimension in group for column, output in dimensions[dimension].items()}
+    annotations = {}
+    if period == 'day' and when == 'date':
+        columns = {'date': 'period', **columns}
+    elif period == 'month' and when == 'date':
+        # The 'YYYY-MM' of the stored date. TruncMonth would run a Python
+        # function per row on SQLite.
+        annotations['month'] = Substr(Cast('date', CharField()), 1, 7)
+        columns = {'month': 'period', **columns}
+    elif period:
+        annotations['period'] = PERIODS[period](when, output_field=DateField())
+        columns = {'period': 'period', **columns}
+    if columns:
+        def grouped(rows):
+            return rows.annotate(**annotations).order_by().values(*columns).annotate(**metrics(*sums))
+
+        archived = []
+        if name == 'sales':
+            archived = list(grouped(filtered(name, start, end, branch, sales=ArchivedSale.objects)[0]))
+        if archived:
+            rows = merged([archived, grouped(queryset)], list(columns), order, top)
+        elif top:
+            rows = grouped(queryset).annotate(margin=F('revenue') - F('spent'))
+            rows = rows.order_by(F(METRICS[order]).desc(), *columns)[:top]
+        else:
+            rows = grouped(queryset).order_by(*columns)[:settings.ANALYTICS_MAX_ROWS]
+        results = [
+            {**{output: row[column] for column, output in columns.items()}, **money(row)} for row in rows
+        ]
+        if 'month' in columns:
+            for row in results:
+                row['period'] = date.fromisoformat(f"{row['period']}-01")
+    else:
+        results = [totals]
+    return {
+        'source': name,
+        'start_date': start,
+        'end_date': end,
+        'period': period,
+        'group': list(group),
+        'rows': results,
+        'truncated': not top and len(results) == settings.ANALYTICS_MAX_ROWS,
+        'totals': totals,
+        'generated_at': timezone.now(),
+    }
+
+
+def merged(groups, columns, order, top):
+    """Sum the rows of several grouped results per group, then order and
+    limit them as compute() does in SQL."""
+    totals = {}
+    for rows in groups:
+        for row in rows:
+            key = tuple(row[column] for column in columns)
+            if key in totals:
+                for metric in ('units', 'revenue', 'spent'):
+                    totals[key][metric] += row[metric]
+            else:
+                totals[key] = dict(row)
+    # Ascending with NULLs first, as SQLite sorts them.
+    rows = sorted(totals.values(), key=lambda row: [(row[column] is not None, row[column]) for column in columns])
+    if not top:
+        return rows[:settings.ANALYTICS_MAX_ROWS]
+    for row in rows:
+        row['margin'] = row['revenue'] - row['spent']
+    return sorted(rows, key=lambda row: row[METRICS[order]], reverse=True)[:top]
+
+
+def cube(start, end, period=None, group=(), branch=None, order='amount', top=None):
+    """compute(), cached under a hash of its parameters."""
+    params = {
+        'start': start, 'end': end, 'period': period, 'group': sorted(group),
+        'branch': branch and branch.pk, 'order': order, 'top': top,
+    }
+    digest = hashlib.blake2b(json.dumps(params, cls=DjangoJSONEncoder, sort_keys=True).encode(), digest_size=16)
+    key = f'sales-analytics:{digest.hexdigest()}'
+    result = cache.get(key)
+    if result is None:
+        result = compute(start, end, period, group, branch, order, top)
+        cache.set(key, result, settings.ANALYTICS_CACHE_SECONDS)
+    return result
+
+
+def historic_unit_cost():
+    """Best estimate of what a past sale cost: the unit price of the last
+    receipt of its medicine before the sale, else today's unit price."""
+    received = MedicineInventory.objects.filter(
+        medicine=OuterRef('medicine'), created_at__lte=OuterRef('created_at'),
+    ).order_by('-created_at').values('unit_price')[:1]
+    current = Medicine.all_objects.filter(pk=OuterRef('medicine')).values('unit_price')
+    return Coalesce(Subquery(received), Subquery(current))
+
+
+def backfill_unit_cost(batch_size=5000, progress=None):
+    """Fill in unit_cost on sales recorded before it was kept; returns the count.
+
+    One UPDATE per pk range of `batch_size`, each in its own transaction,
+    so sales keep going through while it runs and an interrupted run
+    resumes where it stopped. updated_at is left alone: the sale itself
+    has not changed.
+    """
+    missing = Sale.objects.filter(unit_cost__isnull=True)
+    bounds = missing.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+    filled = 0
+    for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+        with transaction.atomic():
+            filled += missing.filter(pk__gte=start, pk__lt=start + batch_size).update(unit_cost=historic_unit_cost())
+        if progress:
+            progress(filled)
+    return filled
@@ -0,0 +1,382 @@
+"""JSON API over the core models, for integrations.
+
+    GET    /api/<resource>/        a page of rows, in id order
+    POST   /api/<resource>/        create
+    GET    /api/<resource>/<id>/   one row
+    PATCH  /api/<resource>/<id>/   change the given fields
+    DELETE /api/<resource>/<id>/   where the resource allows it
+
+Lists take ?limit=, ?cursor= (the `next` link of the previous page carries
+it), ?fields=a,b for a sparse fieldset (id is always included) and exact
+filters on the fields each resource lists. Pages are keyset-paginated on
+the primary key, so page 1000 costs what page 1 does, and rows are read
+as plain values and encoded directly rather than built as model instances.
+GET responses carry an ETag of the body and answer If-None-Match with 304.
+
+Integrations send "Authorization: Token <key>" (`manage.py create_api_token`);
+a logged-in browser session works too, with the usual CSRF check on
+writes. Writes go through the same forms and stock handling as the HTML
+views, and roles have the same access as there.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Case, F, Func, ProtectedError, TextField, Value, When
+from django.db.models.functions import Cast
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+
+from . import branches
+from .forms import MedicineForm, MedicineInventoryForm, RoleForm, SaleForm, UserRegistrationForm, UserUpdateForm
+from .models import ApiToken, Medicine, MedicineInventory, PharmacyUser, Role, Sale
+
+
+class Invalid(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class Resource:
+    def __init__(self, model, fields, read_roles, write_roles, filters=(), create=None,
+                 update_form=None, delete=None, branch_scoped=False):
+        self.model = model
+        self.fields = fields
+        self.read_roles = read_roles
+        self.write_roles = write_roles
+        self.filters = filters
+        self.create = create
+        self.update_form = update_form
+        self.delete = delete
+        self.branch_scoped = branch_scoped
+
+    def queryset(self, user):
+        if self.branch_scoped:
+            return branches.scoped(self.model.objects, user)
+        return self.model.objects.all()
+
+
+def valid(form):
+    if not form.is_valid():
+        raise Invalid(form.errors.get_json_data())
+    return form
+
+
+def create_medicine(data, user):
+    return valid(MedicineForm({'code': Medicine.next_code(), **data})).save()
+
+
+def create_sale(data, user):
+    # SaleForm prices the sale itself; the field only has to be present.
+    sale = valid(SaleForm({'total_price': 0, **data})).save(commit=False)
+    sale.created_by = user
+    sale.branch = user.branch
+    return branches.record_sale(sale)
+
+
+def create_inventory(data, user):
+    form = MedicineInventoryForm(data)
+    if user.branch_id:
+        del form.fields['branch']
+    inventory = valid(form).save(commit=False)
+    inventory.created_by = user
+    if user.branch_id:
+        inventory.branch = user.branch
+    inventory.save()
+    return inventory
+
+
+RESOURCES = {
+    'medicines': Resource(
+        Medicine,
+        fields=['code', 'item_description', 'category', 'quantity', 'displayed_quantity', 'unit_price',
+                'selling_price', 'expiry_date', 'is_expired', 'is_expiring', 'is_low_stock', 'created_at', 'updated_at'],
+        read_roles=['admin', 'pharmacist', 'inventory'],
+        write_roles=['admin', 'pharmacist'],
+        filters=['code', 'category', 'is_expired', 'is_expiring', 'is_low_stock', 'updated_at__gte'],
+        create=create_medicine,
+        update_form=MedicineForm,
+        delete=lambda medicine, user: medicine.soft_delete(),
+    ),
+    'sales': Resource(
+        Sale,
+        fields=['uuid', 'medicine', 'branch', 'quantity', 'total_price', 'unit_cost', 'created_by', 'created_at',
+                'updated_at'],
+        read_roles=['admin', 'cashier'],
+        write_roles=['admin', 'cashier'],
+        filters=['medicine', 'branch', 'created_at__gte', 'created_at__lt', 'updated_at__gte'],
+        create=create_sale,
+        delete=branches.cancel_sale,
+        branch_scoped=True,
+    ),
+    'inventory': Resource(
+        MedicineInventory,
+        fields=['medicine', 'branch', 'quantity', 'unit_price', 'total_price', 'created_by', 'created_at',
+                'updated_at'],
+        read_roles=['admin', 'inventory'],
+        write_roles=['admin', 'inventory'],
+        filters=['medicine', 'branch', 'created_at__gte', 'created_at__lt', 'updated_at__gte'],
+        create=create_inventory,
+        branch_scoped=True,
+    ),
+    'roles': Resource(
+        Role,
+        fields=['name', 'description', 'created_at', 'updated_at'],
+        read_roles=['admin'],
+        write_roles=['admin'],
+        filters=['name'],
+        create=lambda data, user: valid(RoleForm(data)).save(),
+        update_form=RoleForm,
+    ),
+    'users': Resource(
+        PharmacyUser,
+        # Never the password hash.
+        fields=['username', 'first_name', 'last_name', 'email', 'role', 'branch', 'phone_number', 'address',
+                'is_active', 'last_login', 'date_joined', 'created_at', 'updated_at'],
+        read_roles=['admin'],
+        write_roles=['admin'],
+        filters=['username', 'role', 'branch', 'is_active', 'updated_at__gte'],
+        create=lambda data, user: valid(UserRegistrationForm(data)).save(),
+        update_form=UserUpdateForm,
+    ),
+}
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def authenticate(request):
+    """The calling user, or None, and whether they came with a session."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        token = ApiToken.objects.select_related('user__role', 'user__branch').filter(
+            key_hash=ApiToken.hash(header.removeprefix('Token ')), user__is_active=True,
+        ).first()
+        return (token.user if token else None), False
+    if request.user.is_authenticated:
+        return request.user, True
+    return None, False
+
+
+def check_access(request, resource, allowed):
+    """An error response if the caller may not make this request, else (None, user)."""
+    if request.method not in allowed:
+        return HttpResponseNotAllowed(allowed), None
+    user, session = authenticate(request)
+    if user is None:
+        return error('Authentication required', 401), None
+    roles = resource.read_roles if request.method == 'GET' else resource.write_roles
+    if not user.role or user.role.name not in roles:
+        return error('Access Denied', 403), None
+    # The views are csrf_exempt for token clients; sessions still get the check.
+    if session and request.method != 'GET':
+        rejected = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+        if rejected:
+            return rejected, None
+    return None, user
+
+
+def json_expression(field):
+    """SQL reading the field as the text of its JSON value, or None to read it as is.
+
+    Django parses each stored datetime, decimal and UUID into a Python
+    object, which the encoder then formats back into a string; that round
+    trip was most of the cost of a large page. SQLite can produce the
+    string directly.
+    """
+    kind = field.get_internal_type()
+    if kind == 'DateTimeField':
+        # Stored in UTC when USE_TZ is on.
+        return Func(Value('%Y-%m-%dT%H:%M:%fZ' if settings.USE_TZ else '%Y-%m-%dT%H:%M:%f'), F(field.name),
+                    function='strftime', output_field=TextField())
+    if kind == 'DecimalField':
+        formatted = Func(Value(f'%.{field.decimal_places}f'), F(field.name), function='printf',
+                         output_field=TextField())
+        if not field.null:
+            return formatted
+        # printf() reads NULL as 0.
+        return Case(When(**{f'{field.name}__isnull': True}, then=Value(None)), default=formatted,
+                    output_field=TextField())
+    if kind in ('DateField', 'UUIDField'):
+        return Cast(field.name, TextField())
+    return None
+
+
+def format_uuid(value):
+    return value and f'{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}'
+
+
+def serialize(queryset, fields):
+    """Rows of the queryset as JSON-ready dicts, without building model instances."""
+    if connections[queryset.db].vendor != 'sqlite':
+        return [dict(zip(fields, values)) for values in queryset.values_list(*fields)]
+    model_fields = [queryset.model._meta.get_field(name) for name in fields]
+    rows = queryset.values_list(*(json_expression(field) or field.name for field in model_fields))
+    uuids = [i for i, field in enumerate(model_fields) if field.get_internal_type() == 'UUIDField']
+    if not uuids:
+        return [dict(zip(fields, values)) for values in rows]
+    serialized = []
+    for values in rows:
+        row = dict(zip(fields, values))
+        for i in uuids:
+            row[fields[i]] = format_uuid(values[i])
+        serialized.append(row)
+    return serialized
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise ValidationError('Invalid cursor')
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError('limit must be a number')
+    if limit < 1:
+        raise ValidationError('limit must be at least 1')
+    return min(limit, settings.API_MAX_PAGE_SIZE)
+
+
+def selected_fields(request, resource):
+    if not request.GET.get('fields'):
+        return ['id', *resource.fields]
+    fields = request.GET['fields'].split(',')
+    unknown = [name for name in fields if name not in resource.fields and name != 'id']
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id', *(name for name in fields if name != 'id')]
+
+
+def filtered(request, resource, queryset):
+    lookups = {}
+    for name in resource.filters:
+        if name in request.GET:
+            field = resource.model._meta.get_field(name.split('__')[0])
+            # Foreign keys filter on the related id.
+            field = field.target_field if field.is_relation else field
+            lookups[name] = field.to_python(request.GET[name])
+    return queryset.filter(**lookups)
+
+
+def json_response(request, data, status=200):
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    response = HttpResponse(body, content_type='application/json', status=status)
+    # Responses depend on who asks, and clients should revalidate each time.
+    patch_cache_control(response, private=True, no_cache=True)
+    if request.method != 'GET':
+        return response
+    response['ETag'] = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def request_data(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ValidationError('Body must be JSON')
+    if not isinstance(data, dict):
+        raise ValidationError('Body must be a JSON object')
+    return data
+
+
+def row(queryset, pk, fields):
+    rows = serialize(queryset.filter(pk=pk), fields)
+    return rows[0] if rows else None
+
+
+@csrf_exempt
+def collection(request, resource):
+    if resource not in RESOURCES:
+        return error('Not found', 404)
+    resource = RESOURCES[resource]
+    denied, user = check_access(request, resource, ['GET', 'POST'])
+    if denied:
+        return denied
+    queryset = resource.queryset(user)
+
+    try:
+        fields = selected_fields(request, resource)
+        if request.method == 'POST':
+            instance = resource.create(request_data(request), user)
+            return json_response(request, row(queryset, instance.pk, fields), status=201)
+
+        limit = page_size(request)
+        queryset = filtered(request, resource, queryset)
+        if request.GET.get('cursor'):
+            queryset = queryset.filter(pk__gt=decode_cursor(request.GET['cursor']))
+        # One row past the page says whether there is a next one.
+        rows = serialize(queryset.order_by('pk')[:limit + 1], fields)
+    except branches.InsufficientStock as invalid:
+        return error(str(invalid), 409)
+    except ValidationError as invalid:
+        return error(' '.join(invalid.messages), 400)
+    except Invalid as invalid:
+        return JsonResponse({'errors': invalid.errors}, status=400)
+
+    next_url = None
+    if len(rows) > limit:
+        rows.pop()
+        query = request.GET.copy()
+        query['cursor'] = encode_cursor(rows[-1]['id'])
+        next_url = f'{request.path}?{query.urlencode()}'
+    return json_response(request, {'results': rows, 'next': next_url})
+
+
+@csrf_exempt
+def item(request, resource, pk):
+    if resource not in RESOURCES:
+        return error('Not found', 404)
+    resource = RESOURCES[resource]
+    allowed = ['GET']
+    if resource.update_form:
+        allowed.append('PATCH')
+    if resource.delete:
+        allowed.append('DELETE')
+    denied, user = check_access(request, resource, allowed)
+    if denied:
+        return denied
+    queryset = resource.queryset(user)
+
+    try:
+        fields = selected_fields(request, resource)
+        if request.method == 'GET':
+            data = row(queryset, pk, fields)
+            if data is None:
+                return error('Not found', 404)
+            return json_response(request, data)
+
+        instance = queryset.filter(pk=pk).first()
+        if instance is None:
+            return error('Not found', 404)
+        if request.method == 'DELETE':
+            resource.delete(instance, user)
+            return HttpResponse(status=204)
+        form_class = resource.update_form
+        # PATCH: unchanged fields keep their current values.
+        current = model_to_dict(instance, fields=form_class._meta.fields)
+        valid(form_class({**current, **request_data(request)}, instance=instance)).save()
+        return json_response(request, row(queryset, pk, fields))
+    except ValidationError as invalid:
+        return error(' '.join(invalid.messages), 400)
+    except Invalid as invalid:
+        return JsonResponse({'errors': invalid.errors}, status=400)
+    except ProtectedError:
+        return error('Still referenced by other records', 409)
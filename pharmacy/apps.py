@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+def enable_wal(sender, connection, **kwargs):
+    from django.conf import settings
+
+    if connection.vendor == 'sqlite' and settings.SQLITE_WAL:
+        with connection.cursor() as cursor:
+            # Persistent in the file; on an already converted database this
+            # is a cheap header check.
+            cursor.execute('PRAGMA journal_mode = WAL')
 
 
 class PharmacyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pharmacy'
+
+    def ready(self):
+        from django.conf import settings
+
+        connection_created.connect(enable_wal)
+        if settings.AUDIT_ENABLED:
+            from . import audit
+
+            audit.connect()
@@ -0,0 +1,82 @@
+"""Old and deleted sales, kept in ArchivedSale out of the hot Sale table.
+
+`manage.py archive_sales` moves sales older than ARCHIVE_AFTER_DAYS across
+in chunks of ARCHIVE_CHUNK_SIZE, each an INSERT ... SELECT and a DELETE in
+one short transaction, so checkout is never locked out for long and an
+interrupted run resumes where it stopped. Sale and its indexes then hold
+only the recent sales that checkout, the sale list and open shifts work on.
+Sales still waiting to be synced, or in a shift that is still open, stay
+until they are not.
+
+Deleting a sale moves it across at once with deleted_at set, after backing
+it out of stock, the daily rollups and its shift; nothing is dropped.
+
+Archived sales are still counted by the rollups, so the analytics and shift
+reports need nothing more. Reports that read sales rows themselves query
+both tables with both() and combine the results.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedSale, Sale, Shift, SyncOutbox
+
+COLUMNS = [field.column for field in Sale._meta.concrete_fields]
+
+
+def both(build):
+    """[`build`(hot sales), `build`(archived sales)]: `build` takes a manager
+    and returns a queryset, applied to Sale and to the live ArchivedSale rows."""
+    return [build(Sale.objects), build(ArchivedSale.objects)]
+
+
+def archivable(before):
+    """Sales made before `before` that can be moved now."""
+    return Sale.objects.filter(created_at__lt=before).exclude(
+        pk__in=SyncOutbox.objects.filter(sent_at__isnull=True).values('sale_id'),
+    ).exclude(shift__in=Shift.objects.filter(closed_at__isnull=True))
+
+
+def move(ids, deleted_at=None, deleted_by=None):
+    """Copy the sales `ids` to the archive and delete them; run inside a transaction."""
+    db = transaction.get_connection()
+    quote = db.ops.quote_name
+    columns = ', '.join(quote(column) for column in COLUMNS)
+    marks = ', '.join(['%s'] * len(ids))
+    deleted_at = ArchivedSale._meta.get_field('deleted_at').get_db_prep_save(deleted_at, db)
+    with db.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ArchivedSale._meta.db_table)} ({columns}, deleted_at, deleted_by_id) '
+            f'SELECT {columns}, %s, %s FROM {quote(Sale._meta.db_table)} WHERE id IN ({marks})',
+            [deleted_at, deleted_by and deleted_by.pk, *ids],
+        )
+        # Sent, or the sale is being deleted before it ever was.
+        cursor.execute(f'DELETE FROM {quote(SyncOutbox._meta.db_table)} WHERE sale_id IN ({marks})', ids)
+        cursor.execute(f'DELETE FROM {quote(Sale._meta.db_table)} WHERE id IN ({marks})', ids)
+        return cursor.rowcount
+
+
+def archive(before=None, chunk_size=None, progress=None):
+    """Move sales made before `before` (default: ARCHIVE_AFTER_DAYS ago) to
+    the archive, oldest first; returns how many were moved."""
+    before = before or timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+    moved = 0
+    while True:
+        with transaction.atomic():
+            ids = list(archivable(before).order_by('created_at').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return moved
+            moved += move(ids)
+        if progress:
+            progress(moved)
+
+
+def discard(sale, user=None):
+    """Back `sale` out of the rollups and its shift, as a delete would, and
+    keep it in the archive marked deleted by `user`."""
+    with transaction.atomic():
+        sale.unrecord()
+        move([sale.pk], deleted_at=timezone.now(), deleted_by=user)
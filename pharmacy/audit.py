@@ -0,0 +1,233 @@
+"""Audit trail of changes to users, roles, medicine prices and stock.
+
+Saving or deleting an audited model records an AuditEntry with the
+fields that changed. The diff is taken against the values the instance
+was loaded with, kept by a post_init receiver, so auditing adds no query
+to the save. An entry joins an in-memory buffer only once its transaction
+commits, so rolled-back changes leave no trail. A background thread
+writes the buffer with bulk_create every AUDIT_FLUSH_INTERVAL seconds, or
+as soon as AUDIT_BATCH_SIZE entries are waiting. The request that made
+the change never waits for the audit insert.
+
+flush() writes whatever is waiting. It runs at interpreter exit and when
+a server or job worker process stops, so a graceful shutdown loses
+nothing. A process killed outright loses at most one interval's entries.
+With AUDIT_FLUSH_INTERVAL=0 there is no thread: the commit that fills a
+batch writes it, and the rest is written at exit.
+
+Code that changes an audited field with a queryset update() records it
+with updated().
+"""
+import atexit
+import functools
+import logging
+import os
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import AuditEntry, Medicine, PharmacyUser, Role
+
+logger = logging.getLogger(__name__)
+
+# The fields whose changes are recorded, per model.
+AUDITED = {
+    PharmacyUser: ['username', 'first_name', 'last_name', 'email', 'role', 'branch', 'is_active', 'is_staff',
+                   'is_superuser', 'password'],
+    Role: ['name', 'description'],
+    Medicine: ['code', 'item_description', 'category', 'unit_price', 'selling_price', 'quantity',
+               'displayed_quantity', 'expiry_date', 'deleted_at'],
+}
+# Recorded as changed, never with their values.
+SECRET = {'password'}
+HIDDEN = '***'
+
+_request = ContextVar('pharmacy_audit_request', default=None)
+
+_buffer = []
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_writer = None
+
+
+def activate(request):
+    """Attribute changes made from here on to `request`'s user."""
+    return _request.set(request)
+
+
+def deactivate(token):
+    _request.reset(token)
+
+
+def connect():
+    for model in AUDITED:
+        post_init.connect(remember, sender=model, dispatch_uid=f'audit_init_{model.__name__}')
+        post_save.connect(saved, sender=model, dispatch_uid=f'audit_save_{model.__name__}')
+        post_delete.connect(deleted, sender=model, dispatch_uid=f'audit_delete_{model.__name__}')
+
+
+def disconnect():
+    for model in AUDITED:
+        post_init.disconnect(sender=model, dispatch_uid=f'audit_init_{model.__name__}')
+        post_save.disconnect(sender=model, dispatch_uid=f'audit_save_{model.__name__}')
+        post_delete.disconnect(sender=model, dispatch_uid=f'audit_delete_{model.__name__}')
+
+
+@functools.cache
+def _fields(model):
+    return [model._meta.get_field(name) for name in AUDITED[model]]
+
+
+def remember(sender, instance, **kwargs):
+    # Deferred fields are missing from __dict__ and left out of the diff.
+    values = instance.__dict__
+    instance._audit_values = {
+        field.attname: values[field.attname] for field in _fields(sender) if field.attname in values
+    }
+
+
+def saved(sender, instance, created, update_fields=None, **kwargs):
+    before = getattr(instance, '_audit_values', {})
+    after, changes = {}, {}
+    for field in _fields(sender):
+        if update_fields is not None and field.name not in update_fields:
+            continue
+        new = instance.__dict__.get(field.attname)
+        after[field.attname] = new
+        if created:
+            changes[field.name] = [None, _shown(field, new)]
+            continue
+        if field.attname not in before:
+            continue
+        old = before[field.attname]
+        # A form or view may have set 10 where the database returned Decimal('10.00').
+        if old != new and field.to_python(old) != field.to_python(new):
+            changes[field.name] = [_shown(field, old), _shown(field, new)]
+    before.update(after)
+    instance._audit_values = before
+    if changes:
+        _record(instance, AuditEntry.CREATE if created else AuditEntry.UPDATE, changes)
+
+
+def updated(instance, **changes):
+    """Record changes made with a queryset update(), which sends no signals.
+
+    `changes` maps field names to (old, new) values.
+    """
+    fields = {field.name: field for field in _fields(type(instance))}
+    _record(instance, AuditEntry.UPDATE, {
+        name: [_shown(fields[name], old), _shown(fields[name], new)] for name, (old, new) in changes.items()
+    })
+    getattr(instance, '_audit_values', {}).update(
+        (fields[name].attname, new) for name, (old, new) in changes.items()
+    )
+
+
+def deleted(sender, instance, **kwargs):
+    before = getattr(instance, '_audit_values', {})
+    _record(instance, AuditEntry.DELETE, {
+        field.name: [_shown(field, before[field.attname]), None]
+        for field in _fields(sender) if field.attname in before
+    })
+
+
+def _shown(field, value):
+    if field.name in SECRET:
+        return HIDDEN if value else None
+    return field.to_python(value)
+
+
+def _record(instance, action, changes):
+    request = _request.get()
+    user = getattr(request, 'user', None)
+    if user is not None and not user.is_authenticated:
+        user = None
+    entry = AuditEntry(
+        model=instance._meta.label_lower, object_id=str(instance.pk), object_repr=str(instance)[:200],
+        action=action, changes=changes, user_id=user and user.pk, username=user.get_username() if user else '',
+        created_at=timezone.now(),
+    )
+    # Outside a transaction this runs at once.
+    transaction.on_commit(functools.partial(_add, entry))
+
+
+def _add(entry):
+    with _lock:
+        _buffer.append(entry)
+        full = len(_buffer) >= settings.AUDIT_BATCH_SIZE
+    if settings.AUDIT_FLUSH_INTERVAL <= 0:
+        if full:
+            flush()
+        return
+    _start_writer()
+    if full:
+        _wake.set()
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_forever, name='audit-writer', daemon=True)
+            _writer.start()
+
+
+def _write_forever():
+    while True:
+        _wake.wait(settings.AUDIT_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            # The entries went back in the buffer; the next pass retries them.
+            logger.exception('Writing %d audit entries failed', pending())
+
+
+def pending():
+    return len(_buffer)
+
+
+def flush():
+    """Write every waiting entry now, in order; returns how many were written."""
+    # One writer at a time, so batches reach the table in the order made.
+    with _flush_lock:
+        with _lock:
+            batch = _buffer[:]
+            del _buffer[:]
+        if not batch:
+            return 0
+        try:
+            AuditEntry.objects.bulk_create(batch, batch_size=settings.AUDIT_BATCH_SIZE)
+        except Exception:
+            with _lock:
+                _buffer[:0] = batch
+            raise
+        return len(batch)
+
+
+def _after_fork():
+    # The parent keeps its buffer and writes it; the child starts empty,
+    # with fresh locks in case the fork came while one was held.
+    global _lock, _flush_lock, _writer
+    _buffer.clear()
+    _lock, _flush_lock, _writer = threading.Lock(), threading.Lock(), None
+    _wake.clear()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Lost %d audit entries at exit', pending())
+
+
+atexit.register(_flush_at_exit)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
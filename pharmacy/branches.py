@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.utils import timezone
+
+from . import archive, audit, sync
+from .models import BranchStock, Medicine, StockTransfer
+
+
+class InsufficientStock(ValueError):
+    pass
+
+
+def scoped(queryset, user):
+    """Limit a queryset with a branch column to the user's branch.
+
+    Staff without a branch (head office) see every branch.
+    """
+    if user.branch_id:
+        return queryset.filter(branch_id=user.branch_id)
+    return queryset
+
+
+def transfer(medicine, from_branch, to_branch, quantity, user=None):
+    """Move units between branches: both stock rows change or neither does."""
+    if from_branch.pk == to_branch.pk:
+        raise ValueError('A transfer needs two different branches')
+    with transaction.atomic():
+        if not BranchStock.remove(from_branch.pk, medicine.pk, quantity):
+            raise InsufficientStock(f'{from_branch} holds fewer than {quantity} units of {medicine.code}')
+        BranchStock.add(to_branch.pk, medicine.pk, quantity)
+        return StockTransfer.objects.create(
+            medicine=medicine, from_branch=from_branch, to_branch=to_branch,
+            quantity=quantity, created_by=user,
+        )
+
+
+def adjust_stock(medicine, units):
+    """Add `units` (negative to take them) to the chain-wide stock of `medicine`.
+
+    One guarded UPDATE, like BranchStock.remove: concurrent checkouts can
+    neither overwrite each other's change nor take more than is there.
+    False, with nothing changed, if it holds too few. The instance is
+    refreshed and the change audited, as save() would have.
+    """
+    rows = Medicine.all_objects.filter(pk=medicine.pk)
+    if units < 0:
+        rows = rows.filter(quantity__gte=-units)
+    changed = rows.update(
+        quantity=F('quantity') + units,
+        # SET reads the old quantity.
+        is_low_stock=ExpressionWrapper(Q(quantity__lte=F('displayed_quantity') - units), output_field=BooleanField()),
+        updated_at=timezone.now(),
+    )
+    if not changed:
+        return False
+    medicine.refresh_from_db(fields=['quantity', 'is_low_stock', 'updated_at'])
+    audit.updated(medicine, quantity=(medicine.quantity - units, medicine.quantity))
+    return True
+
+
+def record_sale(sale):
+    """Save a new sale and take its units from stock, central and branch."""
+    medicine = sale.medicine
+    with transaction.atomic():
+        # The branch first: if either fails, `medicine` is left as it was.
+        if sale.branch_id and not BranchStock.remove(sale.branch_id, medicine.pk, sale.quantity):
+            raise InsufficientStock('Insufficient stock at this branch!')
+        if not adjust_stock(medicine, -sale.quantity):
+            raise InsufficientStock('Insufficient stock!')
+        sale.save()
+        sync.queue(sale)
+    return sale
+
+
+def cancel_sale(sale, user=None):
+    """Delete a sale and put its units back where they came from.
+
+    The sale is kept in the archive, marked deleted by `user`.
+    """
+    with transaction.atomic():
+        adjust_stock(sale.medicine, sale.quantity)
+        if sale.branch_id:
+            BranchStock.add(sale.branch_id, sale.medicine_id, sale.quantity)
+        archive.discard(sale, user)
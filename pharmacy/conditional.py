@@ -0,0 +1,77 @@
+"""Conditional GET for HTML pages.
+
+A page's ETag is built from a cheap summary of the rows it shows (their
+count and newest updated_at, read in one aggregate query) plus whatever
+else goes into its HTML: the user, their CSRF cookie and today's date.
+When the browser already holds the current page, the view answers 304
+before running its own queries or rendering anything.
+
+This relies on every write to a shown row bumping its updated_at. save()
+does that through auto_now; queryset updates have to set it themselves.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def etag(request, *parts):
+    """A weak ETag for this user's view of a page described by `parts`.
+
+    None when the page has to be rendered anyway: messages waiting to be
+    shown are consumed by rendering.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    key = '|'.join(str(part) for part in (
+        request.user.pk, request.user.updated_at, request.META.get('CSRF_COOKIE', ''),
+        timezone.localdate(), *parts,
+    ))
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def list_etag(request, queryset, *also_latest):
+    """ETag of a page listing `queryset`, from one aggregate over it.
+
+    `also_latest` names further timestamps the page shows, such as those of
+    related rows.
+    """
+    summary = queryset.order_by().aggregate(
+        count=Count('pk'), latest=Max('updated_at'),
+        **{f'latest_{i}': Max(field) for i, field in enumerate(also_latest)},
+    )
+    return etag(request, *summary.values())
+
+
+def detail_validators(request, queryset, *timestamps):
+    """(ETag, Last-Modified) of a page showing the one row in `queryset`.
+
+    `timestamps` are the updated_at fields, on the row and the related rows
+    shown with it, read in one query. Both are None when the row does not
+    exist, so the view's own 404 handling applies.
+    """
+    values = queryset.values_list(*timestamps).first()
+    if values is None:
+        return None, None
+    return etag(request, *values), max(value for value in (*values, request.user.updated_at) if value)
+
+
+def respond(request, render_page, etag, last_modified=None):
+    """304 if the client's copy is current, else render_page(); validators set either way."""
+    if etag is None:
+        return render_page()
+    last_modified = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = render_page()
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Per-user pages: keep them out of shared caches and have the
+        # browser revalidate on every visit rather than guess freshness.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,68 @@
+"""Minimal five-field cron expressions: minute hour day-of-month month day-of-week.
+
+Each field accepts `*`, numbers, ranges (`1-5`), lists (`1,15`) and steps
+(`*/15`, `0-30/10`). Day-of-week runs 0-6 from Sunday (7 is also Sunday).
+As in cron, when both day fields are restricted a day matching either runs.
+"""
+from datetime import timedelta
+
+FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        expression, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if expression == '*':
+            start, end = low, high
+        elif '-' in expression:
+            start, end = map(int, expression.split('-'))
+        else:
+            start = end = int(expression)
+            if step > 1:
+                end = high
+        if not (low <= start <= end <= high) or step < 1:
+            raise ValueError(f'Invalid cron field {text!r}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    def __init__(self, spec):
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron spec needs five fields: {spec!r}')
+        self.spec = spec
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_field(text, low, high) for text, (low, high) in zip(fields, FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.spec
+
+    def matches_day(self, moment):
+        in_month = moment.day in self.days
+        # Python counts Monday as 0; cron counts Sunday as 0.
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """First matching minute strictly after `moment` (an aware local datetime)."""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months or not self.matches_day(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f'Cron spec never matches: {self.spec!r}')
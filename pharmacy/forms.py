@@ -1,6 +1,12 @@
+from datetime import timedelta
+
 from django import forms
+from django.db.models import Q
+from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
-from .models import Medicine, Sale, MedicineInventory, Role, PharmacyUser
+from .models import Medicine, Sale, MedicineInventory, Role, PharmacyUser, Branch, StockTake, PriceUpdate, Shift
+from . import analytics, audit, receipts
 
 class CustomAuthenticationForm(AuthenticationForm):
     username = forms.CharField(widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Username'}))
@@ -23,8 +29,9 @@ class UserRegistrationForm(UserCreationForm):
 
     class Meta:
         model = PharmacyUser
-        fields = ('username', 'email', 'role', 'first_name', 'last_name')
+        fields = ('username', 'email', 'role', 'branch', 'first_name', 'last_name')
         widgets = {
+            'branch': forms.Select(attrs={'class': 'form-control'}),
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
             'first_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -57,8 +64,9 @@ class UserUpdateForm(forms.ModelForm):
 
     class Meta:
         model = PharmacyUser
-        fields = ('username', 'email', 'role', 'first_name', 'last_name', 'is_active')
+        fields = ('username', 'email', 'role', 'branch', 'first_name', 'last_name', 'is_active')
         widgets = {
+            'branch': forms.Select(attrs={'class': 'form-control'}),
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
             'first_name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -80,10 +88,12 @@ class UserUpdateForm(forms.ModelForm):
 class MedicineForm(forms.ModelForm):
     class Meta:
         model = Medicine
-        fields = ['code', 'item_description', 'quantity', 'unit_price', 'selling_price', 'expiry_date', 'displayed_quantity']
+        fields = ['code', 'item_description', 'category', 'quantity', 'unit_price', 'selling_price', 'expiry_date',
+                  'displayed_quantity']
         widgets = {
             'code': forms.TextInput(attrs={'class': 'form-control', 'readonly': 'readonly'}),
             'item_description': forms.TextInput(attrs={'class': 'form-control'}),
+            'category': forms.TextInput(attrs={'class': 'form-control'}),
             'quantity': forms.NumberInput(attrs={'class': 'form-control'}),
             'unit_price': forms.NumberInput(attrs={'class': 'form-control'}),
             'selling_price': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -101,6 +111,13 @@ class SaleForm(forms.ModelForm):
             'total_price': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Not deleted medicines, but a sale being edited keeps its own.
+        self.fields['medicine'].queryset = Medicine.all_objects.filter(
+            Q(deleted_at__isnull=True) | Q(pk=self.instance.medicine_id)
+        )
+
     def clean(self):
         cleaned_data = super().clean()
         medicine = cleaned_data.get('medicine')
@@ -116,14 +133,19 @@ class SaleForm(forms.ModelForm):
 class MedicineInventoryForm(forms.ModelForm):
     class Meta:
         model = MedicineInventory
-        fields = ['medicine', 'quantity', 'unit_price', 'total_price']
+        fields = ['medicine', 'branch', 'quantity', 'unit_price', 'total_price']
         widgets = {
             'medicine': forms.Select(attrs={'class': 'form-control'}),
+            'branch': forms.Select(attrs={'class': 'form-control'}),
             'quantity': forms.NumberInput(attrs={'class': 'form-control'}),
             'unit_price': forms.NumberInput(attrs={'class': 'form-control'}),
             'total_price': forms.NumberInput(attrs={'class': 'form-control', 'readonly': 'readonly'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['medicine'].queryset = Medicine.objects.all()
+
     def clean(self):
         cleaned_data = super().clean()
         quantity = cleaned_data.get('quantity')
@@ -142,3 +164,178 @@ class RoleForm(forms.ModelForm):
             'name': forms.Select(attrs={'class': 'form-control'}, choices=Role.ROLE_CHOICES),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
+
+class BranchForm(forms.ModelForm):
+    class Meta:
+        model = Branch
+        fields = ['code', 'name', 'address']
+        widgets = {
+            'code': forms.TextInput(attrs={'class': 'form-control'}),
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'address': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+        }
+
+class StockTransferForm(forms.Form):
+    medicine = forms.ModelChoiceField(
+        queryset=Medicine.objects.order_by('code'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    from_branch = forms.ModelChoiceField(
+        queryset=Branch.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    to_branch = forms.ModelChoiceField(
+        queryset=Branch.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    quantity = forms.IntegerField(min_value=1, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+    def __init__(self, *args, branch=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Branch staff can only send stock out of their own branch.
+        if branch is not None:
+            self.fields['from_branch'].queryset = Branch.objects.filter(pk=branch.pk)
+            self.fields['from_branch'].initial = branch
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('from_branch') and cleaned_data.get('from_branch') == cleaned_data.get('to_branch'):
+            raise forms.ValidationError('Choose two different branches.')
+        return cleaned_data
+
+class StockTakeForm(forms.ModelForm):
+    class Meta:
+        model = StockTake
+        fields = ['branch', 'note']
+        widgets = {
+            'branch': forms.Select(attrs={'class': 'form-control'}),
+            'note': forms.TextInput(attrs={'class': 'form-control'}),
+        }
+
+class ShiftOpenForm(forms.ModelForm):
+    class Meta:
+        model = Shift
+        fields = ['opening_cash']
+        widgets = {
+            'opening_cash': forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'step': '0.01'}),
+        }
+
+class ShiftCloseForm(forms.ModelForm):
+    class Meta:
+        model = Shift
+        fields = ['counted_cash']
+        widgets = {
+            'counted_cash': forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'step': '0.01'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['counted_cash'].required = True
+
+class StockCountUploadForm(forms.Form):
+    file = forms.FileField(
+        required=False,
+        help_text='CSV with "code,count" lines, or scanner output with one code per unit',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control'})
+    )
+    lines = forms.CharField(
+        required=False,
+        label='Or type / scan here',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 6, 'autofocus': True})
+    )
+    replace = forms.BooleanField(
+        required=False,
+        label='Replace earlier counts of the same items instead of adding to them',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('file') and not cleaned_data.get('lines', '').strip():
+            raise forms.ValidationError('Upload a file or enter some counts.')
+        return cleaned_data
+
+    def count_lines(self):
+        if self.cleaned_data.get('file'):
+            # utf-8-sig drops the byte order mark spreadsheet exports start with.
+            return self.cleaned_data['file'].read().decode('utf-8-sig').splitlines()
+        return self.cleaned_data['lines'].splitlines()
+
+class PriceUpdateForm(forms.ModelForm):
+    categories = forms.MultipleChoiceField(
+        required=False,
+        help_text='Leave empty to reprice every medicine',
+        widget=forms.SelectMultiple(attrs={'class': 'form-control', 'size': 6})
+    )
+
+    class Meta:
+        model = PriceUpdate
+        fields = ['categories', 'markup_percent', 'rounding', 'note']
+        labels = {'markup_percent': 'Markup on unit price (%)', 'rounding': 'Round to nearest'}
+        widgets = {
+            'markup_percent': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'rounding': forms.Select(attrs={'class': 'form-control'}),
+            'note': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. supplier price list, March'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['categories'].choices = [
+            (category, category)
+            for category in Medicine.objects.exclude(category='').order_by('category')
+                                            .values_list('category', flat=True).distinct()
+        ]
+
+    def clean_markup_percent(self):
+        markup = self.cleaned_data['markup_percent']
+        if markup <= -100:
+            raise forms.ValidationError('A markup of -100% or less would price medicines at nothing.')
+        return markup
+
+class SalesAnalyticsForm(forms.Form):
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    period = forms.ChoiceField(required=False, choices=[('', 'None')] + [(name, name) for name in analytics.PERIODS])
+    group = forms.MultipleChoiceField(required=False, choices=[(name, name) for name in analytics.DIMENSIONS])
+    branch = forms.ModelChoiceField(required=False, queryset=Branch.objects.all())
+    order = forms.ChoiceField(required=False, choices=[(name, name) for name in analytics.METRICS])
+    top = forms.IntegerField(required=False, min_value=1, max_value=settings.ANALYTICS_MAX_ROWS)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Like the sales report, default to the current month.
+        start = cleaned_data.get('start_date') or timezone.localdate().replace(day=1)
+        end = cleaned_data.get('end_date') or (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        if end < start:
+            raise forms.ValidationError('The end date is before the start date.')
+        cleaned_data.update(start_date=start, end_date=end, period=cleaned_data.get('period') or None,
+                            order=cleaned_data.get('order') or 'amount')
+        return cleaned_data
+
+class ReceiptForm(forms.Form):
+    format = forms.ChoiceField(required=False, choices=[(name, name) for name in receipts.FORMATS])
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'text'
+
+class ReceiptReprintForm(ReceiptForm):
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    shift = forms.IntegerField(required=False, min_value=1)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # A shift's receipts, or those of a date range: today unless given.
+        start = cleaned_data.get('start_date') or timezone.localdate()
+        end = cleaned_data.get('end_date') or start
+        if end < start:
+            raise forms.ValidationError('The end date is before the start date.')
+        cleaned_data.update(start_date=start, end_date=end)
+        return cleaned_data
+
+class AuditLogForm(forms.Form):
+    model = forms.ChoiceField(required=False, choices=[('', 'All')] + [
+        (model._meta.label_lower, model._meta.verbose_name.capitalize()) for model in audit.AUDITED
+    ])
+    object_id = forms.CharField(required=False, max_length=64)
+    username = forms.CharField(required=False, max_length=150)
@@ -0,0 +1,185 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(name, user=None, max_attempts=None, **kwargs):
+    if name not in settings.JOB_TASKS:
+        raise ValueError(f'Unknown job: {name}')
+    return Job.objects.create(
+        name=name, kwargs=kwargs, created_by=user,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def start(name, worker, **kwargs):
+    """Create a job already running under `worker`, for a caller that runs it itself.
+
+    No worker can claim it first, as it could a queued one; it gets one attempt.
+    """
+    if name not in settings.JOB_TASKS:
+        raise ValueError(f'Unknown job: {name}')
+    now = timezone.now()
+    return Job.objects.create(
+        name=name, kwargs=kwargs, status=Job.RUNNING, worker=worker, attempts=1, max_attempts=1,
+        started_at=now, heartbeat_at=now,
+    )
+
+
+def claim(worker, job_id=None):
+    """Mark the oldest runnable job (or the given one) as ours and return it, or None.
+
+    The conditional UPDATE only succeeds for one worker per job, so racing
+    workers simply move on to the next candidate.
+    """
+    now = timezone.now()
+    if job_id is not None:
+        candidates = [job_id]
+    else:
+        candidates = list(
+            Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id').values_list('id', flat=True)[:10]
+        )
+    for job_id in candidates:
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+@contextmanager
+def heartbeat(job):
+    """Refresh the job's heartbeat every JOB_HEARTBEAT_INTERVAL seconds from a
+    thread, so a task that reports rarely is not taken for a dead worker's."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+                        heartbeat_at=timezone.now(),
+                    )
+                except DatabaseError:
+                    # The task itself may hold the write lock (a VACUUM);
+                    # the next beat tries again.
+                    logger.warning('Heartbeat of job %s failed', job, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job):
+    """Run a claimed job, then record success, a retry or the final failure.
+
+    The outcome is only recorded while the job is still ours: one requeued
+    as stale in the meantime belongs to whoever claimed it next.
+    """
+    ours = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+    try:
+        task = import_string(settings.JOB_TASKS[job.name])
+        with heartbeat(job):
+            result = task(job, **job.kwargs)
+    except Exception:
+        logger.exception('Job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts)
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+            recorded = ours.update(
+                status=Job.QUEUED, run_after=now + delay, worker='', error=traceback.format_exc(),
+            )
+        else:
+            recorded = ours.update(
+                status=Job.FAILED, finished_at=now, error=traceback.format_exc(),
+            )
+        if not recorded:
+            logger.warning('Job %s was taken from %s before it failed', job, job.worker)
+        return False
+    recorded = ours.update(
+        status=Job.SUCCEEDED, result=result, progress=100, finished_at=timezone.now(),
+    )
+    if not recorded:
+        logger.warning('Job %s was taken from %s before it finished; its result is dropped', job, job.worker)
+    return bool(recorded)
+
+
+def requeue_stale():
+    """Put back jobs whose worker stopped sending heartbeats (e.g. it was killed)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=timezone.now(), error='Worker stopped responding',
+    )
+    requeued = stale.update(status=Job.QUEUED, worker='', run_after=timezone.now())
+    return requeued + failed
+
+
+def work(worker, should_stop, poll_interval=1.0, burst=False):
+    """Claim and run jobs until should_stop() is true (or, with burst, the queue is empty)."""
+    processed = 0
+    last_stale_check = 0
+    while not should_stop():
+        # Jobs are the worker's equivalent of requests: drop broken or
+        # expired connections between them.
+        close_old_connections()
+        if time.monotonic() - last_stale_check > 60:
+            requeue_stale()
+            last_stale_check = time.monotonic()
+        job = claim(worker)
+        if job is not None:
+            run(job)
+            processed += 1
+        elif burst:
+            break
+        else:
+            time.sleep(poll_interval)
+    return processed
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def worker_process(stop_event, poll_interval, burst):
+    """Entry point of each `run_workers` child process."""
+    import django
+
+    # A no-op when forked from the management command; needed under spawn.
+    django.setup()
+    # Ctrl+C reaches the whole process group; let the parent decide and stop
+    # us through the event so the current job can finish.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        work(worker_name(), stop_event.is_set, poll_interval, burst)
+    finally:
+        # multiprocessing exits children without running atexit.
+        from . import audit
+
+        audit.flush()
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Medicine
+
+
+def purge_expired_sessions(batch_size=1000):
+    # Cookie-based sessions keep nothing in the database.
+    if settings.SESSION_ENGINE.endswith('signed_cookies'):
+        return 0
+
+    # Delete in short transactions so a large backlog never holds the SQLite
+    # write lock long enough to stall a checkout.
+    now = timezone.now()
+    deleted = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now)
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return deleted
+        with transaction.atomic():
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+
+
+def optimize_database(vacuum=False):
+    """Refresh planner statistics, fold the WAL back into the database and
+    optionally rebuild the file to reclaim space left by deleted rows."""
+    if connection.vendor != 'sqlite':
+        return {}
+    result = {}
+    with connection.cursor() as cursor:
+        # A sampled ANALYZE keeps this to well under a second on large
+        # tables; the planner only needs rough row counts per index.
+        cursor.execute('PRAGMA analysis_limit = 1000')
+        cursor.execute('ANALYZE')
+        cursor.execute('PRAGMA optimize')
+        if vacuum:
+            cursor.execute('VACUUM')
+        cursor.execute('PRAGMA journal_mode')
+        if cursor.fetchone()[0] == 'wal':
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            busy, log_pages, checkpointed = cursor.fetchone()
+            result.update(wal_busy=bool(busy), wal_pages=log_pages, checkpointed=checkpointed)
+        cursor.execute('PRAGMA page_count')
+        page_count = cursor.fetchone()[0]
+        cursor.execute('PRAGMA freelist_count')
+        result.update(pages=page_count, free_pages=cursor.fetchone()[0], vacuumed=vacuum)
+    return result
+
+
+def refresh_medicine_status(today=None):
+    """Bring the Medicine status flags in line with today's date.
+
+    save() keeps them right for edits; this catches the date rolling over
+    and bulk writes that bypass save(). Only rows whose flag changes are
+    written, so a nightly run touches a handful of rows.
+    """
+    today = today or timezone.localdate()
+    conditions = {
+        'is_expired': Q(expiry_date__lt=today),
+        'is_expiring': Q(expiry_date__gt=today,
+                         expiry_date__lte=today + timedelta(days=settings.EXPIRING_SOON_DAYS)),
+        'is_low_stock': Q(quantity__lte=F('displayed_quantity')),
+    }
+    changed = 0
+    # updated_at too, so conditional GETs of the medicine lists see the change.
+    now = timezone.now()
+    with transaction.atomic():
+        for flag, condition in conditions.items():
+            changed += Medicine.objects.filter(condition, **{flag: False}).update(**{flag: True, 'updated_at': now})
+            changed += Medicine.objects.filter(~condition, **{flag: True}).update(**{flag: False, 'updated_at': now})
+    return changed
+
+
+def ensure_medicine_status():
+    """Refresh the status flags once a day even when no scheduler is running."""
+    today = timezone.localdate()
+    if cache.add(f'medicine-status:{today}', True, 60 * 60 * 24 * 2):
+        refresh_medicine_status(today)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pharmacy import archive
+
+
+class Command(BaseCommand):
+    help = ('Moves sales older than ARCHIVE_AFTER_DAYS out of the Sale table into the archive, '
+            'in short transactions; reports still include them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Archive sales made more than N days ago (default: %(default)s)')
+        parser.add_argument('--chunk-size', type=int, default=settings.ARCHIVE_CHUNK_SIZE,
+                            help='Sales moved per transaction (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        progress = None
+        if options['verbosity'] > 1:
+            progress = lambda moved: self.stdout.write(f'{moved} sales archived')
+        before = timezone.now() - timedelta(days=options['days'])
+        moved = archive.archive(before, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} sales made before {before:%Y-%m-%d %H:%M}'))
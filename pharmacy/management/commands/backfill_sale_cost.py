@@ -0,0 +1,23 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from pharmacy import analytics
+
+
+class Command(BaseCommand):
+    help = ('Records a unit cost on sales made before costs were kept, from the last inventory receipt '
+            'before each sale, then rebuilds the sales rollups')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-rollup', action='store_true',
+                            help='Leave the rollups as they are; run rebuild_sales_rollup later')
+
+    def handle(self, *args, **options):
+        progress = None
+        if options['verbosity'] > 1:
+            progress = lambda filled: self.stdout.write(f'{filled} sales filled')
+        filled = analytics.backfill_unit_cost(options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f'Filled in the unit cost of {filled} sales'))
+        if filled and not options['skip_rollup']:
+            call_command('rebuild_sales_rollup', stdout=self.stdout)
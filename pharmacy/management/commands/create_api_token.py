@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy.models import ApiToken, PharmacyUser
+
+
+class Command(BaseCommand):
+    help = 'Issues a JSON API token for a user; the key is printed once and not stored'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='integration', help='What the token is for, e.g. the integration')
+
+    def handle(self, *args, **options):
+        user = PharmacyUser.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user named {options['username']}")
+        token, key = ApiToken.issue(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Token {token.name!r} for {user.username}:'))
+        self.stdout.write(key)
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pharmacy.forecasting import forecast
+
+
+class Command(BaseCommand):
+    help = 'Forecasts demand for every medicine from the daily sales rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=settings.FORECAST_HISTORY_DAYS)
+        parser.add_argument('--window', type=int, default=settings.FORECAST_WINDOW_DAYS,
+                            help='Days averaged by the moving-average forecast')
+        parser.add_argument('--alpha', type=float, default=settings.FORECAST_ALPHA,
+                            help='Exponential smoothing factor (0-1)')
+        parser.add_argument('--horizon', type=int, default=settings.FORECAST_HORIZON_DAYS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = forecast(
+            history_days=options['history_days'], window=options['window'],
+            alpha=options['alpha'], horizon=options['horizon'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Forecast {count} medicines in {time.perf_counter() - started:.2f}s'
+        ))
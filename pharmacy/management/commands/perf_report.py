@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy import perf
+
+
+class Command(BaseCommand):
+    help = 'Shows p50/p95/p99 request times per URL name from the performance log and its rotated copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.PERF_LOG_FILE)
+
+    def handle(self, *args, **options):
+        paths = perf.log_files(options['log'])
+        if not paths:
+            raise CommandError(
+                f"No performance log at {options['log']}; requests are logged there while PHARMACY_PERF_METRICS is on"
+            )
+        summary = perf.summarize(perf.read_log(*paths))
+        self.stdout.write(f"{'url name':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for row in summary:
+            self.stdout.write(
+                f"{row['url_name']:<32} {row['count']:>7} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}"
+            )
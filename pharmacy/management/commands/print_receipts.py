@@ -0,0 +1,40 @@
+import sys
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pharmacy import analytics, archive, receipts
+
+
+class Command(BaseCommand):
+    help = ("Reprints the receipts of a shift or of a range of days to a printer device or file, "
+            "as ESC/POS commands (default), plain text or PDF")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shift', type=int, help="The shift's receipts")
+        parser.add_argument('--start-date', type=date.fromisoformat, help='First day (default: today)')
+        parser.add_argument('--end-date', type=date.fromisoformat, help='Last day (default: the first)')
+        parser.add_argument('--format', choices=list(receipts.FORMATS), default='escpos')
+        parser.add_argument('--output', default='-',
+                            help="Device or file to write to, such as /dev/usb/lp0 (default: stdout)")
+
+    def handle(self, *args, **options):
+        if options['shift']:
+            lookups = {'shift_id': options['shift']}
+        else:
+            start = options['start_date'] or timezone.localdate()
+            end = options['end_date'] or start
+            if end < start:
+                raise CommandError('The end date is before the start date')
+            lookups = {'created_at__gte': analytics.day_start(start),
+                       'created_at__lt': analytics.day_start(end + timedelta(days=1))}
+        sales = archive.both(lambda sales: sales.filter(**lookups).order_by('created_at', 'pk'))
+        chunks = receipts.render(receipts.payloads(*sales), options['format'])
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from pharmacy import archive
+from pharmacy.analytics import day_start
+from pharmacy.models import CashierDailySales, DailySales, Medicine, Sale
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the daily sales rollups (per medicine and per cashier) from the Sale table '
+            'and the archived sales')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Only rebuild the most recent N days (default: all history)')
+
+    def handle(self, *args, **options):
+        rollup = DailySales.objects.all()
+        cashier_rollup = CashierDailySales.objects.all()
+        spans = archive.both(lambda sales: sales.aggregate(first=Min('created_at'), last=Max('created_at')))
+        spans = [span for span in spans if span['first']]
+        days = []
+        if spans:
+            first = timezone.localdate(min(span['first'] for span in spans))
+            last = timezone.localdate(max(span['last'] for span in spans))
+            if options['days']:
+                since = timezone.localdate() - timedelta(days=options['days'] - 1)
+                rollup = rollup.filter(date__gte=since)
+                cashier_rollup = cashier_rollup.filter(date__gte=since)
+                first = max(first, since)
+            days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+        # Sales not yet backfilled with their unit cost count at today's price.
+        unit_cost = Coalesce('unit_cost', 'medicine__unit_price')
+        totals = {
+            'total_quantity': Sum('quantity'),
+            'total_amount': Sum('total_price'),
+            'total_cost': Sum(F('quantity') * unit_cost, output_field=Medicine.unit_price.field),
+        }
+        # One day of sales by a created_at range, which the index serves;
+        # grouping on the local date of created_at instead runs Python for
+        # every sale. The bounds are placeholders: insert() runs each day.
+        now = timezone.now()
+
+        def grouped(*fields):
+            # Hot and archived sales grouped apart, under names insert() can regroup by.
+            keys = {f'group_{i}': F(field) for i, field in enumerate(fields)}
+            hot, archived = archive.both(lambda sales: sales.filter(
+                created_at__gte=now, created_at__lt=now,
+            ).order_by().values(**keys).annotate(**totals).values_list(*keys, *totals))
+            return hot.union(archived, all=True)
+
+        with transaction.atomic():
+            rollup.delete()
+            cashier_rollup.delete()
+            created = self.insert(DailySales, ['medicine_id'], days, grouped('medicine_id'))
+            cashier_created = self.insert(
+                CashierDailySales, ['branch_id', 'cashier_id'], days, grouped('branch_id', 'created_by_id'),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {created} daily sales rows and {cashier_created} cashier daily sales rows'
+        ))
+
+    def insert(self, model, keys, days, rows):
+        # INSERT ... SELECT from the grouped queries, compiled once and run
+        # for each day with that day's bounds as their only parameters. A
+        # group can have both hot and archived sales, so the two are summed.
+        if not days:
+            return 0
+        db = transaction.get_connection()
+        sql, params = rows.query.sql_with_params()
+        # Checked explicitly: an assert is gone under python -O, and the
+        # statement would then run with the wrong values bound.
+        if len(params) != 4:
+            raise CommandError(f'Expected the day bounds as the only parameters, got {len(params)}')
+        created_at = Sale._meta.get_field('created_at')
+        date = model._meta.get_field('date')
+        quote = db.ops.quote_name
+        columns = ', '.join(quote(column) for column in [*keys, 'quantity', 'amount', 'cost', 'date'])
+        groups = ', '.join(f'grouped.group_{i}' for i in range(len(keys)))
+        with db.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+                f'SELECT {groups}, SUM(grouped.total_quantity), SUM(grouped.total_amount), '
+                f'SUM(grouped.total_cost), %s FROM ({sql}) AS grouped GROUP BY {groups}',
+                [
+                    [date.get_db_prep_save(day, db),
+                     *[created_at.get_db_prep_value(day_start(day), db),
+                       created_at.get_db_prep_value(day_start(day + timedelta(days=1)), db)] * 2]
+                    for day in days
+                ],
+            )
+            return cursor.rowcount
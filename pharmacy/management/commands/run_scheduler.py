@@ -0,0 +1,63 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from pharmacy import jobs, scheduler
+from pharmacy.models import ScheduledTask
+
+
+class Command(BaseCommand):
+    help = 'Runs the maintenance tasks in settings.SCHEDULE when they are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run whatever is due now and exit')
+        parser.add_argument('--list', action='store_true',
+                            help='Show each entry with its next run and last result')
+        parser.add_argument('--run', metavar='NAME',
+                            help='Run one entry immediately, regardless of its schedule')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self.list_entries()
+        if options['run']:
+            entries = scheduler.entries()
+            if options['run'] not in entries:
+                raise CommandError(f"Unknown schedule entry: {options['run']}")
+            job = scheduler.run_entry(options['run'], entries[options['run']][1], jobs.worker_name())
+            if job is None:
+                raise CommandError('The previous run has not finished yet')
+            self.stdout.write(f'{job.name}: {job.status} {job.result or job.error}')
+            return
+        if options['once']:
+            ran = scheduler.tick(jobs.worker_name())
+            self.stdout.write(f'Ran {len(ran)} task(s)')
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: stop.set())
+        self.stdout.write(self.style.SUCCESS('Scheduler started'))
+        while not stop.is_set():
+            close_old_connections()
+            scheduler.tick(jobs.worker_name())
+            # Wake just after the next minute boundary, which is the finest
+            # granularity a cron spec can ask for.
+            now = timezone.now()
+            stop.wait(60 - now.second - now.microsecond / 1e6 + 0.5)
+        self.stdout.write('Scheduler stopped')
+
+    def list_entries(self):
+        states = ScheduledTask.objects.select_related('last_job').in_bulk(field_name='name')
+        for name, (cron, entry) in scheduler.entries().items():
+            state = states.get(name)
+            next_run = state and state.next_run_at and timezone.localtime(state.next_run_at)
+            line = f"{name:<20} {str(cron):<15} {entry['task']:<22} next {next_run or cron.next_after(timezone.localtime())}"
+            job = state and state.last_job
+            if job and job.finished_at:
+                duration = (job.finished_at - job.started_at).total_seconds()
+                line += f'  last {job.status} in {duration:.1f}s'
+            self.stdout.write(line)
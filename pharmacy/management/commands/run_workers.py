@@ -0,0 +1,47 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pharmacy import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs from the Job table until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOB_WORKERS,
+                            help='Worker processes, each running one job at a time')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help='Seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for more jobs')
+
+    def handle(self, *args, **options):
+        processes, poll_interval, burst = options['processes'], options['poll_interval'], options['burst']
+        self.stdout.write(self.style.SUCCESS(f'Starting {processes} job worker(s)'))
+
+        stop = multiprocessing.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: stop.set())
+
+        if processes <= 1:
+            processed = jobs.work(jobs.worker_name(), stop.is_set, poll_interval, burst)
+            self.stdout.write(f'Processed {processed} job(s)')
+            return
+
+        # Children must not inherit the parent's open SQLite connection.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=jobs.worker_process, args=(stop, poll_interval, burst))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            # join() in short slices so the signal handler gets to run.
+            while worker.is_alive():
+                worker.join(0.5)
+        self.stdout.write('Workers stopped')
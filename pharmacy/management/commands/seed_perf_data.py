@@ -0,0 +1,183 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from pharmacy.models import Medicine, MedicineInventory, PharmacyUser, Role, Sale
+
+FORMS = ['Tablet', 'Capsule', 'Syrup', 'Injection', 'Cream', 'Drops', 'Inhaler', 'Suspension']
+STRENGTHS = ['5mg', '10mg', '20mg', '50mg', '100mg', '250mg', '500mg', '1g', '5ml', '10ml']
+STEMS = [
+    'Amoxi', 'Parace', 'Ibupro', 'Metfor', 'Amlodi', 'Omepra', 'Cetiri', 'Azithro',
+    'Ciproflo', 'Losar', 'Atorva', 'Salbuta', 'Diclofe', 'Predni', 'Doxycy', 'Fluco',
+]
+SUFFIXES = ['cillin', 'tamol', 'fen', 'min', 'pine', 'zole', 'zine', 'mycin', 'xacin', 'tan', 'statin', 'mol']
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    # bulk_create would stamp every historic row with "now"; let the
+    # generator supply created_at/updated_at itself while seeding.
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic catalogue, sales/receipt history and users for performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medicines', type=int, default=10000)
+        parser.add_argument('--years', type=float, default=2)
+        parser.add_argument('--sales-per-day', type=int, default=200)
+        parser.add_argument('--receipts-per-day', type=int, default=20)
+        parser.add_argument('--users-per-role', type=int, default=5)
+        parser.add_argument('--password', default='perf-password',
+                            help='Password given to every generated user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--force', action='store_true',
+                            help='Seed even though the database already has medicines')
+
+    def handle(self, *args, **options):
+        if Medicine.objects.exists() and not options['force']:
+            raise CommandError('The database already contains medicines; use --force to add to it.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        days = int(options['years'] * 365)
+        start = timezone.now() - timedelta(days=days)
+
+        with explicit_timestamps(Medicine, Sale, MedicineInventory):
+            users = self.create_users(options['users_per_role'], options['password'])
+            medicines = self.create_medicines(options['medicines'], start)
+            weights = list(accumulate(self.popularity(len(medicines))))
+            sellers = [user for user in users if user.role.name in ('admin', 'cashier')]
+            receivers = [user for user in users if user.role.name in ('admin', 'inventory')]
+            sales = self.create_history(
+                Sale, medicines, weights, sellers, start, days, options['sales_per_day'], self.sale,
+            )
+            receipts = self.create_history(
+                MedicineInventory, medicines, weights, receivers, start, days,
+                options['receipts_per_day'], self.receipt,
+            )
+        # bulk_create skips Sale.save(), so build the daily rollup in one pass.
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {len(medicines)} medicines, '
+            f'{sales} sales and {receipts} inventory receipts over {days} days'
+        ))
+
+    def create_users(self, per_role, password):
+        call_command('setup_roles', stdout=io.StringIO())
+        password = make_password(password)
+        existing = PharmacyUser.objects.count()
+        users = []
+        for role in Role.objects.all():
+            for i in range(per_role):
+                users.append(PharmacyUser(
+                    username=f'perf_{role.name}_{existing + i}',
+                    first_name=role.get_name_display(),
+                    last_name=str(existing + i),
+                    password=password,
+                    role=role,
+                ))
+        PharmacyUser.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(PharmacyUser.objects.filter(username__startswith='perf_').select_related('role'))
+
+    def create_medicines(self, count, start):
+        first = Medicine.objects.count() + 1
+        last_id = Medicine.objects.aggregate(last=Max('id'))['last'] or 0
+        today = timezone.now().date()
+        batch = []
+        for number in range(first, first + count):
+            unit_price = Decimal(self.rng.randint(50, 50000)) / 100
+            medicine = Medicine(
+                code=f'HM-{str(number).zfill(3)}',
+                item_description=(
+                    f'{self.rng.choice(STEMS)}{self.rng.choice(SUFFIXES)} '
+                    f'{self.rng.choice(STRENGTHS)} {self.rng.choice(FORMS)}'
+                ),
+                quantity=self.rng.randint(0, 500),
+                displayed_quantity=self.rng.choice([5, 10, 20, 50]),
+                unit_price=unit_price,
+                selling_price=(unit_price * Decimal(self.rng.uniform(1.1, 1.6))).quantize(Decimal('0.01')),
+                # Mostly in date, some expired and some expiring within the month.
+                expiry_date=today + timedelta(days=self.rng.randint(-60, 1000)),
+                created_at=start,
+                updated_at=start,
+            )
+            # bulk_create skips save(), which sets the status flags.
+            medicine.update_status(today)
+            batch.append(medicine)
+            if len(batch) == self.batch_size:
+                self.flush(Medicine, batch)
+                batch = []
+        self.flush(Medicine, batch)
+        # (id, selling_price, unit_price) tuples keep a 1M-row catalogue in memory cheaply.
+        return list(
+            Medicine.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'selling_price', 'unit_price')
+        )
+
+    def popularity(self, count):
+        # A long tail: a few fast movers and many medicines that rarely sell.
+        return [1 / (rank + 1) ** 0.8 for rank in range(count)]
+
+    def sale(self, medicine, user, when):
+        medicine_id, selling_price, unit_price = medicine
+        quantity = self.rng.choice([1, 1, 1, 2, 2, 3, 5, 10])
+        return Sale(
+            medicine_id=medicine_id, quantity=quantity, total_price=selling_price * quantity, unit_cost=unit_price,
+            created_by=user, created_at=when, updated_at=when,
+        )
+
+    def receipt(self, medicine, user, when):
+        medicine_id, _, unit_price = medicine
+        quantity = self.rng.choice([10, 20, 50, 100, 200])
+        return MedicineInventory(
+            medicine_id=medicine_id, quantity=quantity, unit_price=unit_price,
+            total_price=unit_price * quantity,
+            created_by=user, created_at=when, updated_at=when,
+        )
+
+    def create_history(self, model, medicines, weights, users, start, days, per_day, build):
+        total = 0
+        batch = []
+        for day in range(days):
+            date = (start + timedelta(days=day)).date()
+            count = max(0, int(self.rng.gauss(per_day, per_day * 0.2)))
+            chosen = self.rng.choices(medicines, cum_weights=weights, k=count)
+            for medicine in chosen:
+                seconds = self.rng.randint(8 * 3600, 20 * 3600)
+                when = timezone.make_aware(datetime.combine(date, time()) + timedelta(seconds=seconds))
+                batch.append(build(medicine, self.rng.choice(users), when))
+            if len(batch) >= self.batch_size:
+                total += self.flush(model, batch)
+                batch = []
+        return total + self.flush(model, batch)
+
+    def flush(self, model, batch):
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+        return len(batch)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from pharmacy.server import serve, warm_up
+
+
+class Command(BaseCommand):
+    help = 'Runs the application under the embedded production WSGI server (waitress)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=settings.SERVER_HOST)
+        parser.add_argument('--port', type=int, default=settings.SERVER_PORT)
+        parser.add_argument('--threads', type=int, default=settings.SERVER_THREADS,
+                            help='Request handler threads per process')
+        parser.add_argument('--processes', type=int, default=settings.SERVER_PROCESSES,
+                            help='Worker processes sharing the socket (POSIX only)')
+        parser.add_argument('--connection-limit', type=int, default=settings.SERVER_CONNECTION_LIMIT,
+                            help='Open connections per process before new ones wait in the backlog')
+        parser.add_argument('--backlog', type=int, default=settings.SERVER_BACKLOG,
+                            help='Connections queued by the OS before clients are refused')
+        parser.add_argument('--keep-alive', type=int, default=settings.SERVER_KEEP_ALIVE,
+                            help='Seconds an idle keep-alive connection is held open')
+        parser.add_argument('--shutdown-timeout', type=int, default=settings.SERVER_SHUTDOWN_TIMEOUT,
+                            help='Seconds to wait for in-flight requests on SIGINT/SIGTERM')
+
+    def handle(self, *args, **options):
+        application = get_wsgi_application()
+        warm_up(application)
+        self.stdout.write(self.style.SUCCESS(
+            f"Serving on http://{options['host']}:{options['port']}/ "
+            f"({options['processes']} process(es) x {options['threads']} threads)"
+        ))
+        serve(
+            application,
+            host=options['host'],
+            port=options['port'],
+            processes=options['processes'],
+            threads=options['threads'],
+            connection_limit=options['connection_limit'],
+            backlog=options['backlog'],
+            channel_timeout=options['keep_alive'],
+            shutdown_timeout=options['shutdown_timeout'],
+        )
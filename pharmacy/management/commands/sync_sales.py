@@ -0,0 +1,41 @@
+import urllib.error
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy import sync
+from pharmacy.models import SyncOutbox
+
+
+class Command(BaseCommand):
+    help = 'Sends sales recorded at this branch to the central server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SYNC_BATCH_SIZE)
+        parser.add_argument('--status', action='store_true',
+                            help='Only show how many sales are pending, sent and rejected')
+        parser.add_argument('--retry-rejected', action='store_true',
+                            help='Queue sales the server rejected again (e.g. after adding a missing medicine)')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.stdout.write(
+                f'{sync.pending().count()} pending, '
+                f'{SyncOutbox.objects.filter(sent_at__isnull=False).count()} sent, '
+                f"{SyncOutbox.objects.exclude(error='').count()} rejected"
+            )
+            return
+        if options['retry_rejected']:
+            retried = SyncOutbox.objects.exclude(error='').update(error='')
+            self.stdout.write(f'Requeued {retried} rejected sales')
+
+        try:
+            totals = sync.push(batch_size=options['batch_size'])
+        except sync.SyncError as error:
+            raise CommandError(str(error))
+        except (urllib.error.URLError, OSError) as error:
+            raise CommandError(f'Central server unreachable, {sync.pending().count()} sales still queued: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {totals.get('accepted', 0)} sales "
+            f"({totals.get('duplicates', 0)} already known, {totals.get('rejected', 0)} rejected)"
+        ))
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacy import pricing
+from pharmacy.models import PriceUpdate
+
+
+class Command(BaseCommand):
+    help = ('Sets selling prices to unit price plus a markup; prints the changes as CSV '
+            'and changes nothing unless --apply is given')
+
+    def add_arguments(self, parser):
+        parser.add_argument('markup', type=Decimal, help='Markup on unit price, in percent')
+        parser.add_argument('--round', type=Decimal, default=Decimal('0.05'), dest='rounding',
+                            choices=[value for value, label in PriceUpdate.ROUNDING_CHOICES])
+        parser.add_argument('--category', action='append', default=[], dest='categories',
+                            help='Only medicines in this category; repeat for several (default: all)')
+        parser.add_argument('--note', default='')
+        parser.add_argument('--apply', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['markup'] <= -100:
+            raise CommandError('A markup of -100% or less would price medicines at nothing')
+        rule = PriceUpdate(
+            markup_percent=options['markup'], rounding=options['rounding'],
+            categories=options['categories'], note=options['note'],
+        )
+        if not options['apply']:
+            for line in pricing.preview_csv(rule):
+                self.stdout.write(line, ending='')
+            return
+        changed = pricing.apply(rule)
+        self.stdout.write(self.style.SUCCESS(f'Changed {changed} selling prices ({rule})'))
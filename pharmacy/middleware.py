@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import audit, perf
+
+logger = logging.getLogger('pharmacy.perf')
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, SQL time, template time and wall time for every
+    request, flags repeated SQL (N+1 patterns), and reports them in a
+    Server-Timing header and one JSON log line per request.
+
+    Removed from the stack entirely unless PERF_METRICS is on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        perf.instrument_templates()
+
+    def __call__(self, request):
+        metrics = perf.RequestMetrics()
+        token = perf.activate(metrics)
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        duration = time.perf_counter() - metrics.started
+
+        match = request.resolver_match
+        url_name = match.view_name if match else perf.UNRESOLVED
+        duplicates = metrics.duplicates(settings.PERF_DUPLICATE_THRESHOLD)
+        perf.record(url_name, duration * 1000)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+        logger.info(json.dumps({
+            'url_name': url_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_ms': round(metrics.sql_time * 1000, 2),
+            'queries': metrics.queries,
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'duplicates': duplicates,
+        }))
+        return response
+
+
+class AuditMiddleware:
+    """Attributes audited changes made while handling a request to its user.
+
+    Goes after AuthenticationMiddleware; removed unless AUDIT_ENABLED is on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.AUDIT_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = audit.activate(request)
+        try:
+            return self.get_response(request)
+        finally:
+            audit.deactivate(token)
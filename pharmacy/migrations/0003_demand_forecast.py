@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 15:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0002_daily_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('medicine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='pharmacy.medicine')),
+                ('moving_average', models.FloatField(help_text='Mean daily units over the averaging window')),
+                ('smoothed', models.FloatField(help_text='Exponentially smoothed daily units')),
+                ('horizon_days', models.IntegerField()),
+                ('expected_demand', models.FloatField(help_text='Units expected to sell over the horizon')),
+                ('generated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-19 15:59
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def set_status(apps, schema_editor):
+    Medicine = apps.get_model('pharmacy', 'Medicine')
+    today = timezone.localdate()
+    Medicine.objects.filter(expiry_date__lt=today).update(is_expired=True)
+    Medicine.objects.filter(
+        expiry_date__gt=today, expiry_date__lte=today + timedelta(days=settings.EXPIRING_SOON_DAYS),
+    ).update(is_expiring=True)
+    Medicine.objects.filter(quantity__lte=F('displayed_quantity')).update(is_low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_scheduled_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='is_expired',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='is_expiring',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='is_low_stock',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='medicine',
+            name='expiry_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.RunPython(set_status, migrations.RunPython.noop),
+    ]
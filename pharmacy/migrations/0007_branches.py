@@ -0,0 +1,105 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0006_medicine_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('address', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Branches',
+            },
+        ),
+        migrations.CreateModel(
+            name='BranchStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Branch stock',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='medicineinventory',
+            name='branch',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Leave empty for stock held centrally', null=True, on_delete=django.db.models.deletion.PROTECT, to='pharmacy.branch'),
+        ),
+        migrations.AddField(
+            model_name='pharmacyuser',
+            name='branch',
+            field=models.ForeignKey(blank=True, help_text='Leave empty for staff who work across all branches', null=True, on_delete=django.db.models.deletion.SET_NULL, to='pharmacy.branch'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='branch',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='pharmacy.branch'),
+        ),
+        migrations.AddIndex(
+            model_name='medicineinventory',
+            index=models.Index(fields=['branch', 'created_at'], name='pharmacy_me_branch__26673e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['branch', 'created_at'], name='pharmacy_sa_branch__0becb5_idx'),
+        ),
+        migrations.AddField(
+            model_name='branchstock',
+            name='branch',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='pharmacy.branch'),
+        ),
+        migrations.AddField(
+            model_name='branchstock',
+            name='medicine',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pharmacy.medicine'),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='from_branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='pharmacy.branch'),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='medicine',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='pharmacy.medicine'),
+        ),
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='to_branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='pharmacy.branch'),
+        ),
+        migrations.AddConstraint(
+            model_name='branchstock',
+            constraint=models.UniqueConstraint(fields=('branch', 'medicine'), name='unique_branch_stock'),
+        ),
+    ]
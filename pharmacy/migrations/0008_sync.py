@@ -0,0 +1,46 @@
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_uuids(apps, schema_editor):
+    Sale = apps.get_model('pharmacy', 'Sale')
+    sales = list(Sale.objects.only('pk'))
+    for sale in sales:
+        sale.uuid = uuid.uuid4()
+    Sale.objects.bulk_update(sales, ['uuid'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0007_branches'),
+    ]
+
+    operations = [
+        # Existing rows need distinct values before the column can be unique.
+        migrations.AddField(
+            model_name='sale',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sale',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.CreateModel(
+            name='SyncOutbox',
+            fields=[
+                ('sale', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='pharmacy.sale')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Sync outbox',
+                'indexes': [models.Index(condition=models.Q(('error', ''), ('sent_at__isnull', True)), fields=['sale'], name='sync_outbox_pending')],
+            },
+        ),
+    ]
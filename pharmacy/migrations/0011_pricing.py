@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:36
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0010_stock_take'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='category',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='PriceUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categories', models.JSONField(blank=True, default=list)),
+                ('markup_percent', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('rounding', models.DecimalField(choices=[(Decimal('0.01'), '0.01'), (Decimal('0.05'), '0.05'), (Decimal('0.10'), '0.10'), (Decimal('0.50'), '0.50'), (Decimal('1.00'), '1.00')], decimal_places=2, default=Decimal('0.05'), max_digits=4)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('medicines', models.PositiveIntegerField(default=0, help_text='Selling prices changed')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changed_at', models.DateTimeField()),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='pharmacy.medicine')),
+                ('price_update', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='pharmacy.priceupdate')),
+            ],
+            options={
+                'verbose_name_plural': 'Price history',
+                'indexes': [models.Index(fields=['medicine', 'changed_at'], name='pharmacy_pr_medicin_2e7ebf_idx')],
+            },
+        ),
+    ]
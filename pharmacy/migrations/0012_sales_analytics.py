@@ -0,0 +1,83 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    # Sales do not keep the unit price they were sold at; use today's.
+    DailySales = apps.get_model('pharmacy', 'DailySales')
+    CashierDailySales = apps.get_model('pharmacy', 'CashierDailySales')
+    Medicine = apps.get_model('pharmacy', 'Medicine')
+    Sale = apps.get_model('pharmacy', 'Sale')
+    unit_price = Medicine.objects.filter(pk=OuterRef('medicine_id')).values('unit_price')
+    DailySales.objects.update(cost=F('quantity') * Subquery(unit_price))
+    rows = (
+        Sale.objects.annotate(day=TruncDate('created_at')).order_by()
+        .values('branch_id', 'created_by_id', 'day')
+        .annotate(total_quantity=Sum('quantity'), total_amount=Sum('total_price'),
+                  total_cost=Sum(F('quantity') * F('medicine__unit_price'),
+                                 output_field=models.DecimalField(max_digits=12, decimal_places=2)))
+    )
+    CashierDailySales.objects.bulk_create(
+        (
+            CashierDailySales(branch_id=row['branch_id'], cashier_id=row['created_by_id'], date=row['day'],
+                              quantity=row['total_quantity'], amount=row['total_amount'], cost=row['total_cost'])
+            for row in rows.iterator()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0011_pricing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashierDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name_plural': 'Cashier daily sales',
+            },
+        ),
+        migrations.AddField(
+            model_name='dailysales',
+            name='cost',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Units sold times the unit price when they were sold', max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='dailysales',
+            index=models.Index(fields=['medicine', 'date', 'quantity', 'amount', 'cost'], name='pharmacy_da_medicin_2b4770_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at'], name='pharmacy_sa_created_5599fb_idx'),
+        ),
+        migrations.AddField(
+            model_name='cashierdailysales',
+            name='branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='pharmacy.branch'),
+        ),
+        migrations.AddField(
+            model_name='cashierdailysales',
+            name='cashier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='cashierdailysales',
+            constraint=models.UniqueConstraint(fields=('date', 'branch', 'cashier'), name='unique_cashier_daily_sales'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
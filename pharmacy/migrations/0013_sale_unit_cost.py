@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0012_sales_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='medicineinventory',
+            index=models.Index(fields=['medicine', 'created_at'], name='pharmacy_me_medicin_fa5d10_idx'),
+        ),
+    ]
@@ -1,5 +1,14 @@
-from django.db import models
+import hashlib
+import secrets
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from datetime import datetime, timedelta
 
@@ -19,8 +28,23 @@ class Role(models.Model):
     def __str__(self):
         return self.get_name_display()
 
+class Branch(models.Model):
+    code = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=100)
+    address = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name_plural = 'Branches'
+
 class PharmacyUser(AbstractUser):
     role = models.ForeignKey(Role, on_delete=models.SET_NULL, null=True)
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True, blank=True,
+                               help_text="Leave empty for staff who work across all branches")
     phone_number = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -29,32 +53,258 @@ class PharmacyUser(AbstractUser):
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})" if self.role else self.get_full_name()
 
+class ApiToken(models.Model):
+    """A key for integrations calling the JSON API as one user.
+
+    Only a hash of the key is stored; the key itself is shown once, by
+    `manage.py create_api_token`.
+    """
+    user = models.ForeignKey(PharmacyUser, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100)
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.user})"
+
+    @staticmethod
+    def hash(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name):
+        """Create a token; returns it with the plain key, which is not kept."""
+        key = secrets.token_urlsafe(32)
+        return cls.objects.create(user=user, name=name, key_hash=cls.hash(key)), key
+
+class LiveManager(models.Manager):
+    """Rows that have not been soft-deleted (deleted_at is empty)."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class Medicine(models.Model):
     code = models.CharField(max_length=10, unique=True)
     item_description = models.CharField(max_length=255)
+    category = models.CharField(max_length=100, blank=True, db_index=True)
     quantity = models.IntegerField(default=0)
     displayed_quantity = models.IntegerField(default=0, help_text="Quantity to maintain on shelf")
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
-    expiry_date = models.DateField()
+    expiry_date = models.DateField(db_index=True)
+    # Kept in step by save(); date rollover is handled by
+    # maintenance.refresh_medicine_status, run nightly by the scheduler.
+    is_expired = models.BooleanField(default=False, editable=False, db_index=True)
+    is_expiring = models.BooleanField(default=False, editable=False, db_index=True)
+    is_low_stock = models.BooleanField(default=False, editable=False, db_index=True)
+    # Set instead of deleting the row, which its sales still point to.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Deleted medicines are left out everywhere but through a sale's
+    # medicine and all_objects, which unique checks use too.
+    objects = LiveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f"{self.code} - {self.item_description}"
 
-    @property
-    def is_expired(self):
-        return self.expiry_date < timezone.now().date()
+    @classmethod
+    def next_code(cls):
+        # Deleted medicines keep their codes.
+        last_medicine = cls.all_objects.order_by('-code').first()
+        if last_medicine:
+            last_num = int(last_medicine.code.split('-')[1])
+            return f'HM-{str(last_num + 1).zfill(3)}'
+        return 'HM-001'
 
-    @property
-    def is_low_stock(self):
-        return self.quantity <= self.displayed_quantity
+    def update_status(self, today=None):
+        today = today or timezone.localdate()
+        self.is_expired = self.expiry_date < today
+        self.is_expiring = today < self.expiry_date <= today + timedelta(days=settings.EXPIRING_SOON_DAYS)
+        self.is_low_stock = self.quantity <= self.displayed_quantity
+
+    def save(self, *args, **kwargs):
+        self.update_status()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'is_expired', 'is_expiring', 'is_low_stock'}
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at', 'updated_at'])
+
+    class Meta:
+        default_manager_name = 'all_objects'
+
+class BranchStock(models.Model):
+    """Units of one medicine held at one branch.
+
+    Medicine.quantity stays the chain-wide total (branch stock plus any
+    held centrally); sales and receipts change both in one transaction and
+    transfers only move units between branches.
+    """
+    # The unique constraint below doubles as the branch index.
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, db_index=False)
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.branch} - {self.medicine_id}: {self.quantity} units"
+
+    @classmethod
+    def add(cls, branch_id, medicine_id, quantity):
+        changes = {'quantity': F('quantity') + quantity, 'updated_at': timezone.now()}
+        if cls.objects.filter(branch_id=branch_id, medicine_id=medicine_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(branch_id=branch_id, medicine_id=medicine_id, quantity=quantity)
+        except IntegrityError:
+            # Another writer created the row first.
+            cls.objects.filter(branch_id=branch_id, medicine_id=medicine_id).update(**changes)
+
+    @classmethod
+    def remove(cls, branch_id, medicine_id, quantity):
+        """Take units from a branch; False, with nothing changed, if it holds too few."""
+        return bool(cls.objects.filter(
+            branch_id=branch_id, medicine_id=medicine_id, quantity__gte=quantity,
+        ).update(quantity=F('quantity') - quantity, updated_at=timezone.now()))
+
+    class Meta:
+        verbose_name_plural = 'Branch stock'
+        constraints = [
+            # (branch_id, medicine_id) keeps one branch's rows together, so
+            # branch-scoped stock queries read a single index range.
+            models.UniqueConstraint(fields=['branch', 'medicine'], name='unique_branch_stock'),
+        ]
+
+class StockTransfer(models.Model):
+    medicine = models.ForeignKey(Medicine, on_delete=models.PROTECT)
+    from_branch = models.ForeignKey(Branch, on_delete=models.PROTECT, related_name='transfers_out')
+    to_branch = models.ForeignKey(Branch, on_delete=models.PROTECT, related_name='transfers_in')
+    quantity = models.PositiveIntegerField()
+    created_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.quantity} units {self.from_branch} -> {self.to_branch}"
+
+class StockTake(models.Model):
+    """A physical count of stock at one branch, or of stock held centrally.
+
+    Counts are collected as StockCount lines while it is open. Posting sets
+    stock to the counted quantities and records a StockAdjustment for every
+    line that differed; medicines that were not counted are left alone.
+    """
+    OPEN = 'open'
+    POSTED = 'posted'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (POSTED, 'Posted'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True,
+                               help_text="Leave empty to count stock held centrally")
+    note = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=OPEN)
+    created_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    posted_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    posted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Stock take #{self.pk} at {self.branch or 'central stock'} ({self.status})"
+
+class StockCount(models.Model):
+    stock_take = models.ForeignKey(StockTake, on_delete=models.CASCADE, related_name='counts')
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
+    counted = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.counted} counted"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stock_take', 'medicine'], name='unique_stock_count'),
+        ]
+
+class StockAdjustment(models.Model):
+    """Ledger of stock corrections that are not sales, receipts or transfers."""
+    medicine = models.ForeignKey(Medicine, on_delete=models.PROTECT)
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True)
+    stock_take = models.ForeignKey(StockTake, on_delete=models.PROTECT, null=True, blank=True,
+                                   related_name='adjustments')
+    quantity = models.IntegerField(help_text="Units added; negative for units written off")
+    quantity_before = models.IntegerField()
+    quantity_after = models.IntegerField()
+    reason = models.CharField(max_length=100)
+    created_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.quantity:+} units ({self.reason})"
+
+    class Meta:
+        indexes = [models.Index(fields=['medicine', 'created_at'])]
+
+class PriceUpdate(models.Model):
+    """A markup rule applied to selling prices, see pharmacy.pricing.
+
+    The new selling price is unit_price plus markup_percent, rounded to the
+    nearest multiple of `rounding`, for medicines in `categories` (all when
+    empty). Each price it changed is recorded as a PriceHistory row.
+    """
+    ROUNDING_CHOICES = [
+        (Decimal('0.01'), '0.01'),
+        (Decimal('0.05'), '0.05'),
+        (Decimal('0.10'), '0.10'),
+        (Decimal('0.50'), '0.50'),
+        (Decimal('1.00'), '1.00'),
+    ]
+
+    categories = models.JSONField(default=list, blank=True)
+    markup_percent = models.DecimalField(max_digits=6, decimal_places=2)
+    rounding = models.DecimalField(max_digits=4, decimal_places=2, choices=ROUNDING_CHOICES, default=Decimal('0.05'))
+    note = models.CharField(max_length=255, blank=True)
+    medicines = models.PositiveIntegerField(default=0, help_text="Selling prices changed")
+    created_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        scope = ', '.join(self.categories) or 'all categories'
+        return f"{self.markup_percent}% markup on {scope}, rounded to {self.rounding}"
+
+class PriceHistory(models.Model):
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='price_history')
+    price_update = models.ForeignKey(PriceUpdate, on_delete=models.CASCADE, related_name='changes')
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.old_price} -> {self.new_price}"
+
+    class Meta:
+        verbose_name_plural = 'Price history'
+        indexes = [models.Index(fields=['medicine', 'changed_at'])]
 
 class Sale(models.Model):
+    # Generated where the sale happens, so a branch syncing its offline
+    # sales can resend a batch without creating duplicates.
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     medicine = models.ForeignKey(Medicine, on_delete=models.PROTECT)
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True, db_index=False)
     quantity = models.IntegerField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The medicine's unit price when it was sold. Empty on sales recorded
+    # before it was kept, until backfill_sale_cost has filled them in.
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # The seller's shift that was open when the sale was recorded.
+    shift = models.ForeignKey('Shift', on_delete=models.PROTECT, null=True, blank=True, related_name='sales')
     created_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -62,13 +312,294 @@ class Sale(models.Model):
     def __str__(self):
         return f"{self.medicine.code} - {self.quantity} units"
 
+    @property
+    def cost(self):
+        unit_cost = self.unit_cost if self.unit_cost is not None else self.medicine.unit_price
+        return self.quantity * unit_cost
+
     def save(self, *args, **kwargs):
         if not self.total_price:
             self.total_price = self.medicine.selling_price * self.quantity
-        super().save(*args, **kwargs)
+        if self.unit_cost is None:
+            self.unit_cost = self.medicine.unit_price
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Sale.objects.filter(pk=self.pk).values(
+                    'medicine_id', 'branch_id', 'created_by_id', 'quantity', 'total_price', 'created_at', 'shift_id',
+                    unit_cost_then=Coalesce('unit_cost', 'medicine__unit_price'),
+                ).first()
+            elif self.created_by_id and not self.shift_id:
+                self.shift_id = Shift.objects.filter(
+                    cashier_id=self.created_by_id, closed_at__isnull=True,
+                ).values_list('pk', flat=True).first()
+            super().save(*args, **kwargs)
+            # Keep the daily rollups in step: back out the old row, add the new one.
+            if previous:
+                self.record_rollups(
+                    previous['medicine_id'], previous['branch_id'], previous['created_by_id'],
+                    previous['created_at'], -previous['quantity'], -previous['total_price'],
+                    -previous['quantity'] * previous['unit_cost_then'],
+                )
+            self.record_rollups(
+                self.medicine_id, self.branch_id, self.created_by_id, self.created_at,
+                self.quantity, self.total_price, self.cost,
+            )
+            if previous and previous['shift_id']:
+                Shift.record(previous['shift_id'], previous['medicine_id'], -1, -previous['quantity'],
+                             -previous['total_price'])
+            if self.shift_id:
+                Shift.record(self.shift_id, self.medicine_id, 1, self.quantity, self.total_price)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self.unrecord()
+            return super().delete(*args, **kwargs)
+
+    def unrecord(self):
+        """Take this sale out of the daily rollups and its shift's totals."""
+        self.record_rollups(
+            self.medicine_id, self.branch_id, self.created_by_id, self.created_at,
+            -self.quantity, -self.total_price, -self.cost,
+        )
+        if self.shift_id:
+            Shift.record(self.shift_id, self.medicine_id, -1, -self.quantity, -self.total_price)
+
+    @staticmethod
+    def record_rollups(medicine_id, branch_id, cashier_id, when, quantity, amount, cost):
+        DailySales.record(medicine_id, when, quantity, amount, cost)
+        CashierDailySales.record(branch_id, cashier_id, timezone.localdate(when), quantity, amount, cost)
+
+    class Meta:
+        indexes = [
+            # Serves branch_id lookups too, hence no index on the foreign key.
+            models.Index(fields=['branch', 'created_at']),
+            # Date ranges across all branches, e.g. the cashier analytics.
+            models.Index(fields=['created_at']),
+        ]
+
+class ArchivedSale(models.Model):
+    """A sale moved out of the Sale table by pharmacy.archive, under the same id.
+
+    Sales older than ARCHIVE_AFTER_DAYS are archived by `manage.py
+    archive_sales`; a deleted sale is archived at once, with deleted_at set.
+    The daily rollups and shift reports still count archived sales and not
+    deleted ones.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    uuid = models.UUIDField(unique=True, editable=False)
+    medicine = models.ForeignKey(Medicine, on_delete=models.PROTECT, related_name='+')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True, db_index=False,
+                               related_name='+')
+    quantity = models.IntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    shift = models.ForeignKey('Shift', on_delete=models.PROTECT, null=True, blank=True, related_name='archived_sales')
+    created_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True, related_name='+')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    deleted_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+
+    # Reports read objects; all_objects includes deleted sales.
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.medicine.code} - {self.quantity} units (archived)"
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(fields=['branch', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+class SyncOutbox(models.Model):
+    """Sales recorded at this branch that the central server has not confirmed yet.
+
+    Only used when SYNC_URL is set; `manage.py sync_sales` drains it.
+    """
+    sale = models.OneToOneField(Sale, on_delete=models.CASCADE, primary_key=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Sale {self.sale_id} ({'sent' if self.sent_at else 'pending'})"
+
+    class Meta:
+        verbose_name_plural = 'Sync outbox'
+        indexes = [
+            models.Index(fields=['sale'], name='sync_outbox_pending', condition=models.Q(sent_at__isnull=True, error='')),
+        ]
+
+class DailySales(models.Model):
+    """Units, revenue and cost sold per medicine per day.
+
+    Maintained by Sale.save()/delete(); bulk writes and queryset deletes
+    bypass those, so run `manage.py rebuild_sales_rollup` after them.
+    """
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                               help_text="Units sold times the unit price when they were sold")
+
+    def __str__(self):
+        return f"{self.medicine_id} - {self.date}: {self.quantity} units"
+
+    @classmethod
+    def record(cls, medicine_id, when, quantity, amount, cost):
+        day = timezone.localdate(when)
+        changes = {'quantity': F('quantity') + quantity, 'amount': F('amount') + amount, 'cost': F('cost') + cost}
+        if cls.objects.filter(medicine_id=medicine_id, date=day).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(medicine_id=medicine_id, date=day, quantity=quantity, amount=amount, cost=cost)
+        except IntegrityError:
+            # Another writer created the row first.
+            cls.objects.filter(medicine_id=medicine_id, date=day).update(**changes)
+
+    class Meta:
+        verbose_name_plural = 'Daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'date'], name='unique_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+            # Covers the per-medicine sums of the sales analytics, so a year
+            # of rows is read from the index alone.
+            models.Index(fields=['medicine', 'date', 'quantity', 'amount', 'cost']),
+        ]
+
+class CashierDailySales(models.Model):
+    """Units, revenue and cost sold per cashier and branch per day.
+
+    The DailySales of the cashier analytics, maintained alongside it: a few
+    dozen rows a day however many medicines were sold.
+    """
+    date = models.DateField()
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True)
+    cashier = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True, blank=True)
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.cashier_id} at {self.branch_id} - {self.date}: {self.quantity} units"
+
+    @classmethod
+    def record(cls, branch_id, cashier_id, day, quantity, amount, cost):
+        key = {'branch_id': branch_id, 'cashier_id': cashier_id, 'date': day}
+        changes = {'quantity': F('quantity') + quantity, 'amount': F('amount') + amount, 'cost': F('cost') + cost}
+        if cls.objects.filter(**key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(**key, quantity=quantity, amount=amount, cost=cost)
+        except IntegrityError:
+            cls.objects.filter(**key).update(**changes)
+
+    class Meta:
+        verbose_name_plural = 'Cashier daily sales'
+        constraints = [
+            # NULLs are distinct to the constraint, so central or anonymous
+            # sales could race to two rows for one day; that is harmless,
+            # the rollup is only ever summed.
+            models.UniqueConstraint(fields=['date', 'branch', 'cashier'], name='unique_cashier_daily_sales'),
+        ]
+
+class Shift(models.Model):
+    """A cashier's turn at the till, from opening to close-out.
+
+    Its Z-report, the totals here and a ShiftLine per medicine, is added to
+    by Sale.save()/delete() as sales are recorded, so closing a shift only
+    stamps it. A closed shift is a snapshot: record() no longer touches it,
+    and later corrections to its sales show in the other reports instead.
+    """
+    cashier = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, related_name='shifts')
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True)
+    opening_cash = models.DecimalField(max_digits=10, decimal_places=2, default=0,
+                                       help_text="Cash in the drawer when the shift opened")
+    counted_cash = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True,
+                                       help_text="Cash in the drawer at close-out")
+    opened_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    closed_by = models.ForeignKey(PharmacyUser, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    sale_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Shift #{self.pk} of {self.cashier} ({'closed' if self.closed_at else 'open'})"
+
+    @property
+    def expected_cash(self):
+        return self.opening_cash + self.amount
+
+    @property
+    def cash_difference(self):
+        if self.counted_cash is None:
+            return None
+        return self.counted_cash - self.expected_cash
+
+    @classmethod
+    def record(cls, shift_id, medicine_id, sales, quantity, amount):
+        """Add to an open shift's Z-report; negative figures back a sale out."""
+        totals = {'sale_count': F('sale_count') + sales, 'quantity': F('quantity') + quantity,
+                  'amount': F('amount') + amount}
+        if not cls.objects.filter(pk=shift_id, closed_at__isnull=True).update(**totals):
+            return
+        # The update above holds the shift's row (and SQLite's write lock),
+        # so no other sale of this shift can create the line concurrently.
+        if not ShiftLine.objects.filter(shift_id=shift_id, medicine_id=medicine_id).update(**totals):
+            ShiftLine.objects.create(shift_id=shift_id, medicine_id=medicine_id, sale_count=sales,
+                                     quantity=quantity, amount=amount)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cashier'], condition=models.Q(closed_at__isnull=True),
+                                    name='one_open_shift_per_cashier'),
+        ]
+
+class ShiftLine(models.Model):
+    """One medicine's line on a shift's Z-report."""
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name='lines')
+    medicine = models.ForeignKey(Medicine, on_delete=models.PROTECT)
+    sale_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.shift_id} - {self.medicine_id}: {self.quantity} units"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shift', 'medicine'], name='unique_shift_line'),
+        ]
+
+class DemandForecast(models.Model):
+    """Latest demand forecast per medicine, written by `manage.py forecast_demand`."""
+    medicine = models.OneToOneField(Medicine, on_delete=models.CASCADE, primary_key=True, related_name='forecast')
+    moving_average = models.FloatField(help_text="Mean daily units over the averaging window")
+    smoothed = models.FloatField(help_text="Exponentially smoothed daily units")
+    horizon_days = models.IntegerField()
+    expected_demand = models.FloatField(help_text="Units expected to sell over the horizon")
+    generated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.expected_demand:.1f} units / {self.horizon_days} days"
+
+    def expected_until(self, day):
+        """Units expected to sell from today until the given date."""
+        return max((day - timezone.localdate()).days, 0) * self.smoothed
 
 class MedicineInventory(models.Model):
     medicine = models.ForeignKey(Medicine, on_delete=models.PROTECT)
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True, db_index=False,
+                               help_text="Leave empty for stock held centrally")
     quantity = models.IntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -83,11 +614,109 @@ class MedicineInventory(models.Model):
         if not self.total_price:
             self.total_price = self.unit_price * self.quantity
         
-        # Update medicine quantity
-        self.medicine.quantity += self.quantity
-        self.medicine.save()
-        
-        super().save(*args, **kwargs)
+        # Imported here: branches imports this module.
+        from .branches import adjust_stock
+
+        with transaction.atomic():
+            # The same guarded, audited UPDATE checkout takes stock with, so a
+            # sale made since the medicine was loaded is not written over.
+            adjust_stock(self.medicine, self.quantity)
+            if self.branch_id:
+                BranchStock.add(self.branch_id, self.medicine_id, self.quantity)
+
+            super().save(*args, **kwargs)
 
     class Meta:
         verbose_name_plural = 'Medicine Inventory'
+        indexes = [
+            models.Index(fields=['branch', 'created_at']),
+            # The latest receipt of a medicine before a given time, which
+            # backfill_sale_cost takes as the cost of older sales.
+            models.Index(fields=['medicine', 'created_at']),
+        ]
+
+class Job(models.Model):
+    """A unit of background work, run by `manage.py run_workers`.
+
+    `name` is a key of settings.JOB_TASKS. Workers claim queued jobs with a
+    conditional UPDATE, so several worker processes can share the table
+    without a broker.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress = models.IntegerField(default=0)
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(PharmacyUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    def report(self, progress, message=''):
+        """Record progress from inside a running task; also serves as a heartbeat."""
+        self.progress, self.progress_message = progress, message[:255]
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress, progress_message=self.progress_message, heartbeat_at=timezone.now(),
+        )
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+class ScheduledTask(models.Model):
+    """Run state of one settings.SCHEDULE entry, shared by all scheduler processes."""
+    name = models.CharField(max_length=100, unique=True)
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    last_job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} (next: {self.next_run_at})"
+
+class AuditEntry(models.Model):
+    """One change to an audited row, written in batches by pharmacy.audit."""
+    CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+    ACTION_CHOICES = [(CREATE, 'Created'), (UPDATE, 'Changed'), (DELETE, 'Deleted')]
+
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    object_repr = models.CharField(max_length=200)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # {field: [old, new]}; on a create old is null, on a delete new is.
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # No database constraint: entries are written after the fact and must
+    # outlive the user, so the name is kept as well.
+    user = models.ForeignKey(PharmacyUser, on_delete=models.DO_NOTHING, db_constraint=False,
+                             null=True, blank=True, related_name='+')
+    username = models.CharField(max_length=150, blank=True)
+    # When the change was made, not when the batch holding it was written.
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.action} by {self.username or '-'}"
+
+    class Meta:
+        verbose_name_plural = 'Audit entries'
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
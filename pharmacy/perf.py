@@ -0,0 +1,137 @@
+import glob
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from threading import Lock
+
+_current = ContextVar('pharmacy_request_metrics', default=None)
+
+# Recent wall times per URL name for this process, read by the perf_summary view.
+# Requests that matched no URL share one name, so random 404 paths from a
+# scanner add no keys.
+UNRESOLVED = '<unresolved>'
+_recent = defaultdict(lambda: deque(maxlen=1000))
+_recent_lock = Lock()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: one counter bump and two clock reads per query.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.signatures[sql] += 1
+
+    def duplicates(self, threshold):
+        # The SQL text still has its placeholders, so the same statement run
+        # for every row of a list shows up as one signature with a high count.
+        return [
+            {'sql': sql[:200], 'count': count}
+            for sql, count in self.signatures.most_common()
+            if count >= threshold
+        ]
+
+
+def current():
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+_templates_instrumented = False
+
+
+def instrument_templates():
+    """Time top-level template renders; nested renders are counted once."""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original_render(self, context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+    Template.render = render
+    _templates_instrumented = True
+
+
+def record(url_name, duration_ms):
+    with _recent_lock:
+        _recent[url_name].append(duration_ms)
+
+
+def recent():
+    with _recent_lock:
+        return {name: list(values) for name, values in _recent.items()}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(durations_by_url):
+    summary = []
+    for url_name, durations in durations_by_url.items():
+        values = sorted(durations)
+        summary.append({
+            'url_name': url_name,
+            'count': len(values),
+            'p50': round(percentile(values, 0.50), 2),
+            'p95': round(percentile(values, 0.95), 2),
+            'p99': round(percentile(values, 0.99), 2),
+        })
+    return sorted(summary, key=lambda row: row['p95'], reverse=True)
+
+
+def log_files(path):
+    """The log at `path` and its rotated copies (path.1 is the newest) that exist, oldest first."""
+    rotated = [name for name in glob.glob(f'{glob.escape(path)}.*') if name.rsplit('.', 1)[1].isdigit()]
+    rotated.sort(key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def read_log(*paths):
+    durations = defaultdict(list)
+    for path in paths:
+        with open(path) as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                durations[entry['url_name']].append(entry['duration_ms'])
+    return durations
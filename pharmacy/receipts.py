@@ -0,0 +1,185 @@
+"""Sale receipts as plain text, ESC/POS printer bytes and compact PDF.
+
+A receipt is drawn from a payload: a dict of the sale's figures already
+formatted as text, built from one values() row. Rendering it touches
+neither the ORM nor the template engine, so a reprint of a whole shift or
+month reads the sales in chunks and yields output as it goes, one
+document however many receipts it holds.
+"""
+import heapq
+import zlib
+from decimal import Decimal
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils import timezone
+
+CENT = Decimal('0.01')
+FIELDS = [
+    'pk', 'created_at', 'quantity', 'total_price', 'medicine__code', 'medicine__item_description',
+    'created_by__username', 'branch__name',
+]
+# Content type and file extension of each output format.
+FORMATS = {
+    'text': ('text/plain; charset=utf-8', 'txt'),
+    'escpos': ('application/octet-stream', 'bin'),
+    'pdf': ('application/pdf', 'pdf'),
+}
+
+
+def payload(row):
+    """The receipt for one row of `FIELDS`, every value formatted for printing."""
+    pk, created_at, quantity, total, code, description, cashier, branch = row
+    return {
+        'number': f'{pk:08}',
+        'time': timezone.localtime(created_at).strftime('%Y-%m-%d %H:%M'),
+        'branch': branch or '',
+        'cashier': cashier or '',
+        'code': code,
+        'description': description,
+        'quantity': str(quantity),
+        'unit_price': f'{(total / quantity).quantize(CENT) if quantity else total:.2f}',
+        'total': f'{total:.2f}',
+    }
+
+
+def payloads(*sales, chunk_size=2000):
+    """Yield the receipts of the `sales` queryset, in its order, read in chunks.
+
+    Given several querysets, each ordered by created_at and pk, such as the
+    hot and archived sales of a range, their receipts are merged in that order.
+    """
+    rows = [queryset.values_list(*FIELDS).iterator(chunk_size=chunk_size) for queryset in sales]
+    for row in heapq.merge(*rows, key=itemgetter(1, 0)) if len(rows) > 1 else rows[0]:
+        yield payload(row)
+
+
+def lines(receipt, width=None):
+    """The receipt as lines of at most `width` characters."""
+    width = width or settings.RECEIPT_WIDTH
+    rule = '-' * width
+
+    def columns(left, right):
+        return f'{left[:width - len(right) - 1]:<{width - len(right)}}{right}'
+
+    header = [line.center(width).rstrip() for line in settings.RECEIPT_HEADER]
+    if receipt['branch']:
+        header.append(receipt['branch'][:width].center(width).rstrip())
+    return header + [
+        rule,
+        columns(f"No. {receipt['number']}", receipt['time']),
+        f"Cashier: {receipt['cashier']}"[:width],
+        rule,
+        receipt['description'][:width],
+        columns(f"  {receipt['code']}  {receipt['quantity']} x {receipt['unit_price']}", receipt['total']),
+        rule,
+        columns('TOTAL', f"ETB {receipt['total']}"),
+        '',
+        *(line.center(width).rstrip() for line in settings.RECEIPT_FOOTER),
+    ]
+
+
+def text(receipts, width=None):
+    """Yield the receipts as plain text, separated by a form feed."""
+    for receipt in receipts:
+        yield '\n'.join(lines(receipt, width)) + '\n\f'
+
+
+# ESC/POS: reset, centre, bold on/off, left align, feed and partial cut.
+ESC_INIT = b'\x1b@'
+ESC_CENTER, ESC_LEFT = b'\x1ba\x01', b'\x1ba\x00'
+ESC_BOLD, ESC_NORMAL = b'\x1bE\x01', b'\x1bE\x00'
+ESC_CUT = b'\x1dVB\x03'
+
+
+def escpos(receipts, width=None):
+    """Yield the receipts as ESC/POS commands for a thermal printer, cut after each."""
+    yield ESC_INIT
+    for receipt in receipts:
+        body = lines(receipt, width)
+        header = len(settings.RECEIPT_HEADER) + bool(receipt['branch'])
+        yield b''.join([
+            ESC_CENTER, ESC_BOLD, encode('\n'.join(body[:header]) + '\n', 'cp437'), ESC_NORMAL, ESC_LEFT,
+            encode('\n'.join(body[header:]) + '\n', 'cp437'), ESC_CUT,
+        ])
+
+
+def encode(value, encoding):
+    # Receipts are nearly all ASCII, which the printer code pages share;
+    # encoding it directly is far quicker than through a code page table.
+    try:
+        return value.encode('ascii')
+    except UnicodeEncodeError:
+        return value.encode(encoding, errors='replace')
+
+
+# PDF: one page per receipt, as tall as its lines, in 8pt Courier. At
+# 0.6em a character, RECEIPT_WIDTH=42 fits the 72mm printable width of an
+# 80mm roll.
+PDF_FONT_SIZE = 8
+PDF_LEADING = 10
+PDF_MARGIN = 12
+
+
+def pdf(receipts, width=None):
+    """Yield a PDF document of the receipts, a page each, as it is written.
+
+    Objects are numbered as they are written and their offsets kept for
+    the cross-reference table at the end; the page tree, which lists
+    every page, is written last under the number reserved for it.
+    """
+    width = width or settings.RECEIPT_WIDTH
+    page_width = round(width * PDF_FONT_SIZE * 0.6 + 2 * PDF_MARGIN)
+    offsets, pages = [], []
+    position = 0
+
+    def write(number, body):
+        nonlocal position
+        offsets.append((number, position))
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        position += len(chunk)
+        return chunk
+
+    head = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(head)
+    # 1 is the catalogue, 2 the page tree and 3 the font.
+    yield head + write(1, b'<< /Type /Catalog /Pages 2 0 R >>') + write(
+        3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    )
+    number = 3
+    for receipt in receipts:
+        body = lines(receipt, width)
+        height = len(body) * PDF_LEADING + 2 * PDF_MARGIN
+        content = zlib.compress(b'BT /F1 %d Tf %d TL %d %d Td\n%s\nET' % (
+            PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN, height - PDF_MARGIN - PDF_FONT_SIZE,
+            b"\nT* ".join(b'(%s) Tj' % pdf_string(line) for line in body),
+        ))
+        number += 2
+        pages.append(number)
+        yield write(number - 1, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (
+            len(content), content,
+        )) + write(number, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+                           b'/Resources << /Font << /F1 3 0 R >> >> >>' % (page_width, height, number - 1))
+
+    tree = write(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % page for page in pages), len(pages),
+    ))
+    offsets.sort()
+    xref = b'xref\n0 %d\n0000000000 65535 f \n%s' % (
+        len(offsets) + 1, b''.join(b'%010d 00000 n \n' % offset for _, offset in offsets),
+    )
+    yield tree + xref + b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(offsets) + 1, position,
+    )
+
+
+def pdf_string(line):
+    value = encode(line, 'cp1252')
+    return value.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def render(receipts, format, width=None):
+    """Yield `receipts` in `format`, one of FORMATS, as bytes."""
+    if format == 'text':
+        return (chunk.encode() for chunk in text(receipts, width))
+    return {'escpos': escpos, 'pdf': pdf}[format](receipts, width)
@@ -0,0 +1,68 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import DailySales, Medicine
+
+
+def demand(since):
+    """Units sold and sum of squared daily units per medicine since a date.
+
+    One grouped query over the daily rollup, so its cost follows the number
+    of medicine-days sold rather than the number of sales.
+    """
+    rows = (
+        DailySales.objects.filter(date__gte=since)
+        .values('medicine_id')
+        .annotate(total=Sum('quantity'), total_sq=Sum(F('quantity') * F('quantity')))
+    )
+    return {row['medicine_id']: (row['total'], row['total_sq']) for row in rows}
+
+
+def suggestions(
+    velocity_days=None, lead_time_days=None, review_days=None, service_level_z=None,
+    only_due=True,
+):
+    """Reorder point and suggested order quantity for every medicine.
+
+    Daily demand mean and deviation come from the rollup (days without sales
+    count as zero). Safety stock covers demand variation over the lead time;
+    the order tops stock back up to cover lead time plus one review period.
+    The shelf quantity is kept as a floor for the reorder point. With
+    `only_due`, only medicines at or below their reorder point are returned,
+    most urgent (fewest days of cover) first.
+    """
+    velocity_days = velocity_days or settings.REPLENISHMENT_VELOCITY_DAYS
+    lead_time_days = lead_time_days or settings.REPLENISHMENT_LEAD_TIME_DAYS
+    review_days = review_days or settings.REPLENISHMENT_REVIEW_DAYS
+    z = settings.REPLENISHMENT_SERVICE_LEVEL_Z if service_level_z is None else service_level_z
+
+    since = timezone.localdate() - timedelta(days=velocity_days - 1)
+    sold = demand(since)
+    rows = []
+    medicines = Medicine.objects.values_list('id', 'code', 'item_description', 'quantity', 'displayed_quantity')
+    for medicine_id, code, description, quantity, displayed_quantity in medicines.iterator(chunk_size=5000):
+        total, total_sq = sold.get(medicine_id, (0, 0))
+        daily = total / velocity_days
+        deviation = math.sqrt(max(total_sq / velocity_days - daily * daily, 0))
+        safety_stock = z * deviation * math.sqrt(lead_time_days)
+        reorder_point = max(math.ceil(daily * lead_time_days + safety_stock), displayed_quantity)
+        if only_due and quantity > reorder_point:
+            continue
+        order_up_to = max(math.ceil(daily * (lead_time_days + review_days) + safety_stock), reorder_point)
+        rows.append({
+            'id': medicine_id,
+            'code': code,
+            'item_description': description,
+            'quantity': quantity,
+            'daily_demand': round(daily, 2),
+            'safety_stock': math.ceil(safety_stock),
+            'reorder_point': reorder_point,
+            'suggested_quantity': max(order_up_to - quantity, 0),
+            'days_of_cover': round(quantity / daily, 1) if daily else None,
+        })
+    rows.sort(key=lambda row: (row['days_of_cover'] is None, row['days_of_cover'] or 0, row['code']))
+    return rows
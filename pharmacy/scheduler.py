@@ -0,0 +1,66 @@
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import jobs
+from .cron import Cron
+from .models import Job, ScheduledTask
+
+logger = logging.getLogger(__name__)
+
+
+def entries():
+    return {name: (Cron(entry['cron']), entry) for name, entry in settings.SCHEDULE.items()}
+
+
+def run_entry(name, entry, worker):
+    """Run one schedule entry now, in this process, through the job table.
+
+    Skipped while an earlier run of the same task is still queued or
+    running, so a slow VACUUM never overlaps the next one.
+    """
+    task = entry['task']
+    if Job.objects.filter(name=task, status__in=[Job.QUEUED, Job.RUNNING]).exists():
+        logger.warning('Skipping %s: the previous %s job has not finished', name, task)
+        return None
+    job = jobs.start(task, worker, **entry.get('kwargs', {}))
+    jobs.run(job)
+    job.refresh_from_db()
+    duration = (job.finished_at - job.started_at).total_seconds() * 1000
+    logger.info('%s (%s) %s in %.0f ms: %s', name, task, job.status, duration, job.result or job.error)
+    ScheduledTask.objects.update_or_create(name=name, defaults={'last_job': job})
+    return job
+
+
+def tick(worker, now=None):
+    """Run every entry that is due, at most once per due time across all schedulers.
+
+    Each entry's next_run_at is advanced with a conditional UPDATE before
+    its task runs; a second scheduler seeing the same due time loses that
+    race and skips it. A run missed while no scheduler was up happens once
+    at the next tick. A job left running by a scheduler that was killed is
+    failed once its heartbeat is stale, so it does not hold its task back.
+    """
+    jobs.requeue_stale()
+    now = now or timezone.now()
+    local_now = timezone.localtime(now)
+    ran = []
+    for name, (cron, entry) in entries().items():
+        state, _ = ScheduledTask.objects.get_or_create(name=name)
+        if state.next_run_at is None:
+            ScheduledTask.objects.filter(pk=state.pk, next_run_at__isnull=True).update(
+                next_run_at=cron.next_after(local_now),
+            )
+            continue
+        if state.next_run_at > now:
+            continue
+        claimed = ScheduledTask.objects.filter(pk=state.pk, next_run_at=state.next_run_at).update(
+            next_run_at=cron.next_after(local_now),
+        )
+        if not claimed:
+            continue
+        job = run_entry(name, entry, worker)
+        if job is not None:
+            ran.append(job)
+    return ran
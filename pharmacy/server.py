@@ -0,0 +1,165 @@
+import logging
+import os
+import signal
+import socket
+import time
+
+from waitress import wasyncore
+from waitress.channel import HTTPChannel
+from waitress.server import create_server
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(application, path='/login/'):
+    """Serve one request in-process so URLconf, views and templates are loaded before the first user."""
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'PATH_INFO': path}
+    setup_testing_defaults(environ)
+    response = application(environ, lambda status, headers, exc_info=None: None)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+
+def listen(host, port, backlog):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+class Server:
+    """
+    Waitress with a graceful stop: on SIGINT/SIGTERM the listening socket is
+    closed, keep-alive connections are told to close once their current
+    response is flushed, and the process exits when every in-flight request
+    has finished or ``shutdown_timeout`` expires.
+    """
+
+    def __init__(self, application, sock, threads=8, connection_limit=100,
+                 backlog=1024, channel_timeout=120, shutdown_timeout=30):
+        self.shutdown_timeout = shutdown_timeout
+        self.stop_requested = False
+        self.stopping_since = None
+        self.server = create_server(
+            application,
+            sockets=[sock],
+            threads=threads,
+            connection_limit=connection_limit,
+            backlog=backlog,
+            channel_timeout=channel_timeout,
+        )
+
+    def channels(self):
+        return [channel for channel in self.server._map.values() if isinstance(channel, HTTPChannel)]
+
+    def stop(self, *args):
+        # Only flag it here: the signal may arrive while select() is waiting
+        # on the listening socket, so it is closed from the loop instead.
+        self.stop_requested = True
+
+    def stop_accepting(self):
+        self.stopping_since = time.monotonic()
+        # Keep the trigger open: worker threads use it to wake the loop when
+        # a response is ready.
+        self.server.del_channel()
+        self.server.socket.close()
+        logger.info('Shutting down, waiting for %d connection(s)', len(self.channels()))
+
+    def drained(self):
+        channels = self.channels()
+        for channel in channels:
+            # Busy channels are marked on a later pass, once their request is done.
+            if not channel.requests:
+                channel.close_when_flushed = True
+        if not channels:
+            return True
+        if time.monotonic() - self.stopping_since > self.shutdown_timeout:
+            logger.warning('Shutdown timeout reached, dropping %d connection(s)', len(channels))
+            return True
+        return False
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        adj = self.server.adj
+        while self.stopping_since is None or not self.drained():
+            if self.stop_requested and self.stopping_since is None:
+                self.stop_accepting()
+                continue
+            wasyncore.loop(timeout=adj.asyncore_loop_timeout, map=self.server._map,
+                           use_poll=adj.asyncore_use_poll, count=1)
+        self.server.task_dispatcher.shutdown(cancel_pending=True, timeout=1)
+        self.server.trigger.close()
+
+
+def serve(application, host='127.0.0.1', port=8000, processes=1, **options):
+    """
+    Serve ``application`` with a pool of ``threads`` per process. Extra
+    processes are forked on POSIX and share the listening socket; on Windows
+    (the packaged build) the server always runs as a single process.
+    """
+    sock = listen(host, port, options.get('backlog', 1024))
+    if processes > 1 and not hasattr(os, 'fork'):
+        logger.warning('Worker processes are not supported on this platform, using threads only')
+        processes = 1
+    if processes == 1:
+        Server(application, sock, **options).run()
+        return
+
+    # Forked workers must not share the parent's database connection.
+    from django.db import connections
+    connections.close_all()
+
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                Server(application, sock, **options).run()
+            finally:
+                # os._exit skips atexit; write the audit entries still buffered.
+                from pharmacy import audit
+
+                try:
+                    audit.flush()
+                finally:
+                    os._exit(0)
+        workers[pid] = time.monotonic()
+
+    def stop(*args):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(processes):
+        spawn()
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if stopping or started is None:
+            continue
+        if time.monotonic() - started < 1:
+            logger.error('Worker %d failed on startup with status %d, stopping', pid, status)
+            stop()
+        else:
+            logger.warning('Worker %d exited with status %d, restarting', pid, status)
+            spawn()
+    sock.close()
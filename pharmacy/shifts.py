@@ -0,0 +1,48 @@
+"""Cashier shifts: open, sell, close out against the Z-report.
+
+The Z-report is kept by Shift.record() as each sale is saved, so closing a
+shift is a single UPDATE however many sales it holds, and reading a
+report is one row plus one line per medicine sold. Nothing rescans Sale.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import branches
+from .models import Shift
+
+
+class ShiftError(ValueError):
+    pass
+
+
+def visible(user):
+    """Shifts `user` may see: admins see their branch's (or all), cashiers their own."""
+    if user.role and user.role.name == 'admin':
+        return branches.scoped(Shift.objects, user)
+    return Shift.objects.filter(cashier=user)
+
+
+def current(user):
+    return Shift.objects.filter(cashier=user, closed_at__isnull=True).first()
+
+
+def open_shift(user, opening_cash=0):
+    try:
+        with transaction.atomic():
+            return Shift.objects.create(cashier=user, branch=user.branch, opening_cash=opening_cash)
+    except IntegrityError:
+        raise ShiftError(f'{user} already has an open shift')
+
+
+def close(shift, counted_cash, user=None):
+    """Close `shift` with the cash counted in the drawer; its totals are already kept."""
+    now = timezone.now()
+    # Conditional, like Shift.record(): a sale recorded at the same moment
+    # is either counted before the close or left out of the snapshot.
+    if not Shift.objects.filter(pk=shift.pk, closed_at__isnull=True).update(
+        closed_at=now, counted_cash=counted_cash, closed_by=user,
+    ):
+        raise ShiftError(f'{shift} is already closed')
+    # Sales since `shift` was loaded have moved its totals; read the final ones.
+    shift.refresh_from_db()
+    return shift
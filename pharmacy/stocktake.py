@@ -0,0 +1,171 @@
+"""Stock takes: collect physical counts, review variances, post corrections.
+
+Counts come in bulk, as CSV ("code,count" per line) or as scanner output
+(one code per unit scanned), and are upserted into StockCount in one
+statement. Variances are computed in SQL against the expected quantity,
+and posting applies every correction set-based, with a StockAdjustment
+ledger row for each, inside a single transaction.
+"""
+import csv
+from collections import Counter
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from .models import BranchStock, Medicine, StockAdjustment, StockCount, StockTake
+
+# Codes resolved per query; stays under SQLite's bound-parameter limit.
+CHUNK = 5000
+
+
+class StockTakeClosed(ValueError):
+    pass
+
+
+def parse_counts(lines):
+    """Units per medicine code from CSV or scanner lines, and any line errors.
+
+    A line with a code and a count adds that count; a line with only a code
+    adds one unit, which is what a barcode scanner in keyboard mode types.
+    Repeated codes add up, so shelves can be counted separately.
+    """
+    counts, errors = Counter(), []
+    for number, row in enumerate(csv.reader(lines), 1):
+        code = row[0].strip() if row else ''
+        if not code:
+            continue
+        if len(row) < 2 or not row[1].strip():
+            counts[code] += 1
+            continue
+        try:
+            units = int(row[1])
+        except ValueError:
+            if number > 1:  # the first line may be a header
+                errors.append(f'Line {number}: {row[1].strip()!r} is not a whole number')
+            continue
+        if units < 0:
+            errors.append(f'Line {number}: negative count for {code}')
+            continue
+        counts[code] += units
+    return counts, errors
+
+
+def record_counts(stock_take, counts, replace=False):
+    """Add counts to an open stock take; returns the codes it does not know.
+
+    With replace, a code counted again overwrites its earlier count instead
+    of adding to it.
+    """
+    if stock_take.status != StockTake.OPEN:
+        raise StockTakeClosed(f'{stock_take} is no longer open')
+    codes = list(counts)
+    medicine_ids = {}
+    for start in range(0, len(codes), CHUNK):
+        medicine_ids.update(Medicine.objects.filter(code__in=codes[start:start + CHUNK]).values_list('code', 'pk'))
+
+    db = transaction.get_connection()
+    table = db.ops.quote_name(StockCount._meta.db_table)
+    update = 'excluded.counted' if replace else f'{table}.counted + excluded.counted'
+    with transaction.atomic(), db.cursor() as cursor:
+        # bulk_create(update_conflicts=True) can only overwrite, not add.
+        cursor.executemany(
+            f'INSERT INTO {table} (stock_take_id, medicine_id, counted) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (stock_take_id, medicine_id) DO UPDATE SET counted = {update}',
+            [(stock_take.pk, medicine_id, counts[code]) for code, medicine_id in medicine_ids.items()],
+        )
+    return sorted(set(codes) - set(medicine_ids))
+
+
+def expected_quantity(stock_take):
+    """Expression for the units the books say are at the counted location."""
+    held = BranchStock.objects.filter(medicine=OuterRef('medicine'))
+    if stock_take.branch_id:
+        return Coalesce(Subquery(held.filter(branch_id=stock_take.branch_id).values('quantity')), 0)
+    # Medicine.quantity is the chain-wide total; central stock is what the
+    # branches do not hold.
+    at_branches = held.order_by().values('medicine').annotate(total=Sum('quantity')).values('total')
+    return F('medicine__quantity') - Coalesce(Subquery(at_branches), 0)
+
+
+def variances(stock_take):
+    """The stock take's count lines annotated with expected and variance."""
+    return StockCount.objects.filter(stock_take=stock_take).annotate(
+        expected=expected_quantity(stock_take),
+        variance=F('counted') - F('expected'),
+    )
+
+
+def summary(stock_take):
+    return variances(stock_take).aggregate(
+        lines=Count('pk'),
+        differing=Count('pk', filter=~Q(variance=0)),
+        units=Coalesce(Sum('variance'), 0),
+        value=Coalesce(Sum(F('variance') * F('medicine__unit_price')), 0, output_field=Medicine.unit_price.field),
+    )
+
+
+def largest_variances(stock_take, limit):
+    return variances(stock_take).exclude(variance=0).order_by(Abs('variance').desc(), 'medicine__code').values(
+        'medicine__code', 'medicine__item_description', 'expected', 'counted', 'variance',
+    )[:limit]
+
+
+def apply_variances(changes, now):
+    """Add (medicine_id, units) changes to Medicine.quantity, keeping is_low_stock in step.
+
+    Set-based like sync.apply_stock: bulk_update builds a CASE WHEN per
+    field in Python, which took about 8s for 20k rows; joining the changes
+    in as a VALUES list (columns column1, column2) takes milliseconds.
+    """
+    db = transaction.get_connection()
+    table = db.ops.quote_name(Medicine._meta.db_table)
+    now = Medicine._meta.get_field('updated_at').get_db_prep_save(now, db)
+    with db.cursor() as cursor:
+        for start in range(0, len(changes), CHUNK):
+            chunk = changes[start:start + CHUNK]
+            cursor.execute(
+                f'UPDATE {table} SET quantity = {table}.quantity + d.column2, '
+                f'is_low_stock = {table}.quantity + d.column2 <= {table}.displayed_quantity, updated_at = %s '
+                f'FROM (VALUES {", ".join(["(%s, %s)"] * len(chunk))}) AS d WHERE {table}.id = d.column1',
+                [now, *chain.from_iterable(chunk)],
+            )
+
+
+def post(stock_take, user=None):
+    """Set stock to the counted quantities; returns the number of lines adjusted."""
+    now = timezone.now()
+    with transaction.atomic():
+        # Claiming the stock take is the first write, so it also takes
+        # SQLite's write lock before the variances are read: no sale can
+        # change stock between that read and the update.
+        claimed = StockTake.objects.filter(pk=stock_take.pk, status=StockTake.OPEN).update(
+            status=StockTake.POSTED, posted_by=user, posted_at=now,
+        )
+        if not claimed:
+            raise StockTakeClosed(f'{stock_take} is no longer open')
+        lines = list(variances(stock_take).exclude(variance=0).values_list('medicine_id', 'expected', 'counted'))
+
+        apply_variances([(medicine_id, counted - expected) for medicine_id, expected, counted in lines], now)
+        adjustments = [
+            StockAdjustment(
+                medicine_id=medicine_id, branch_id=stock_take.branch_id, stock_take=stock_take,
+                quantity=counted - expected, quantity_before=expected, quantity_after=counted,
+                reason='stock take', created_by=user,
+            )
+            for medicine_id, expected, counted in lines
+        ]
+        if stock_take.branch_id:
+            BranchStock.objects.bulk_create(
+                [
+                    BranchStock(branch_id=stock_take.branch_id, medicine_id=line[0], quantity=line[2], updated_at=now)
+                    for line in lines
+                ],
+                update_conflicts=True, unique_fields=['branch', 'medicine'], update_fields=['quantity', 'updated_at'],
+                batch_size=1000,
+            )
+        StockAdjustment.objects.bulk_create(adjustments, batch_size=1000)
+    stock_take.status, stock_take.posted_by, stock_take.posted_at = StockTake.POSTED, user, now
+    return len(lines)
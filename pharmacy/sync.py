@@ -0,0 +1,290 @@
+"""Offline sales sync between a branch instance and the central server.
+
+A branch instance (SYNC_URL set) records each sale locally and queues it in
+SyncOutbox in the same transaction, so checkout never waits on the network.
+`manage.py sync_sales` later posts the queue to the central server's
+/sync/sales/ endpoint in gzip-compressed JSON batches. The endpoint applies
+each batch with ingest(). Sales are keyed by their UUID, so a batch that is
+resent after a lost response is recognised and not applied twice.
+"""
+import gzip
+import json
+import urllib.request
+import uuid
+import zlib
+from collections import Counter, defaultdict
+from itertools import chain
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    ArchivedSale, Branch, BranchStock, CashierDailySales, DailySales, Medicine, PharmacyUser, Sale, SyncOutbox,
+)
+
+MAX_BATCH = 2000
+# Bound on a decompressed request body; roughly 1 KB per sale plus slack.
+MAX_BODY = MAX_BATCH * 1024 + 64 * 1024
+
+SALE_COLUMNS = [
+    'uuid', 'medicine', 'branch', 'quantity', 'total_price', 'unit_cost', 'created_by', 'created_at', 'updated_at',
+]
+
+
+class SyncError(Exception):
+    pass
+
+
+def queue(sale):
+    if settings.SYNC_URL:
+        SyncOutbox.objects.create(sale=sale)
+
+
+def pending():
+    return SyncOutbox.objects.filter(sent_at__isnull=True, error='')
+
+
+def payload(outbox_ids):
+    sales = Sale.objects.filter(pk__in=outbox_ids).values_list(
+        'uuid', 'medicine__code', 'quantity', 'total_price', 'unit_cost', 'created_at', 'created_by__username',
+    )
+    return {
+        'branch': settings.SYNC_BRANCH,
+        'sales': [
+            {
+                'uuid': str(sale_uuid), 'medicine': code, 'quantity': quantity,
+                'total_price': str(total_price), 'unit_cost': None if unit_cost is None else str(unit_cost),
+                'created_at': created_at.isoformat(), 'created_by': username,
+            }
+            for sale_uuid, code, quantity, total_price, unit_cost, created_at, username in sales
+        ],
+    }
+
+
+def post(url, token, data):
+    request = urllib.request.Request(url, data=gzip.compress(json.dumps(data).encode()), headers={
+        'Content-Type': 'application/json',
+        'Content-Encoding': 'gzip',
+        'Authorization': f'Token {token}',
+    })
+    with urllib.request.urlopen(request, timeout=settings.SYNC_TIMEOUT) as response:
+        return json.load(response)
+
+
+def push(batch_size=1000, send=None):
+    """Send queued sales until the outbox is empty; returns counts per outcome.
+
+    Network and server errors propagate with the unsent sales still queued,
+    so the next run resumes where this one stopped.
+    """
+    if not settings.SYNC_URL:
+        raise SyncError('SYNC_URL is not set; this instance is not a branch client')
+    send = send or (lambda data: post(settings.SYNC_URL, settings.SYNC_TOKEN, data))
+    totals = Counter()
+    while True:
+        ids = list(pending().order_by('sale_id').values_list('sale_id', flat=True)[:batch_size])
+        if not ids:
+            return dict(totals)
+        result = send(payload(ids))
+        rejected = {row['uuid']: row['error'] for row in result['rejected']}
+        rejected_ids = dict(Sale.objects.filter(uuid__in=list(rejected)).values_list('pk', 'uuid'))
+        with transaction.atomic():
+            pending().filter(sale_id__in=ids).exclude(sale_id__in=rejected_ids).update(sent_at=timezone.now())
+            for sale_id, sale_uuid in rejected_ids.items():
+                SyncOutbox.objects.filter(sale_id=sale_id).update(error=rejected[str(sale_uuid)])
+        totals.update(accepted=result['accepted'], duplicates=result['duplicates'], rejected=len(rejected))
+
+
+def decode(request):
+    body = request.body
+    if request.headers.get('Content-Encoding') == 'gzip':
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        body = decompressor.decompress(body, MAX_BODY)
+        if decompressor.unconsumed_tail:
+            raise SyncError('Batch too large')
+    data = json.loads(body)
+    if len(data['sales']) > MAX_BATCH:
+        raise SyncError(f'At most {MAX_BATCH} sales per batch')
+    return data
+
+
+def clean(row):
+    """One sale row from a branch, parsed and checked; raises SyncError naming the bad field."""
+    if not isinstance(row, dict):
+        raise SyncError('A sale must be an object')
+    field = None
+    try:
+        field = 'uuid'
+        sale_uuid = uuid.UUID(row['uuid'])
+        field = 'medicine'
+        if not isinstance(row['medicine'], str):
+            raise TypeError
+        field = 'quantity'
+        quantity = row['quantity']
+        if type(quantity) is not int or quantity <= 0:
+            raise ValueError
+        field = 'total_price'
+        total_price = Decimal(row['total_price'])
+        if not total_price.is_finite() or total_price < 0:
+            raise ValueError
+        field = 'unit_cost'
+        # Branches running an older release do not send the cost.
+        unit_cost = row.get('unit_cost')
+        if unit_cost is not None:
+            unit_cost = Decimal(unit_cost)
+            if not unit_cost.is_finite() or unit_cost < 0:
+                raise ValueError
+        field = 'created_at'
+        created_at = datetime.fromisoformat(row['created_at'])
+        if timezone.is_naive(created_at):
+            raise ValueError
+        field = 'created_by'
+        if row.get('created_by') is not None and not isinstance(row['created_by'], str):
+            raise TypeError
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        raise SyncError(f'Invalid or missing {field}') from None
+    return {
+        'uuid': sale_uuid, 'medicine': row['medicine'], 'quantity': quantity, 'total_price': total_price,
+        'unit_cost': unit_cost, 'created_at': created_at, 'created_by': row.get('created_by'),
+    }
+
+
+def ingest(branch_code, rows):
+    """Apply one batch of branch sales; returns accepted/duplicate counts and rejected rows.
+
+    Stock, the daily rollup and the low-stock flag are updated with one
+    statement per table rather than per sale (UPDATE ... FROM and
+    INSERT ... ON CONFLICT, both SQLite 3.33+ and PostgreSQL).
+    """
+    branch = Branch.objects.filter(code=branch_code).first()
+    if branch is None:
+        raise SyncError(f'Unknown branch {branch_code!r}')
+    with transaction.atomic():
+        # Take SQLite's write lock before reading, so a concurrent resend of
+        # the same batch waits here instead of passing the duplicate check.
+        Branch.objects.filter(pk=branch.pk).update(updated_at=timezone.now())
+        valid, rejected = [], []
+        for row in rows:
+            try:
+                valid.append((row, clean(row)))
+            except SyncError as error:
+                rejected.append({'uuid': row.get('uuid') if isinstance(row, dict) else None, 'error': str(error)})
+        uuids = [sale['uuid'] for _, sale in valid]
+        existing = set(Sale.objects.filter(uuid__in=uuids).values_list('uuid', flat=True))
+        # Archived and deleted sales count as received too.
+        existing.update(ArchivedSale.all_objects.filter(uuid__in=uuids).values_list('uuid', flat=True))
+        # A branch may have sold a medicine offline before it was deleted here.
+        medicines = {code: (pk, unit_price) for code, pk, unit_price in Medicine.all_objects.filter(
+            code__in={sale['medicine'] for _, sale in valid}).values_list('code', 'pk', 'unit_price')}
+        users = dict(PharmacyUser.objects.filter(
+            username__in={sale['created_by'] for _, sale in valid if sale['created_by']},
+        ).values_list('username', 'pk'))
+
+        sales, seen = [], set()
+        for row, sale in valid:
+            if sale['uuid'] in existing or sale['uuid'] in seen:
+                continue
+            if sale['medicine'] not in medicines:
+                rejected.append({'uuid': row['uuid'], 'error': f"Unknown medicine {sale['medicine']}"})
+                continue
+            seen.add(sale['uuid'])
+            medicine_id, unit_price = medicines[sale['medicine']]
+            # Without the branch's cost, the central price is the closest there is.
+            unit_cost = unit_price if sale['unit_cost'] is None else sale['unit_cost']
+            sales.append(Sale(
+                uuid=sale['uuid'], medicine_id=medicine_id, branch=branch, quantity=sale['quantity'],
+                total_price=sale['total_price'], unit_cost=unit_cost, created_by_id=users.get(sale['created_by']),
+                created_at=sale['created_at'], updated_at=sale['created_at'],
+            ))
+        insert_sales(sales)
+        apply_stock(branch, sales)
+        apply_rollup(sales)
+    return {'accepted': len(sales), 'duplicates': len(rows) - len(sales) - len(rejected), 'rejected': rejected}
+
+
+def insert_sales(sales):
+    # bulk_create would stamp created_at with the time of the sync; the
+    # offline sale time has to be kept, so insert the rows as given.
+    fields = [Sale._meta.get_field(name) for name in SALE_COLUMNS]
+    # The real connection, not the thread-local proxy: this runs per value.
+    db = transaction.get_connection()
+    quote = db.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(Sale._meta.db_table), ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with db.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(sale, field.attname), db) for field in fields]
+            for sale in sales
+        ])
+
+
+def apply_stock(branch, sales):
+    sold = Counter()
+    for sale in sales:
+        sold[sale.medicine_id] += sale.quantity
+    if not sold:
+        return
+    quote = connection.ops.quote_name
+    now = Medicine._meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+    medicine_table = quote(Medicine._meta.db_table)
+    with connection.cursor() as cursor:
+        # One statement for the whole batch: join the per-medicine totals in
+        # as a VALUES list (columns column1, column2) and subtract.
+        cursor.execute(
+            f'UPDATE {medicine_table} SET quantity = {medicine_table}.quantity - d.column2, updated_at = %s '
+            f'FROM (VALUES {", ".join(["(%s, %s)"] * len(sold))}) AS d '
+            f'WHERE {medicine_table}.id = d.column1',
+            [now, *chain.from_iterable(sold.items())],
+        )
+        # The sale already happened at the branch, so its stock row follows
+        # even where the central copy has drifted below zero.
+        cursor.executemany(
+            f'INSERT INTO {quote(BranchStock._meta.db_table)} (branch_id, medicine_id, quantity, updated_at) '
+            f'VALUES (%s, %s, %s, %s) ON CONFLICT (branch_id, medicine_id) '
+            f'DO UPDATE SET quantity = quantity + excluded.quantity, updated_at = excluded.updated_at',
+            [(branch.pk, medicine_id, -quantity, now) for medicine_id, quantity in sold.items()],
+        )
+    Medicine.objects.filter(pk__in=sold, is_low_stock=False, quantity__lte=F('displayed_quantity')).update(
+        is_low_stock=True, updated_at=timezone.now(),
+    )
+
+
+def apply_rollup(sales):
+    quantities, amounts, costs = Counter(), Counter(), Counter()
+    cashiers = defaultdict(Counter)
+    for sale in sales:
+        day = timezone.localdate(sale.created_at)
+        key = (sale.medicine_id, day)
+        cost = sale.quantity * sale.unit_cost
+        quantities[key] += sale.quantity
+        amounts[key] += sale.total_price
+        costs[key] += cost
+        totals = cashiers[(sale.branch_id, sale.created_by_id, day)]
+        totals['quantity'] += sale.quantity
+        totals['amount'] += sale.total_price
+        totals['cost'] += cost
+    date_field = DailySales._meta.get_field('date')
+    amount_field = DailySales._meta.get_field('amount')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {connection.ops.quote_name(DailySales._meta.db_table)} '
+            f'(medicine_id, date, quantity, amount, cost) VALUES (%s, %s, %s, %s, %s) '
+            f'ON CONFLICT (medicine_id, date) '
+            f'DO UPDATE SET quantity = quantity + excluded.quantity, amount = amount + excluded.amount, '
+            f'cost = cost + excluded.cost',
+            [
+                (medicine_id, date_field.get_db_prep_save(day, connection), quantity,
+                 amount_field.get_db_prep_save(amounts[(medicine_id, day)], connection),
+                 amount_field.get_db_prep_save(costs[(medicine_id, day)], connection))
+                for (medicine_id, day), quantity in quantities.items()
+            ],
+        )
+    # A batch covers a handful of cashier-days, so one upsert each is enough.
+    for (branch_id, cashier_id, day), totals in cashiers.items():
+        CashierDailySales.record(branch_id, cashier_id, day, totals['quantity'], totals['amount'], totals['cost'])
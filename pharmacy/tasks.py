@@ -0,0 +1,55 @@
+"""Background jobs, listed in settings.JOB_TASKS and run by `manage.py run_workers`.
+
+Each task takes the Job first and its keyword arguments after; call
+job.report() on long runs so the status page shows progress (jobs.run
+keeps the heartbeat going meanwhile). The return value must be JSON
+serializable and is stored as the job result.
+"""
+import io
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from . import archive, forecasting, maintenance, sync
+from .maintenance import purge_expired_sessions
+
+
+def forecast_demand(job, **options):
+    job.report(5, 'Forecasting demand')
+    return {'medicines': forecasting.forecast(**options)}
+
+
+def rebuild_sales_rollup(job, days=None):
+    job.report(5, 'Rebuilding daily sales rollup')
+    output = io.StringIO()
+    call_command('rebuild_sales_rollup', days=days, stdout=output)
+    return {'output': output.getvalue().strip()}
+
+
+def purge_sessions(job, batch_size=1000):
+    job.report(5, 'Purging expired sessions')
+    return {'deleted': purge_expired_sessions(batch_size=batch_size)}
+
+
+def optimize_database(job, vacuum=False):
+    job.report(5, 'Vacuuming database' if vacuum else 'Optimizing database')
+    return maintenance.optimize_database(vacuum=vacuum)
+
+
+def refresh_medicine_status(job):
+    job.report(5, 'Refreshing medicine status flags')
+    return {'changed': maintenance.refresh_medicine_status()}
+
+
+def sync_sales(job, batch_size=None):
+    job.report(5, 'Sending offline sales to the central server')
+    return sync.push(batch_size=batch_size or settings.SYNC_BATCH_SIZE)
+
+
+def archive_sales(job, days=None):
+    job.report(5, 'Archiving old sales')
+    before = timezone.now() - timedelta(days=days or settings.ARCHIVE_AFTER_DAYS)
+    archived = archive.archive(before, progress=lambda moved: job.report(5, f'{moved} sales archived'))
+    return {'archived': archived}
@@ -0,0 +1,96 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from pharmacy import analytics
+from pharmacy.models import Branch, CashierDailySales, Medicine, PharmacyUser, Role, Sale
+
+
+class SalesAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = PharmacyUser.objects.create_user(
+            'admin', password='admin', role=Role.objects.create(name='admin', description='Administrator'),
+        )
+        cashier = Role.objects.create(name='cashier', description='Cashier')
+        cls.north = Branch.objects.create(code='N', name='North')
+        cls.ann = PharmacyUser.objects.create_user('ann', password='ann', role=cashier, branch=cls.north)
+        cls.bob = PharmacyUser.objects.create_user('bob', password='bob', role=cashier)
+        cls.cheap, cls.dear = (
+            Medicine.objects.create(
+                code=code, item_description=code, quantity=1000, displayed_quantity=1,
+                unit_price=unit_price, selling_price=selling_price, expiry_date=date(2100, 1, 1),
+            )
+            for code, unit_price, selling_price in [('HM-001', 1, 2), ('HM-002', 10, 12)]
+        )
+        for medicine, quantity, user, branch in [
+            (cls.cheap, 10, cls.ann, cls.north),
+            (cls.dear, 2, cls.ann, cls.north),
+            (cls.dear, 5, cls.bob, None),
+        ]:
+            Sale.objects.create(medicine=medicine, quantity=quantity, created_by=user, branch=branch, total_price=0)
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        cache.clear()
+
+    def compute(self, **params):
+        return analytics.compute(self.today, self.today, **params)
+
+    def test_every_source_agrees_on_totals(self):
+        totals = {'quantity': 17, 'amount': Decimal('104.00'), 'cost': Decimal('80.00'), 'margin': Decimal('24.00'),
+                  'margin_percent': Decimal('23.1')}
+        for group in [(), ('medicine',), ('cashier',), ('medicine', 'cashier')]:
+            result = self.compute(group=group)
+            self.assertEqual(result['totals'], totals, group)
+            self.assertEqual([sum(row[metric] for row in result['rows']) for metric in ('quantity', 'amount', 'cost')],
+                             [17, Decimal('104.00'), Decimal('80.00')], group)
+        self.assertEqual(
+            [self.compute(group=group)['source'] for group in [('cashier',), ('medicine',), ('medicine', 'cashier')]],
+            ['cashier_rollup', 'medicine_rollup', 'sales'],
+        )
+
+    def test_top_n_by_margin_and_branch_filter(self):
+        rows = self.compute(group=['medicine', 'cashier'], order='margin', top=2)['rows']
+        # HM-001 by ann: 20 - 10; HM-002 by bob: 60 - 50.
+        self.assertEqual([(row['code'], row['cashier_name'], row['margin']) for row in rows],
+                         [('HM-001', 'ann', Decimal('10.00')), ('HM-002', 'bob', Decimal('10.00'))])
+
+        rows = self.compute(period='month', group=['cashier'], branch=self.north)['rows']
+        self.assertEqual([(row['period'], row['cashier'], row['quantity']) for row in rows],
+                         [(self.today.replace(day=1), self.ann.pk, 12)])
+
+    def test_cashier_rollup_follows_edits_and_rebuild(self):
+        sale = Sale.objects.get(created_by=self.bob)
+        sale.quantity, sale.total_price = 1, 12
+        sale.save()
+        rollup = CashierDailySales.objects.get(cashier=self.bob)
+        self.assertEqual((rollup.quantity, rollup.amount, rollup.cost), (1, 12, 10))
+
+        incremental = sorted(CashierDailySales.objects.values_list('cashier', 'quantity', 'amount', 'cost'))
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(sorted(CashierDailySales.objects.values_list('cashier', 'quantity', 'amount', 'cost')),
+                         incremental)
+
+    def test_view_is_admin_only_validates_and_caches(self):
+        url = reverse('sales_analytics')
+        self.client.force_login(self.ann)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url, {'group': 'branch'}).status_code, 400)
+        backwards = {'start_date': self.today, 'end_date': self.today - timedelta(days=1)}
+        self.assertEqual(self.client.get(url, backwards).status_code, 400)
+
+        params = {'period': 'day', 'group': 'medicine', 'top': 1, 'order': 'quantity'}
+        body = self.client.get(url, params).json()
+        self.assertEqual([(row['code'], row['quantity']) for row in body['rows']], [('HM-001', 10)])
+        # The user and role lookups only; the figures come from the cache.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url, params).json(), body)
@@ -0,0 +1,106 @@
+from datetime import date
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from pharmacy.models import ApiToken, ArchivedSale, Branch, BranchStock, Medicine, PharmacyUser, Role, Sale
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        roles = {name: Role.objects.create(name=name, description=label) for name, label in Role.ROLE_CHOICES}
+        cls.north = Branch.objects.create(code='N', name='North')
+        cls.admin = PharmacyUser.objects.create_user('admin', password='admin', role=roles['admin'])
+        cls.cashier = PharmacyUser.objects.create_user(
+            'cashier', password='cashier', role=roles['cashier'], branch=cls.north,
+        )
+        Medicine.objects.bulk_create(
+            Medicine(
+                code=f'HM-{i:03}', item_description=f'Medicine {i}', quantity=50, displayed_quantity=10,
+                unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+            )
+            for i in range(1, 26)
+        )
+        cls.medicine = Medicine.objects.get(code='HM-001')
+        BranchStock.objects.create(branch=cls.north, medicine=cls.medicine, quantity=5)
+        cls.token = ApiToken.issue(cls.admin, 'test')[1]
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers={'Authorization': f'Token {self.token}', **headers})
+
+    def test_requires_token_or_session_and_role(self):
+        url = reverse('api_collection', args=['medicines'])
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Token wrong'}).status_code, 401)
+        self.client.force_login(self.cashier)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.get(url).status_code, 200)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        url = reverse('api_collection', args=['medicines']) + '?limit=10&fields=code,quantity'
+        codes = []
+        while url:
+            page = self.get(url).json()
+            codes += [row['code'] for row in page['results']]
+            self.assertEqual(set(page['results'][0]), {'id', 'code', 'quantity'})
+            url = page['next']
+        self.assertEqual(codes, [f'HM-{i:03}' for i in range(1, 26)])
+
+    def test_rejects_unknown_fields_and_bad_cursor(self):
+        url = reverse('api_collection', args=['users'])
+        self.assertEqual(self.get(url + '?fields=password').status_code, 400)
+        self.assertEqual(self.get(url + '?cursor=***').status_code, 400)
+        self.assertNotIn('password', self.get(url).json()['results'][0])
+
+    def test_conditional_get(self):
+        url = reverse('api_item', args=['medicines', self.medicine.pk])
+        response = self.get(url)
+        self.assertEqual(response.json()['code'], 'HM-001')
+        self.assertEqual(self.get(url, **{'If-None-Match': response['ETag']}).status_code, 304)
+
+        Medicine.objects.filter(pk=self.medicine.pk).update(quantity=49)
+        self.assertEqual(self.get(url, **{'If-None-Match': response['ETag']}).status_code, 200)
+
+    def test_sale_takes_branch_stock_and_delete_restores_it(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.cashier)
+        url = reverse('api_collection', args=['sales'])
+        body = {'medicine': self.medicine.pk, 'quantity': 3}
+        # Session writes need the CSRF token; token clients do not.
+        self.assertEqual(client.post(url, body, content_type='application/json').status_code, 403)
+
+        cashier_token = ApiToken.issue(self.cashier, 'till')[1]
+        headers = {'Authorization': f'Token {cashier_token}'}
+        response = self.client.post(url, body, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['branch'], response.json()['total_price']), (self.north.pk, '6.00'))
+        response = self.client.post(url, body, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 409)
+
+        sale = Sale.objects.get()
+        response = self.client.delete(reverse('api_item', args=['sales', sale.pk]), headers=headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(BranchStock.objects.get(branch=self.north).quantity, 5)
+        self.assertEqual(ArchivedSale.all_objects.get(pk=sale.pk).deleted_by, self.cashier)
+
+    def test_missing_costs_read_as_null(self):
+        sales = [Sale.objects.create(medicine=self.medicine, quantity=1, total_price=2) for _ in range(2)]
+        Sale.objects.filter(pk=sales[1].pk).update(unit_cost=None)
+        url = reverse('api_collection', args=['sales']) + '?fields=total_price,unit_cost'
+        self.assertEqual(
+            [(row['total_price'], row['unit_cost']) for row in self.get(url).json()['results']],
+            [('2.00', '1.00'), ('2.00', None)],
+        )
+
+    def test_patch_changes_only_given_fields(self):
+        url = reverse('api_item', args=['medicines', self.medicine.pk])
+        response = self.client.patch(url, {'selling_price': '2.50'}, content_type='application/json',
+                                     headers={'Authorization': f'Token {self.token}'})
+        self.assertEqual(response.json()['selling_price'], '2.50')
+        self.assertEqual(response.json()['item_description'], 'Medicine 1')
+
+        response = self.client.patch(url, {'quantity': 'many'}, content_type='application/json',
+                                     headers={'Authorization': f'Token {self.token}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.json()['errors'])
@@ -0,0 +1,145 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from pharmacy import analytics, archive, branches, shifts, sync
+from pharmacy.models import (
+    ArchivedSale, Branch, BranchStock, CashierDailySales, DailySales, Medicine, PharmacyUser, Role, Sale, SyncOutbox,
+)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin = Role.objects.create(name='admin', description='Administrator')
+        cls.admin = PharmacyUser.objects.create_user('admin', password='admin', role=admin)
+        cls.cashier = PharmacyUser.objects.create_user(
+            'cashier', password='cashier', role=Role.objects.create(name='cashier', description='Cashier'),
+        )
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=1000, displayed_quantity=1,
+            unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+        )
+
+    def sell(self, quantity=1, days_ago=0, **fields):
+        sale = Sale.objects.create(medicine=self.medicine, quantity=quantity, created_by=self.cashier,
+                                   total_price=0, **fields)
+        if days_ago:
+            # Backdated along with its rollups, as if it had been made then.
+            Sale.record_rollups(sale.medicine_id, sale.branch_id, sale.created_by_id, sale.created_at,
+                                -sale.quantity, -sale.total_price, -sale.cost)
+            Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+            sale.refresh_from_db()
+            Sale.record_rollups(sale.medicine_id, sale.branch_id, sale.created_by_id, sale.created_at,
+                                sale.quantity, sale.total_price, sale.cost)
+        return sale
+
+    def rollups(self):
+        return (
+            sorted(DailySales.objects.exclude(quantity=0).values_list('date', 'quantity', 'amount', 'cost')),
+            sorted(CashierDailySales.objects.exclude(quantity=0).values_list('date', 'quantity', 'amount', 'cost')),
+        )
+
+    def test_command_moves_old_sales_in_chunks_and_keeps_the_rollups(self):
+        old = [self.sell(quantity, days_ago=800 + quantity) for quantity in range(1, 6)]
+        recent = self.sell(7, days_ago=10)
+        rollups = self.rollups()
+        output = io.StringIO()
+        call_command('archive_sales', days=730, chunk_size=2, stdout=output)
+        self.assertIn('Archived 5 sales', output.getvalue())
+        self.assertEqual(list(Sale.objects.all()), [recent])
+        self.assertEqual(
+            list(ArchivedSale.objects.order_by('pk').values_list('pk', 'uuid', 'quantity', 'created_at')),
+            [(sale.pk, sale.uuid, sale.quantity, sale.created_at) for sale in old],
+        )
+        self.assertEqual(self.rollups(), rollups)
+        # A rebuild reads the archive as well.
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), rollups)
+
+    @override_settings(SYNC_URL='http://central.example/sync/sales/')
+    def test_unsynced_sales_and_open_shifts_stay(self):
+        unsent = self.sell(days_ago=800)
+        sync.queue(unsent)
+        sent = self.sell(days_ago=800)
+        sync.queue(sent)
+        SyncOutbox.objects.filter(sale=sent).update(sent_at=timezone.now())
+        shifts.open_shift(self.cashier)
+        in_shift = self.sell(days_ago=800)
+        self.assertEqual(archive.archive(timezone.now() - timedelta(days=730)), 1)
+        self.assertEqual(set(Sale.objects.all()), {unsent, in_shift})
+        self.assertEqual(list(SyncOutbox.objects.values_list('sale_id', flat=True)), [unsent.pk])
+
+    def test_delete_keeps_the_sale_in_the_archive_marked_deleted(self):
+        branch = Branch.objects.create(code='N', name='North')
+        BranchStock.objects.create(branch=branch, medicine=self.medicine, quantity=10)
+        kept, deleted = (
+            branches.record_sale(Sale(medicine=self.medicine, quantity=quantity, created_by=self.cashier,
+                                      branch=branch, total_price=0))
+            for quantity in (1, 3)
+        )
+        self.client.force_login(self.admin)
+        self.client.post(reverse('delete_sale', args=[deleted.pk]))
+
+        self.assertEqual(list(Sale.objects.all()), [kept])
+        self.assertFalse(ArchivedSale.objects.exists())
+        archived = ArchivedSale.all_objects.get()
+        self.assertEqual((archived.pk, archived.quantity, archived.deleted_by), (deleted.pk, 3, self.admin))
+        self.assertIsNotNone(archived.deleted_at)
+        self.assertEqual(BranchStock.objects.get().quantity, 9)
+        self.assertEqual(Medicine.objects.get().quantity, 999)
+        self.assertEqual(DailySales.objects.get().quantity, 1)
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(DailySales.objects.get().quantity, 1)
+
+    def test_deleted_medicine_keeps_its_sales_and_code(self):
+        sale = self.sell(2)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('delete_medicine', args=[self.medicine.pk]))
+
+        self.assertFalse(Medicine.objects.exists())
+        self.assertEqual(Medicine.next_code(), 'HM-002')
+        self.assertEqual(Sale.objects.get().medicine, Medicine.all_objects.get())
+        self.assertEqual(self.client.get(reverse('edit_medicine', args=[self.medicine.pk])).status_code, 404)
+        self.assertNotIn(b'HM-001', self.client.get(reverse('add_sale')).content)
+        self.assertEqual(self.client.get(reverse('sale_detail', args=[sale.pk])).status_code, 200)
+        response = self.client.post(reverse('edit_sale', args=[sale.pk]),
+                                    {'medicine': self.medicine.pk, 'quantity': 1, 'total_price': 0})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Sale.objects.get().quantity, 1)
+
+    def test_reports_span_recent_and_archived_sales(self):
+        old, recent = self.sell(2, days_ago=800), self.sell(3)
+        archive.archive(timezone.now() - timedelta(days=730))
+        self.client.force_login(self.admin)
+        today = timezone.localdate()
+        start = timezone.localtime(old.created_at).date()
+
+        response = self.client.get(reverse('sales_report'), {'start_date': start, 'end_date': today})
+        self.assertEqual([sale.pk for sale in response.context['sales']], [recent.pk, old.pk])
+        self.assertEqual((response.context['total_quantity'], response.context['total_amount']), (5, 10))
+
+        response = self.client.get(reverse('sale_receipt', args=[old.pk]))
+        self.assertIn(f'No. {old.pk:08}'.encode(), response.content)
+
+        report = analytics.compute(start, today, group=['medicine', 'cashier'])
+        self.assertEqual(report['source'], 'sales')
+        self.assertEqual([(row['quantity'], row['amount']) for row in report['rows']], [(5, Decimal('10.00'))])
+        top = analytics.compute(start, today, period='day', group=['medicine', 'cashier'], top=1)
+        self.assertEqual([(row['period'], row['quantity']) for row in top['rows']], [(today, 3)])
+
+    def test_sync_recognises_archived_sales(self):
+        branch = Branch.objects.create(code='N', name='North')
+        sale = self.sell(days_ago=800)
+        archive.archive(timezone.now() - timedelta(days=730))
+        result = sync.ingest('N', [{
+            'uuid': str(sale.uuid), 'medicine': 'HM-001', 'quantity': 1, 'total_price': '2.00',
+            'unit_cost': '1.00', 'created_at': sale.created_at.isoformat(), 'created_by': 'cashier',
+        }])
+        self.assertEqual((result['accepted'], result['duplicates']), (0, 1))
+        self.assertFalse(Sale.objects.filter(branch=branch).exists())
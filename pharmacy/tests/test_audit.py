@@ -0,0 +1,104 @@
+from datetime import date
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from pharmacy import audit, branches
+from pharmacy.models import AuditEntry, Medicine, PharmacyUser, Role, Sale
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class AuditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = PharmacyUser.objects.create_user(
+            'admin', password='admin', role=Role.objects.create(name='admin', description='Administrator'),
+        )
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=100, displayed_quantity=1,
+            unit_price=10, selling_price=15, expiry_date=date(2100, 1, 1),
+        )
+
+    def setUp(self):
+        # Nothing left over from another test, and nothing left behind.
+        audit.flush()
+        self.addCleanup(audit.flush)
+
+    def test_view_changes_are_diffed_and_written_on_flush(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('edit_medicine', args=[self.medicine.pk]), {
+                'code': 'HM-001', 'item_description': 'Paracetamol', 'category': '', 'quantity': 100,
+                'unit_price': '10.00', 'selling_price': '18.00', 'expiry_date': '2100-01-01',
+                'displayed_quantity': 1,
+            })
+        # Buffered, not yet written: the request did not wait for the insert.
+        self.assertFalse(AuditEntry.objects.exists())
+        self.assertEqual(audit.flush(), 1)
+        entry = AuditEntry.objects.get()
+        self.assertEqual((entry.model, entry.object_id, entry.action, entry.user_id, entry.username),
+                         ('pharmacy.medicine', str(self.medicine.pk), 'update', self.admin.pk, 'admin'))
+        self.assertEqual(entry.changes, {'selling_price': ['15.00', '18.00']})
+
+    def test_checkout_records_the_stock_change(self):
+        sale = Sale(medicine=Medicine.objects.get(), quantity=3, total_price=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            branches.record_sale(sale)
+        audit.flush()
+        self.assertEqual(AuditEntry.objects.get().changes, {'quantity': [100, 97]})
+
+    def test_rolled_back_and_unchanged_saves_leave_no_trail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Medicine.objects.filter(pk=self.medicine.pk).get().delete()
+                    raise ValueError
+            except ValueError:
+                pass
+            Medicine.objects.get().save()
+            self.admin.save(update_fields=['last_login'])
+        self.assertEqual(audit.pending(), 0)
+
+    def test_passwords_are_hidden(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = PharmacyUser.objects.create_user('ann', password='secret')
+            user.set_password('other')
+            user.save()
+        audit.flush()
+        self.assertEqual(
+            [entry.changes.get('password') for entry in AuditEntry.objects.order_by('pk')],
+            [[None, '***'], ['***', '***']],
+        )
+
+    @override_settings(AUDIT_BATCH_SIZE=2)
+    def test_full_batch_is_written_by_the_commit_that_fills_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Role.objects.create(name='cashier', description='Cashier')
+        self.assertFalse(AuditEntry.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Role.objects.create(name='inventory', description='Inventory')
+        self.assertEqual(AuditEntry.objects.count(), 2)
+        self.assertEqual(audit.pending(), 0)
+
+    def test_failed_write_keeps_the_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Role.objects.create(name='cashier', description='Cashier')
+        with mock.patch.object(AuditEntry.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                audit.flush()
+        self.assertEqual(audit.pending(), 1)
+        self.assertEqual(audit.flush(), 1)
+
+    def test_log_page_is_admin_only_and_filters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Role.objects.create(name='cashier', description='Cashier')
+            PharmacyUser.objects.create_user('ann')
+        audit.flush()
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('audit_log'), {'model': 'pharmacy.role'})
+        self.assertEqual([entry.object_repr for entry in response.context['entries']], ['Cashier'])
+
+        self.client.force_login(PharmacyUser.objects.get(username='ann'))
+        self.assertEqual(self.client.get(reverse('audit_log')).status_code, 403)
@@ -0,0 +1,109 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from pharmacy import branches
+from pharmacy.models import Branch, BranchStock, Medicine, MedicineInventory, PharmacyUser, Role, Sale
+
+
+class BranchStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.north = Branch.objects.create(code='N', name='North')
+        cls.south = Branch.objects.create(code='S', name='South')
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=0,
+            unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+        )
+        cashier = Role.objects.create(name='cashier', description='Cashier')
+        cls.cashier = PharmacyUser.objects.create_user('north', password='x', role=cashier, branch=cls.north)
+
+    def stock(self, branch):
+        return BranchStock.objects.get(branch=branch, medicine=self.medicine).quantity
+
+    def receive(self, branch, quantity):
+        MedicineInventory.objects.create(medicine=self.medicine, branch=branch, quantity=quantity, unit_price=1)
+
+    def test_receipts_add_to_branch_and_chain_total(self):
+        self.receive(self.north, 30)
+        self.receive(self.north, 10)
+        self.medicine.refresh_from_db()
+        self.assertEqual((self.stock(self.north), self.medicine.quantity), (40, 40))
+
+    def test_receipt_does_not_undo_a_sale_made_since_loading(self):
+        self.receive(None, 10)
+        medicine = Medicine.objects.get()
+        branches.record_sale(Sale(medicine=Medicine.objects.get(), quantity=4))
+        MedicineInventory.objects.create(medicine=medicine, quantity=5, unit_price=1)
+        self.assertEqual(Medicine.objects.get().quantity, 11)
+
+    def test_transfer_moves_stock_or_nothing(self):
+        self.receive(self.north, 30)
+        branches.transfer(self.medicine, self.north, self.south, 12)
+        self.assertEqual((self.stock(self.north), self.stock(self.south)), (18, 12))
+
+        with self.assertRaises(branches.InsufficientStock):
+            branches.transfer(self.medicine, self.north, self.south, 19)
+        self.assertEqual((self.stock(self.north), self.stock(self.south)), (18, 12))
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.quantity, 30)
+
+    def test_branch_sale_uses_branch_stock(self):
+        self.receive(self.north, 5)
+        self.receive(self.south, 50)
+        self.client.force_login(self.cashier)
+
+        self.client.post(reverse('add_sale'), {'medicine': self.medicine.pk, 'quantity': 6, 'total_price': 0})
+        self.assertFalse(Sale.objects.exists())
+
+        self.client.post(reverse('add_sale'), {'medicine': self.medicine.pk, 'quantity': 4, 'total_price': 0})
+        sale = Sale.objects.get()
+        self.medicine.refresh_from_db()
+        self.assertEqual((sale.branch, self.stock(self.north), self.medicine.quantity), (self.north, 1, 51))
+
+    def test_checkouts_from_stale_instances_keep_every_decrement(self):
+        self.receive(None, 10)
+        first, second = Medicine.objects.get(), Medicine.objects.get()
+        branches.record_sale(Sale(medicine=first, quantity=3))
+        branches.record_sale(Sale(medicine=second, quantity=4))
+        self.assertEqual((second.quantity, Medicine.objects.get().quantity), (3, 3))
+
+        with self.assertRaises(branches.InsufficientStock):
+            branches.record_sale(Sale(medicine=first, quantity=4))
+        self.medicine.refresh_from_db()
+        self.assertEqual((self.medicine.quantity, self.medicine.is_low_stock, Sale.objects.count()), (3, False, 2))
+
+        self.medicine.displayed_quantity = 3
+        self.medicine.save()
+        branches.record_sale(Sale(medicine=first, quantity=1))
+        self.assertTrue(Medicine.objects.get().is_low_stock)
+        branches.cancel_sale(Sale.objects.latest('pk'))
+        self.assertEqual(Medicine.objects.values_list('quantity', 'is_low_stock').get(), (3, True))
+        branches.cancel_sale(Sale.objects.latest('pk'))
+        self.assertEqual(Medicine.objects.values_list('quantity', 'is_low_stock').get(), (7, False))
+
+    def test_views_are_scoped_to_the_users_branch(self):
+        self.receive(self.south, 5)
+        other = Sale.objects.create(medicine=self.medicine, branch=self.south, quantity=1)
+        self.client.force_login(self.cashier)
+
+        self.assertEqual(list(self.client.get(reverse('sale_list')).context['sales']), [])
+        own = Sale.objects.create(medicine=self.medicine, branch=self.north, quantity=2, total_price=4)
+        response = self.client.get(reverse('sale_list'))
+        self.assertEqual(
+            [(period, [sale.pk for sale in sales], total['total_amount']) for period, _, sales, total
+             in response.context['periods'] if period in ('today', 'yesterday')],
+            [('today', [own.pk], 4), ('yesterday', [], 0)],
+        )
+        self.assertContains(response, reverse('sale_detail', args=[own.pk]))
+        self.assertEqual(self.client.get(reverse('sale_detail', args=[other.pk])).status_code, 404)
+
+    def test_head_office_picks_a_branch(self):
+        admin = PharmacyUser.objects.create_user('admin', password='x', role=Role.objects.create(name='admin'))
+        self.client.force_login(admin)
+        url = reverse('branch_stock')
+        self.assertEqual(self.client.get(url).context['branch'], self.north)
+        self.assertEqual(self.client.get(url, {'branch': self.south.pk}).context['branch'], self.south)
+        for branch in ['abc', '-1', '999']:
+            self.assertEqual(self.client.get(url, {'branch': branch}).status_code, 404)
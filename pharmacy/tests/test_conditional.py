@@ -0,0 +1,71 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from pharmacy.models import Medicine, PharmacyUser, Role, Sale
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='admin', description='Administrator')
+        cls.admin = PharmacyUser.objects.create_user('admin', password='admin', role=role)
+        cls.other = PharmacyUser.objects.create_user('other', password='other', role=role)
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=100, displayed_quantity=10,
+            unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+        )
+        cls.sale = Sale.objects.create(medicine=cls.medicine, quantity=1, created_by=cls.admin)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, headers={
+            'If-None-Match': response['ETag'], 'If-Modified-Since': response.get('Last-Modified', ''),
+        })
+
+    def test_unchanged_list_is_not_rendered_again(self):
+        url = reverse('medicine_list')
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        revalidated = self.revalidate(url, response)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def test_changes_to_shown_rows_invalidate(self):
+        extra = Medicine.objects.create(
+            code='HM-002', item_description='Ibuprofen', quantity=1, displayed_quantity=1,
+            unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+        )
+        url = reverse('medicine_list')
+        response = self.client.get(url)
+        self.medicine.quantity = 5
+        self.medicine.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+        response = self.client.get(url)
+        # Deleting an older row leaves the newest updated_at alone; the count catches it.
+        extra.delete()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_detail_follows_related_rows_and_user(self):
+        url = reverse('sale_detail', args=[self.sale.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.medicine.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+        response = self.client.get(url)
+        self.client.force_login(self.other)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_pending_messages_are_rendered(self):
+        url = reverse('medicine_list')
+        response = self.client.get(url)
+        self.client.post(reverse('job_enqueue'), {'name': 'unknown'})
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Unknown job: unknown')
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from pharmacy import expiry
+from pharmacy.models import DailySales, Medicine
+
+
+class ExpiryRiskTests(TestCase):
+    def medicine(self, code, quantity, unit_price, expires_in, sold_per_day=0):
+        today = timezone.localdate()
+        medicine = Medicine.objects.create(
+            code=code, item_description=code, quantity=quantity, unit_price=unit_price,
+            selling_price=unit_price * 2, expiry_date=today + timedelta(days=expires_in),
+        )
+        if sold_per_day:
+            DailySales.objects.bulk_create(
+                DailySales(medicine=medicine, date=today - timedelta(days=day),
+                           quantity=sold_per_day, amount=0)
+                for day in range(10)
+            )
+        return medicine
+
+    def test_scores_unsold_units_and_ranks_by_value(self):
+        self.medicine('HM-001', quantity=100, unit_price=1, expires_in=20, sold_per_day=2)
+        self.medicine('HM-002', quantity=50, unit_price=10, expires_in=-5)
+        self.medicine('HM-003', quantity=30, unit_price=5, expires_in=10, sold_per_day=3)
+        self.medicine('HM-004', quantity=30, unit_price=5, expires_in=400)
+
+        rows, totals = expiry.expiry_risk(horizon_days=180, velocity_days=10)
+
+        # HM-002 already expired: all 50 units. HM-001 sells 40 of 100 in time.
+        # HM-003 sells out before expiry; HM-004 is outside the horizon.
+        self.assertEqual(
+            [(row['medicine'].code, row['units_at_risk'], row['value_at_risk']) for row in rows],
+            [('HM-002', 50, 500.0), ('HM-001', 60, 60.0)],
+        )
+        self.assertEqual(totals, {'medicines': 2, 'units': 110, 'value': 560.0})
+
+    def test_deleted_medicines_are_not_at_risk(self):
+        self.medicine('HM-001', quantity=10, unit_price=1, expires_in=5)
+        self.medicine('HM-002', quantity=20, unit_price=1, expires_in=5).soft_delete()
+
+        rows, totals = expiry.expiry_risk(horizon_days=180, velocity_days=10)
+
+        self.assertEqual([row['medicine'].code for row in rows], ['HM-001'])
+        self.assertEqual(totals, {'medicines': 1, 'units': 10, 'value': 10.0})
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.test import TestCase
+
+from pharmacy import forecasting
+from pharmacy.models import DailySales, DemandForecast, Medicine
+
+
+class ForecastingTests(TestCase):
+    def test_exponential_smoothing_matches_recursive_definition(self):
+        matrix = np.random.default_rng(0).poisson(3, size=(5, 40)).astype(np.float32)
+        alpha = 0.3
+        level = matrix[:, 0].astype(np.float64)
+        for day in range(1, matrix.shape[1]):
+            level = alpha * matrix[:, day] + (1 - alpha) * level
+        np.testing.assert_allclose(forecasting.exponential_smoothing(matrix, alpha), level, rtol=1e-5)
+
+    def test_forecast_reads_rollup_into_matrix_and_stores_rows(self):
+        medicines = [
+            Medicine.objects.create(
+                code=f'HM-00{i}', item_description=f'Medicine {i}', unit_price=1,
+                selling_price=2, expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in (1, 2)
+        ]
+        yesterday = date.today() - timedelta(days=1)
+        DailySales.objects.bulk_create(
+            DailySales(medicine=medicines[0], date=yesterday - timedelta(days=day), quantity=4, amount=8)
+            for day in range(10)
+        )
+        ids, matrix = forecasting.demand_matrix(10)
+        self.assertEqual(ids.tolist(), [medicine.pk for medicine in medicines])
+        self.assertEqual(matrix.sum(axis=1).tolist(), [40, 0])
+
+        self.assertEqual(forecasting.forecast(history_days=10, window=5, alpha=0.5, horizon=30), 2)
+        busy, idle = DemandForecast.objects.order_by('medicine_id')
+        self.assertAlmostEqual(busy.moving_average, 4)
+        self.assertAlmostEqual(busy.expected_demand, 120, places=3)
+        self.assertEqual(idle.expected_demand, 0)
+
+    def test_deleted_medicines_are_left_out_with_their_history(self):
+        medicines = [
+            Medicine.objects.create(
+                code=f'HM-00{i}', item_description=f'Medicine {i}', unit_price=1,
+                selling_price=2, expiry_date=date.today() + timedelta(days=365),
+            )
+            for i in (1, 2, 3)
+        ]
+        yesterday = date.today() - timedelta(days=1)
+        DailySales.objects.bulk_create(
+            DailySales(medicine=medicine, date=yesterday, quantity=quantity, amount=0)
+            for medicine, quantity in zip(medicines, (1, 2, 3))
+        )
+        # In the middle, its history would shift onto HM-003; at the end it
+        # would fall past the last row.
+        for deleted in (medicines[1], medicines[2]):
+            deleted.soft_delete()
+            ids, matrix = forecasting.demand_matrix(1)
+            live = [medicine for medicine in medicines if medicine.deleted_at is None]
+            self.assertEqual(ids.tolist(), [medicine.pk for medicine in live])
+            self.assertEqual(matrix[:, 0].tolist(), [medicines.index(medicine) + 1 for medicine in live])
+        self.assertEqual(forecasting.forecast(history_days=1, window=1), 1)
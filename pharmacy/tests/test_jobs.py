@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from pharmacy import jobs
+from pharmacy.models import Job
+
+
+def succeed(job, value):
+    job.report(50, 'halfway')
+    return {'value': value}
+
+
+def explode(job):
+    raise RuntimeError('boom')
+
+
+def linger(job):
+    time.sleep(0.3)
+    return {}
+
+
+def taken(job):
+    # As if this worker stalled, the job was requeued as stale and another
+    # worker picked it up.
+    Job.objects.filter(pk=job.pk).update(status=Job.QUEUED, worker='')
+    jobs.claim('worker-b')
+    return {'value': 'stale'}
+
+
+TASKS = {
+    'succeed': 'pharmacy.tests.test_jobs.succeed', 'explode': 'pharmacy.tests.test_jobs.explode',
+    'linger': 'pharmacy.tests.test_jobs.linger', 'taken': 'pharmacy.tests.test_jobs.taken',
+}
+
+
+@override_settings(JOB_TASKS=TASKS, JOB_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('missing')
+
+    def test_claim_is_exclusive_and_run_stores_result(self):
+        job = jobs.enqueue('succeed', value=42)
+        claimed = jobs.claim('worker-a')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(jobs.claim('worker-b'))
+
+        self.assertTrue(jobs.run(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress, job.attempts), (Job.SUCCEEDED, {'value': 42}, 100, 1))
+
+    def test_failure_is_retried_with_backoff_then_marked_failed(self):
+        job = jobs.enqueue('explode', max_attempts=2)
+        with self.assertLogs('pharmacy.jobs', 'ERROR'):
+            jobs.run(jobs.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('RuntimeError: boom', job.error)
+        # Not runnable until the backoff has passed.
+        self.assertIsNone(jobs.claim('worker'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('pharmacy.jobs', 'ERROR'):
+            jobs.run(jobs.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_burst_worker_drains_queue(self):
+        for value in range(3):
+            jobs.enqueue('succeed', value=value)
+        self.assertEqual(jobs.work('worker', lambda: False, burst=True), 3)
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 3)
+
+    def test_stale_running_job_is_requeued(self):
+        job = jobs.enqueue('succeed', value=1)
+        jobs.claim('worker')
+        with mock.patch('pharmacy.jobs.timezone.now', return_value=timezone.now() + timedelta(hours=1)):
+            self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_outcome_of_a_job_taken_over_is_not_recorded(self):
+        job = jobs.enqueue('taken')
+        with self.assertLogs('pharmacy.jobs', 'WARNING'):
+            self.assertFalse(jobs.run(jobs.claim('worker-a')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.result), (Job.RUNNING, 'worker-b', None))
+
+
+@override_settings(JOB_TASKS=TASKS, JOB_HEARTBEAT_INTERVAL=0.05)
+class JobHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_is_kept_while_the_task_runs(self):
+        job = jobs.enqueue('linger')
+        claimed = jobs.claim('worker')
+        self.assertTrue(jobs.run(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertGreater(job.heartbeat_at, claimed.heartbeat_at + timedelta(seconds=0.1))
@@ -0,0 +1,82 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from pharmacy import analytics
+from pharmacy.models import DailySales, Medicine, MedicineInventory, PharmacyUser, Role, Sale
+
+
+class MarginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = PharmacyUser.objects.create_user(
+            'admin', password='admin', role=Role.objects.create(name='admin', description='Administrator'),
+        )
+        cls.cashier = PharmacyUser.objects.create_user(
+            'cashier', password='cashier', role=Role.objects.create(name='cashier', description='Cashier'),
+        )
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=100, displayed_quantity=1,
+            unit_price=10, selling_price=15, expiry_date=date(2100, 1, 1),
+        )
+        cls.today = timezone.localdate()
+
+    def sell(self, quantity, **fields):
+        return Sale.objects.create(medicine=self.medicine, quantity=quantity, created_by=self.cashier,
+                                   total_price=0, **fields)
+
+    def margins(self, group):
+        totals = analytics.compute(self.today, self.today, group=group)['totals']
+        return totals['cost'], totals['margin']
+
+    def test_sales_keep_their_cost_after_a_price_change(self):
+        self.assertEqual(self.sell(2).unit_cost, Decimal('10'))
+        Medicine.objects.filter(pk=self.medicine.pk).update(unit_price=20)
+        # From the rollup, from the sales themselves, and after a rebuild.
+        self.assertEqual(self.margins(['medicine']), (Decimal('20.00'), Decimal('10.00')))
+        self.assertEqual(self.margins(['medicine', 'cashier']), (Decimal('20.00'), Decimal('10.00')))
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(self.margins(['medicine']), (Decimal('20.00'), Decimal('10.00')))
+
+    def test_backfill_takes_the_last_receipt_before_each_sale(self):
+        now = timezone.now()
+        sales = [self.sell(1), self.sell(1), self.sell(1)]
+        for receipt_price, days_ago in [(8, 20), (9, 10)]:
+            receipt = MedicineInventory.objects.create(
+                medicine=self.medicine, quantity=10, unit_price=receipt_price, total_price=0, created_by=self.admin,
+            )
+            MedicineInventory.objects.filter(pk=receipt.pk).update(created_at=now - timedelta(days=days_ago))
+        # Before any receipt, between the two, and after both.
+        for sale, days_ago in zip(sales, [30, 15, 0]):
+            Sale.objects.filter(pk=sale.pk).update(created_at=now - timedelta(days=days_ago), unit_cost=None)
+
+        out = io.StringIO()
+        call_command('backfill_sale_cost', batch_size=1, stdout=out)
+        self.assertIn('Filled in the unit cost of 3 sales', out.getvalue())
+        self.assertEqual(list(Sale.objects.order_by('created_at').values_list('unit_cost', flat=True)),
+                         [Decimal('10'), Decimal('8'), Decimal('9')])
+        # The rollups were rebuilt from the filled-in costs.
+        self.assertEqual(DailySales.objects.get(date=self.today).cost, Decimal('9'))
+        call_command('rebuild_sales_rollup', days=1, stdout=io.StringIO())
+        self.assertEqual(sorted(DailySales.objects.values_list('cost', flat=True)),
+                         [Decimal('8'), Decimal('9'), Decimal('10')])
+        self.assertEqual(analytics.backfill_unit_cost(), 0)
+
+    def test_report_is_admin_only_and_ranks_by_margin(self):
+        self.sell(2)
+        url = reverse('margin_report')
+        self.client.force_login(self.cashier)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        report = self.client.get(url).context['report']
+        self.assertEqual((report['source'], report['group']), ('medicine_rollup', ['medicine']))
+        self.assertEqual([(row['code'], row['margin'], row['margin_percent']) for row in report['rows']],
+                         [('HM-001', Decimal('10.00'), Decimal('33.3'))])
+        response = self.client.get(url, {'start_date': self.today, 'end_date': self.today - timedelta(days=1)})
+        self.assertNotIn('report', response.context)
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from pharmacy.maintenance import ensure_medicine_status, refresh_medicine_status
+from pharmacy.models import Medicine
+
+
+@override_settings(EXPIRING_SOON_DAYS=30)
+class MedicineStatusTests(TestCase):
+    def medicine(self, code, quantity=100, expires_in=365):
+        return Medicine.objects.create(
+            code=code, item_description=code, quantity=quantity, displayed_quantity=10,
+            unit_price=1, selling_price=2, expiry_date=timezone.localdate() + timedelta(days=expires_in),
+        )
+
+    def flags(self, medicine):
+        medicine.refresh_from_db()
+        return medicine.is_expired, medicine.is_expiring, medicine.is_low_stock
+
+    def test_save_sets_flags(self):
+        medicine = self.medicine('HM-001', quantity=5, expires_in=-1)
+        self.assertEqual(self.flags(medicine), (True, False, True))
+
+        medicine.quantity = 50
+        medicine.expiry_date = timezone.localdate() + timedelta(days=10)
+        medicine.save(update_fields=['quantity', 'expiry_date'])
+        self.assertEqual(self.flags(medicine), (False, True, False))
+
+    def test_refresh_follows_the_date_and_bulk_writes(self):
+        expiring = self.medicine('HM-001', expires_in=1)
+        distant = self.medicine('HM-002', expires_in=40)
+        restocked = self.medicine('HM-003', quantity=5)
+        Medicine.objects.filter(pk=restocked.pk).update(quantity=500)
+
+        changed = refresh_medicine_status(timezone.localdate() + timedelta(days=15))
+
+        self.assertEqual(changed, 4)
+        self.assertEqual(self.flags(expiring), (True, False, False))
+        self.assertEqual(self.flags(distant), (False, True, False))
+        self.assertEqual(self.flags(restocked), (False, False, False))
+        self.assertEqual(refresh_medicine_status(timezone.localdate() + timedelta(days=15)), 0)
+
+    def test_ensure_runs_once_a_day(self):
+        cache.clear()
+        medicine = self.medicine('HM-001')
+        Medicine.objects.filter(pk=medicine.pk).update(quantity=0)
+        with self.assertNumQueries(8):
+            ensure_medicine_status()
+        with self.assertNumQueries(0):
+            ensure_medicine_status()
+        self.assertTrue(self.flags(medicine)[2])
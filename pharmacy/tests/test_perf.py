@@ -0,0 +1,41 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponseNotFound
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from pharmacy import perf
+from pharmacy.middleware import RequestMetricsMiddleware
+
+
+class PerfReportTests(SimpleTestCase):
+    def test_reads_the_log_and_its_rotated_copies(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, 'perf.log')
+            with self.assertRaisesMessage(CommandError, 'No performance log'):
+                call_command('perf_report', log=log)
+
+            for name, durations in [('perf.log.2', [1, 2]), ('perf.log.1', [3]), ('perf.log', [4]),
+                                    ('perf.log.old', [99])]:
+                with open(os.path.join(directory, name), 'w') as file:
+                    file.writelines(json.dumps({'url_name': 'dashboard', 'duration_ms': ms}) + '\n'
+                                    for ms in durations)
+            output = io.StringIO()
+            call_command('perf_report', log=log, stdout=output)
+            self.assertEqual(output.getvalue().splitlines()[1].split()[:3], ['dashboard', '4', '3.0'])
+
+
+@override_settings(PERF_METRICS=True)
+class RequestMetricsTests(SimpleTestCase):
+    def test_unresolved_paths_share_one_name(self):
+        middleware = RequestMetricsMiddleware(lambda request: HttpResponseNotFound())
+        before = set(perf.recent())
+        with self.assertLogs('pharmacy.perf', 'INFO'):
+            for path in ['/wp-login.php', '/.env', '/random/404']:
+                middleware(RequestFactory().get(path))
+        self.assertEqual(set(perf.recent()) - before, {perf.UNRESOLVED} - before)
+        self.assertGreaterEqual(len(perf.recent()[perf.UNRESOLVED]), 3)
@@ -0,0 +1,78 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from pharmacy import pricing
+from pharmacy.models import Medicine, PharmacyUser, PriceHistory, PriceUpdate, Role
+
+
+class PricingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacist = PharmacyUser.objects.create_user(
+            'pharmacist', password='pharmacist', role=Role.objects.create(name='pharmacist', description='Pharmacist'),
+        )
+        cls.cashier = PharmacyUser.objects.create_user(
+            'cashier', password='cashier', role=Role.objects.create(name='cashier', description='Cashier'),
+        )
+        Medicine.objects.bulk_create(
+            Medicine(
+                code=code, item_description=code, category=category, quantity=10, displayed_quantity=1,
+                unit_price=Decimal(unit_price), selling_price=Decimal('1.25'), expiry_date=date(2100, 1, 1),
+            )
+            for code, category, unit_price in [
+                ('HM-001', 'Analgesics', '1.10'),
+                ('HM-002', 'Analgesics', '0.33'),
+                ('HM-003', 'Analgesics', '1.00'),
+                ('HM-004', 'Antibiotics', '2.00'),
+            ]
+        )
+
+    def prices(self):
+        return dict(Medicine.objects.values_list('code', 'selling_price'))
+
+    def test_preview_rounds_half_up_and_skips_unchanged_prices(self):
+        rule = PriceUpdate(markup_percent=25, rounding=Decimal('0.05'), categories=['Analgesics'])
+        # 1.10 * 1.25 = 1.375 rounds up to 1.40; HM-003 already sells at 1.25.
+        self.assertEqual(list(pricing.preview(rule)), [
+            ('HM-001', 'HM-001', 'Analgesics', Decimal('1.10'), Decimal('1.25'), Decimal('1.40')),
+            ('HM-002', 'HM-002', 'Analgesics', Decimal('0.33'), Decimal('1.25'), Decimal('0.40')),
+        ])
+        self.assertEqual(pricing.summary(rule), {
+            'medicines': 2, 'raised': 1, 'lowered': 1, 'stock_value_change': Decimal('-7.00'),
+        })
+        self.assertEqual(self.prices()['HM-001'], Decimal('1.25'))
+
+    def test_apply_records_history_and_touches_updated_at(self):
+        before = Medicine.objects.get(code='HM-004').updated_at
+        rule = PriceUpdate(markup_percent=Decimal('12.5'), rounding=Decimal('0.10'))
+        self.assertEqual(pricing.apply(rule, self.pharmacist), 4)
+        self.assertEqual(self.prices(), {
+            'HM-001': Decimal('1.20'), 'HM-002': Decimal('0.40'), 'HM-003': Decimal('1.10'), 'HM-004': Decimal('2.30'),
+        })
+        history = PriceHistory.objects.get(medicine__code='HM-004')
+        self.assertEqual((history.old_price, history.new_price), (Decimal('1.25'), Decimal('2.30')))
+        self.assertEqual(history.price_update, rule)
+        self.assertGreater(Medicine.objects.get(code='HM-004').updated_at, before)
+        # Applying the same rule again changes nothing.
+        self.assertEqual(pricing.apply(PriceUpdate(markup_percent=Decimal('12.5'), rounding=Decimal('0.10'))), 0)
+
+    def test_views_preview_stream_and_apply(self):
+        url = reverse('price_update')
+        rule = {'categories': ['Antibiotics'], 'markup_percent': '50', 'rounding': '1.00'}
+        self.client.force_login(self.cashier)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.pharmacist)
+        response = self.client.get(url, rule)
+        self.assertEqual(response.context['summary']['medicines'], 1)
+        response = self.client.get(reverse('price_update_preview'), rule)
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            ','.join(pricing.PREVIEW_COLUMNS), 'HM-004,HM-004,Antibiotics,2.00,1.25,3.00',
+        ])
+
+        self.client.post(url, rule)
+        self.assertEqual(self.prices()['HM-004'], Decimal('3.00'))
+        self.assertEqual(PriceUpdate.objects.get().created_by, self.pharmacist)
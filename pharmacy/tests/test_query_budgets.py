@@ -0,0 +1,250 @@
+import uuid
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from pharmacy.models import (
+    ArchivedSale, AuditEntry, Branch, BranchStock, Job, Medicine, MedicineInventory, PharmacyUser, Role, Sale, Shift, ShiftLine,
+    StockCount, StockTake, StockTransfer,
+)
+
+
+class QueryBudgetMixin:
+    """Every view must run the same number of queries whatever the table sizes.
+
+    Subclasses pick the number of rows; the budgets below are shared, so a
+    view whose query count grows with the data fails in the larger case.
+    """
+    rows = None
+
+    @classmethod
+    def setUpTestData(cls):
+        roles = {
+            name: Role.objects.create(name=name, description=label)
+            for name, label in Role.ROLE_CHOICES
+        }
+        cls.admin = PharmacyUser.objects.create_user('admin', password='admin', role=roles['admin'])
+        role_list = list(roles.values())
+        PharmacyUser.objects.bulk_create(
+            PharmacyUser(username=f'user{i}', first_name='User', last_name=str(i), role=role_list[i % len(role_list)])
+            for i in range(cls.rows)
+        )
+        today = date.today()
+        Medicine.objects.bulk_create(
+            Medicine(
+                code=f'HM-{i:03}', item_description=f'Medicine {i}',
+                quantity=i % 50, displayed_quantity=20, unit_price=1, selling_price=2,
+                # Spread expiry dates so the expired and expiring-soon lists have rows.
+                expiry_date=today + timedelta(days=i % 120 - 30),
+            )
+            for i in range(1, cls.rows + 1)
+        )
+        medicines = list(Medicine.objects.all())
+        Sale.objects.bulk_create(
+            Sale(medicine=medicines[i % len(medicines)], quantity=1, total_price=2, created_by=cls.admin)
+            for i in range(cls.rows)
+        )
+        # Archived on the same day, so the sales report lists them too.
+        now = timezone.now()
+        ArchivedSale.objects.bulk_create(
+            ArchivedSale(id=10 ** 6 + i, uuid=uuid.uuid4(), medicine=medicines[i % len(medicines)], quantity=1,
+                         total_price=2, created_by=cls.admin, created_at=now, updated_at=now)
+            for i in range(cls.rows)
+        )
+        MedicineInventory.objects.bulk_create(
+            MedicineInventory(
+                medicine=medicines[i % len(medicines)], quantity=10, unit_price=1,
+                total_price=10, created_by=cls.admin,
+            )
+            for i in range(cls.rows)
+        )
+        Job.objects.bulk_create(Job(name='purge_sessions', created_by=cls.admin) for i in range(cls.rows))
+        branches = Branch.objects.bulk_create(Branch(code=f'B{i}', name=f'Branch {i}') for i in range(3))
+        BranchStock.objects.bulk_create(
+            BranchStock(branch=branch, medicine=medicine, quantity=5)
+            for branch in branches for medicine in medicines
+        )
+        StockTransfer.objects.bulk_create(
+            StockTransfer(medicine=medicines[i % len(medicines)], from_branch=branches[0],
+                          to_branch=branches[1], quantity=1, created_by=cls.admin)
+            for i in range(cls.rows)
+        )
+        cls.stock_take = StockTake.objects.create(created_by=cls.admin)
+        StockCount.objects.bulk_create(
+            StockCount(stock_take=cls.stock_take, medicine=medicine, counted=3) for medicine in medicines
+        )
+        Shift.objects.bulk_create(Shift(cashier=cls.admin, closed_at=timezone.now()) for i in range(cls.rows))
+        cls.shift = Shift.objects.first()
+        ShiftLine.objects.bulk_create(
+            ShiftLine(shift=cls.shift, medicine=medicine, sale_count=1, quantity=1, amount=2) for medicine in medicines
+        )
+        AuditEntry.objects.bulk_create(
+            AuditEntry(model='pharmacy.medicine', object_id=str(medicine.pk), object_repr=str(medicine),
+                       action=AuditEntry.UPDATE, changes={'quantity': [1, 0]}, user=cls.admin, username='admin')
+            for medicine in medicines
+        )
+        cls.branch = branches[0]
+        cls.medicine = medicines[0]
+        cls.sale = Sale.objects.first()
+        cls.inventory = MedicineInventory.objects.first()
+        cls.job = Job.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def assertQueryBudget(self, budget, url_name, *args):
+        # The first request primes the session cache; budget the steady state.
+        url = reverse(url_name, args=args)
+        self.client.get(url)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def assertNotModifiedBudget(self, url_name, *args):
+        # A revalidation costs the user and role lookups every view makes,
+        # plus the one query the page's ETag is built from.
+        url = reverse(url_name, args=args)
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(3):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_dashboard(self):
+        self.assertQueryBudget(5, 'dashboard')
+
+    def test_user_list(self):
+        self.assertQueryBudget(3, 'user_list')
+
+    def test_user_create_form(self):
+        self.assertQueryBudget(4, 'user_create')
+
+    def test_user_update_form(self):
+        self.assertQueryBudget(5, 'user_update', self.admin.pk)
+
+    def test_role_list(self):
+        self.assertQueryBudget(3, 'role_list')
+
+    def test_role_create_form(self):
+        self.assertQueryBudget(2, 'role_create')
+
+    def test_role_update_form(self):
+        self.assertQueryBudget(3, 'role_update', self.admin.role_id)
+
+    def test_medicine_list(self):
+        self.assertQueryBudget(4, 'medicine_list')
+
+    def test_add_medicine_form(self):
+        self.assertQueryBudget(2, 'add_medicine')
+
+    def test_edit_medicine_form(self):
+        self.assertQueryBudget(3, 'edit_medicine', self.medicine.pk)
+
+    def test_delete_medicine_confirm(self):
+        self.assertQueryBudget(3, 'delete_medicine', self.medicine.pk)
+
+    def test_price_update(self):
+        self.assertQueryBudget(4, 'price_update')
+
+    def test_margin_report(self):
+        self.assertQueryBudget(3, 'margin_report')
+
+    def test_low_stock_medicines(self):
+        self.assertQueryBudget(4, 'low_stock_medicines')
+
+    def test_expired_medicines(self):
+        self.assertQueryBudget(4, 'expired_medicines')
+
+    def test_expiring_soon_medicines(self):
+        self.assertQueryBudget(4, 'expiring_soon_medicines')
+
+    def test_sale_list(self):
+        self.assertQueryBudget(3, 'sale_list')
+
+    def test_add_sale_form(self):
+        self.assertQueryBudget(3, 'add_sale')
+
+    def test_sale_detail(self):
+        self.assertQueryBudget(5, 'sale_detail', self.sale.pk)
+
+    def test_edit_sale_form(self):
+        self.assertQueryBudget(4, 'edit_sale', self.sale.pk)
+
+    def test_delete_sale_confirm(self):
+        self.assertQueryBudget(4, 'delete_sale', self.sale.pk)
+
+    def test_sales_report(self):
+        self.assertQueryBudget(4, 'sales_report')
+
+    def test_branch_list(self):
+        self.assertQueryBudget(3, 'branch_list')
+
+    def test_branch_update_form(self):
+        self.assertQueryBudget(3, 'branch_update', self.branch.pk)
+
+    def test_branch_stock(self):
+        self.assertQueryBudget(5, 'branch_stock')
+
+    def test_stock_transfer(self):
+        self.assertQueryBudget(6, 'stock_transfer')
+
+    def test_expiry_risk_report(self):
+        self.assertQueryBudget(4, 'expiry_risk_report')
+
+    def test_replenishment_suggestions(self):
+        self.assertQueryBudget(4, 'replenishment_suggestions')
+
+    def test_job_list(self):
+        self.assertQueryBudget(3, 'job_list')
+
+    def test_job_status(self):
+        self.assertQueryBudget(3, 'job_status', self.job.pk)
+
+    def test_medicine_inventory_list(self):
+        self.assertQueryBudget(3, 'medicine_inventory_list')
+
+    def test_add_medicine_inventory_form(self):
+        self.assertQueryBudget(4, 'add_medicine_inventory')
+
+    def test_medicine_inventory_detail(self):
+        self.assertQueryBudget(4, 'medicine_inventory_detail', self.inventory.pk)
+
+    def test_api_sales_page(self):
+        self.assertQueryBudget(3, 'api_collection', 'sales')
+
+    def test_api_medicine(self):
+        self.assertQueryBudget(3, 'api_item', 'medicines', self.medicine.pk)
+
+    def test_stock_take_list(self):
+        self.assertQueryBudget(4, 'stock_take_list')
+
+    def test_stock_take_detail(self):
+        self.assertQueryBudget(5, 'stock_take_detail', self.stock_take.pk)
+
+    def test_shift_list(self):
+        self.assertQueryBudget(4, 'shift_list')
+
+    def test_shift_detail(self):
+        self.assertQueryBudget(4, 'shift_detail', self.shift.pk)
+
+    def test_audit_log(self):
+        self.assertQueryBudget(3, 'audit_log')
+
+    def test_not_modified(self):
+        for url_name in ['medicine_list', 'low_stock_medicines', 'expired_medicines', 'expiring_soon_medicines']:
+            with self.subTest(url_name):
+                self.assertNotModifiedBudget(url_name)
+        self.assertNotModifiedBudget('sale_detail', self.sale.pk)
+        self.assertNotModifiedBudget('medicine_inventory_detail', self.inventory.pk)
+
+
+class SmallDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    rows = 10
+
+
+class LargeDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    rows = 1000
@@ -0,0 +1,105 @@
+import os
+import re
+import tempfile
+import zlib
+from datetime import date
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from pharmacy import receipts, shifts
+from pharmacy.models import Branch, Medicine, PharmacyUser, Role, Sale
+
+
+@override_settings(RECEIPT_WIDTH=32, RECEIPT_HEADER=['Abebe Pharmacy', 'Tel 011 000'], RECEIPT_FOOTER=['Thanks'])
+class ReceiptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cashier = Role.objects.create(name='cashier', description='Cashier')
+        cls.north = Branch.objects.create(code='N', name='North')
+        cls.ann = PharmacyUser.objects.create_user('ann', password='ann', role=cashier, branch=cls.north)
+        cls.bob = PharmacyUser.objects.create_user('bob', password='bob', role=cashier, branch=Branch.objects.create(
+            code='S', name='South',
+        ))
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol 500mg (blister)', quantity=1000, displayed_quantity=1,
+            unit_price=1, selling_price=Decimal('2.50'), expiry_date=date(2100, 1, 1),
+        )
+        cls.shift = shifts.open_shift(cls.ann)
+        cls.sales = [
+            Sale.objects.create(medicine=cls.medicine, quantity=quantity, created_by=cls.ann, branch=cls.north,
+                                total_price=0)
+            for quantity in [1, 3, 2]
+        ]
+
+    def receipts(self):
+        return list(receipts.payloads(Sale.objects.order_by('pk')))
+
+    def test_text_fits_the_roll(self):
+        text = b''.join(receipts.render(self.receipts()[1:2], 'text')).decode()
+        lines = text.rstrip('\f\n').split('\n')
+        self.assertTrue(all(len(line) <= 32 for line in lines), lines)
+        self.assertEqual(lines[:3], ['         Abebe Pharmacy', '          Tel 011 000', '             North'])
+        self.assertTrue(lines[4].startswith(f'No. {self.sales[1].pk:08} '), lines[4])
+        self.assertEqual(lines[8], '  HM-001  3 x 2.50          7.50')
+        self.assertEqual(lines[10], 'TOTAL                   ETB 7.50')
+
+    def test_escpos_cuts_after_each_receipt(self):
+        data = b''.join(receipts.render(self.receipts(), 'escpos'))
+        self.assertTrue(data.startswith(receipts.ESC_INIT))
+        self.assertEqual(data.count(receipts.ESC_CUT), 3)
+        self.assertIn(receipts.ESC_BOLD + b'         Abebe Pharmacy', data)
+
+    def test_pdf_cross_reference_table_points_at_each_object(self):
+        chunks = list(receipts.render(self.receipts(), 'pdf'))
+        # The header, one chunk per receipt, then the page tree and index.
+        self.assertEqual(len(chunks), 5)
+        data = b''.join(chunks)
+        start = int(re.search(rb'startxref\n(\d+)\n%%EOF\n$', data).group(1))
+        self.assertTrue(data[start:].startswith(b'xref\n0 10\n'))
+        offsets = re.findall(rb'(\d{10}) 00000 n ', data[start:])
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(data[int(offset):].startswith(b'%d 0 obj' % number), number)
+        self.assertIn(b'/Kids [5 0 R 7 0 R 9 0 R] /Count 3', data)
+
+        stream = re.search(rb'stream\n(.*?)\nendstream', data, re.S).group(1)
+        self.assertIn(b'(Paracetamol 500mg \\(blister\\)) Tj', zlib.decompress(stream))
+
+    def test_receipt_view_is_scoped_to_the_branch(self):
+        url = reverse('sale_receipt', args=[self.sales[0].pk])
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.force_login(self.ann)
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn(b'ETB 2.50', response.content)
+        self.assertEqual(self.client.get(url, {'format': 'html'}).status_code, 400)
+
+    def test_reprint_streams_one_document_in_one_query_per_table(self):
+        self.client.force_login(self.ann)
+        url = reverse('receipt_reprint')
+        response = self.client.get(url, {'shift': self.shift.pk, 'format': 'pdf'})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="receipts-shift-{self.shift.pk}.pdf"')
+        # Recent and archived sales.
+        with self.assertNumQueries(2):
+            data = b''.join(response.streaming_content)
+        self.assertIn(b'/Count 3', data)
+
+        response = self.client.get(url, {'format': 'escpos'})
+        self.assertEqual(b''.join(response.streaming_content).count(receipts.ESC_CUT), 3)
+        self.client.force_login(self.bob)
+        response = self.client.get(url, {'format': 'escpos'})
+        self.assertEqual(b''.join(response.streaming_content), receipts.ESC_INIT)
+
+    def test_print_command_writes_to_the_device(self):
+        with tempfile.TemporaryDirectory() as directory:
+            device = os.path.join(directory, 'lp0')
+            call_command('print_receipts', shift=self.shift.pk, output=device)
+            with open(device, 'rb') as printer:
+                self.assertEqual(printer.read().count(receipts.ESC_CUT), 3)
+            call_command('print_receipts', '--start-date=2001-01-01', '--end-date=2001-01-31', '--format=text',
+                         f'--output={device}')
+            self.assertEqual(os.path.getsize(device), 0)
@@ -0,0 +1,54 @@
+import io
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from pharmacy import replenishment
+from pharmacy.models import DailySales, Medicine, Sale
+
+
+@override_settings(
+    REPLENISHMENT_VELOCITY_DAYS=10, REPLENISHMENT_LEAD_TIME_DAYS=5,
+    REPLENISHMENT_REVIEW_DAYS=10, REPLENISHMENT_SERVICE_LEVEL_Z=0,
+)
+class ReplenishmentTests(TestCase):
+    def setUp(self):
+        self.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol 500mg', quantity=1000,
+            displayed_quantity=5, unit_price=1, selling_price=2,
+            expiry_date=date.today() + timedelta(days=365),
+        )
+
+    def rollup(self):
+        return list(DailySales.objects.values_list('quantity', 'amount'))
+
+    def test_rollup_follows_sale_create_edit_and_delete(self):
+        sale = Sale.objects.create(medicine=self.medicine, quantity=3, total_price=6)
+        Sale.objects.create(medicine=self.medicine, quantity=2, total_price=4)
+        self.assertEqual(self.rollup(), [(5, 10)])
+
+        sale.quantity, sale.total_price = 1, 2
+        sale.save()
+        self.assertEqual(self.rollup(), [(3, 6)])
+
+        sale.delete()
+        self.assertEqual(self.rollup(), [(2, 4)])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for quantity in (4, 6):
+            Sale.objects.create(medicine=self.medicine, quantity=quantity, total_price=quantity * 2)
+        incremental = self.rollup()
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_suggests_order_once_stock_falls_to_reorder_point(self):
+        Sale.objects.create(medicine=self.medicine, quantity=100, total_price=200)
+        # 100 units over a 10-day window: 10/day, reorder point 5 days * 10.
+        self.assertEqual(replenishment.suggestions(), [])
+
+        Medicine.objects.filter(pk=self.medicine.pk).update(quantity=50)
+        [row] = replenishment.suggestions()
+        self.assertEqual(row['reorder_point'], 50)
+        self.assertEqual(row['suggested_quantity'], 10 * (5 + 10) - 50)
+        self.assertEqual(row['days_of_cover'], 5.0)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from pharmacy import scheduler
+from pharmacy.cron import Cron
+from pharmacy.models import Job, ScheduledTask
+
+
+def tick_task(job):
+    return {'ok': True}
+
+
+def at(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class CronTests(TestCase):
+    def test_next_after(self):
+        self.assertEqual(Cron('15 2 * * *').next_after(at(2024, 1, 1, 2, 15)), at(2024, 1, 2, 2, 15))
+        self.assertEqual(Cron('*/20 * * * *').next_after(at(2024, 1, 1, 10, 41, 30)), at(2024, 1, 1, 11, 0))
+        # 2024-01-07 is a Sunday; 7 is accepted for Sunday too.
+        self.assertEqual(Cron('30 3 * * 7').next_after(at(2024, 1, 1)), at(2024, 1, 7, 3, 30))
+        self.assertEqual(Cron('0 0 29 2 *').next_after(at(2024, 3, 1)), at(2028, 2, 29))
+        # Both day fields restricted: the 1st of the month or any Monday.
+        self.assertEqual(Cron('0 0 1 * 1').next_after(at(2024, 1, 2)), at(2024, 1, 8))
+
+    def test_invalid_specs(self):
+        for spec in ['* * * *', '60 * * * *', '5-1 * * * *', '*/0 * * * *']:
+            with self.assertRaises(ValueError):
+                Cron(spec)
+
+
+@override_settings(
+    JOB_TASKS={'tick_task': 'pharmacy.tests.test_scheduler.tick_task'},
+    SCHEDULE={'nightly': {'cron': '0 3 * * *', 'task': 'tick_task'}},
+)
+class SchedulerTests(TestCase):
+    def test_first_tick_only_schedules(self):
+        self.assertEqual(scheduler.tick('s1'), [])
+        state = ScheduledTask.objects.get(name='nightly')
+        self.assertGreater(state.next_run_at, timezone.now())
+
+    def test_due_entry_runs_once_across_schedulers(self):
+        due = timezone.now() - timedelta(minutes=1)
+        ScheduledTask.objects.create(name='nightly', next_run_at=due)
+
+        with self.assertLogs('pharmacy.scheduler', 'INFO'):
+            ran = scheduler.tick('s1')
+        self.assertEqual([(job.result, job.worker, job.attempts) for job in ran], [({'ok': True}, 's1', 1)])
+        # A second scheduler that read the old due time loses the claim.
+        self.assertEqual(ScheduledTask.objects.filter(name='nightly', next_run_at=due).update(next_run_at=due), 0)
+        self.assertEqual(scheduler.tick('s2'), [])
+
+        state = ScheduledTask.objects.get(name='nightly')
+        self.assertEqual(state.last_job, ran[0])
+        self.assertGreater(state.next_run_at, timezone.now())
+
+    def test_skips_while_previous_run_unfinished(self):
+        Job.objects.create(name='tick_task', status=Job.RUNNING)
+        ScheduledTask.objects.create(name='nightly', next_run_at=timezone.now() - timedelta(minutes=1))
+        with self.assertLogs('pharmacy.scheduler', 'WARNING'):
+            self.assertEqual(scheduler.tick('s1'), [])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_job_left_by_a_killed_scheduler_does_not_block(self):
+        stale = Job.objects.create(name='tick_task', status=Job.RUNNING, attempts=1, max_attempts=1,
+                                   heartbeat_at=timezone.now() - timedelta(hours=1))
+        ScheduledTask.objects.create(name='nightly', next_run_at=timezone.now() - timedelta(minutes=1))
+        with self.assertLogs('pharmacy.scheduler', 'INFO'):
+            self.assertEqual(len(scheduler.tick('s1')), 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.FAILED)
@@ -0,0 +1,98 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+
+from pharmacy import shifts
+from pharmacy.models import Medicine, PharmacyUser, Role, Sale, Shift, ShiftLine
+
+
+class ShiftTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = PharmacyUser.objects.create_user(
+            'admin', password='admin', role=Role.objects.create(name='admin', description='Administrator'),
+        )
+        cashier = Role.objects.create(name='cashier', description='Cashier')
+        cls.ann = PharmacyUser.objects.create_user('ann', password='ann', role=cashier)
+        cls.bob = PharmacyUser.objects.create_user('bob', password='bob', role=cashier)
+        cls.cheap, cls.dear = (
+            Medicine.objects.create(
+                code=code, item_description=code, quantity=1000, displayed_quantity=1,
+                unit_price=1, selling_price=selling_price, expiry_date=date(2100, 1, 1),
+            )
+            for code, selling_price in [('HM-001', 2), ('HM-002', 12)]
+        )
+
+    def sell(self, medicine, quantity, user=None):
+        return Sale.objects.create(medicine=medicine, quantity=quantity, created_by=user or self.ann, total_price=0)
+
+    def z_report(self, shift):
+        shift.refresh_from_db()
+        lines = shift.lines.order_by('medicine__code').values_list('medicine__code', 'sale_count', 'quantity', 'amount')
+        return (shift.sale_count, shift.quantity, shift.amount), list(lines)
+
+    def test_sales_add_to_the_open_shift_as_they_are_recorded(self):
+        self.sell(self.cheap, 1)
+        shift = shifts.open_shift(self.ann, opening_cash=100)
+        self.sell(self.cheap, 2)
+        kept = self.sell(self.dear, 1)
+        dropped = self.sell(self.cheap, 4)
+        self.sell(self.dear, 3, user=self.bob)
+
+        kept.quantity, kept.total_price = 2, 24
+        kept.save()
+        dropped.delete()
+        self.assertEqual(self.z_report(shift), (
+            (2, 4, Decimal('28.00')),
+            [('HM-001', 1, 2, Decimal('4.00')), ('HM-002', 1, 2, Decimal('24.00'))],
+        ))
+        self.assertEqual(list(shift.sales.order_by('pk')), list(Sale.objects.filter(created_by=self.ann)[1:]))
+        self.assertEqual(shift.expected_cash, Decimal('128.00'))
+
+    def test_close_is_constant_time_and_freezes_the_report(self):
+        shift = shifts.open_shift(self.ann)
+        sale = self.sell(self.dear, 1)
+        # The closing UPDATE and a reread of the row, however many sales there were.
+        with self.assertNumQueries(2):
+            shifts.close(shift, Decimal('10.00'), self.admin)
+        self.assertEqual(shift.cash_difference, Decimal('-2.00'))
+        with self.assertRaises(shifts.ShiftError):
+            shifts.close(shift, Decimal('12.00'))
+
+        # Corrections after the close don't rewrite the snapshot.
+        frozen = self.z_report(shift)
+        sale.quantity, sale.total_price = 5, 60
+        sale.save()
+        self.sell(self.dear, 1)
+        self.assertEqual(self.z_report(shift), frozen)
+        self.assertIsNone(Sale.objects.latest('pk').shift_id)
+
+    def test_one_open_shift_per_cashier(self):
+        shifts.open_shift(self.ann)
+        with self.assertRaises(shifts.ShiftError):
+            shifts.open_shift(self.ann)
+        shifts.open_shift(self.bob)
+        self.assertEqual(Shift.objects.filter(closed_at__isnull=True).count(), 2)
+
+    def test_views(self):
+        self.client.force_login(self.ann)
+        response = self.client.post(reverse('shift_list'), {'opening_cash': '50'})
+        shift = Shift.objects.get(cashier=self.ann)
+        self.assertRedirects(response, reverse('shift_detail', args=[shift.pk]))
+        self.sell(self.cheap, 3)
+        self.assertEqual(self.client.get(reverse('shift_list')).context['current'], shift)
+
+        # Cashiers see only their own shifts; admins see everyone's.
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get(reverse('shift_detail', args=[shift.pk])).status_code, 404)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('shift_detail', args=[shift.pk]))
+        self.assertEqual([line.quantity for line in response.context['lines']], [3])
+
+        self.client.post(reverse('shift_close', args=[shift.pk]), {'counted_cash': '56'})
+        response = self.client.get(reverse('shift_detail', args=[shift.pk]))
+        self.assertIsNone(response.context['form'])
+        self.assertEqual(response.context['shift'].cash_difference, Decimal('0.00'))
+        self.assertEqual(ShiftLine.objects.get().amount, Decimal('6.00'))
@@ -0,0 +1,63 @@
+from datetime import date
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from pharmacy import stocktake
+from pharmacy.models import Branch, BranchStock, Medicine, PharmacyUser, Role, StockAdjustment, StockTake
+
+
+class StockTakeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name='inventory', description='Inventory Manager')
+        cls.user = PharmacyUser.objects.create_user('stock', password='stock', role=role)
+        cls.north = Branch.objects.create(code='N', name='North')
+        Medicine.objects.bulk_create(
+            Medicine(
+                code=f'HM-{i:03}', item_description=f'Medicine {i}', quantity=50, displayed_quantity=10,
+                unit_price=2, selling_price=3, expiry_date=date(2100, 1, 1),
+            )
+            for i in range(1, 4)
+        )
+        cls.medicines = {medicine.code: medicine for medicine in Medicine.objects.all()}
+        BranchStock.objects.create(branch=cls.north, medicine=cls.medicines['HM-001'], quantity=20)
+
+    def test_parse_counts_takes_csv_and_scanner_lines(self):
+        counts, errors = stocktake.parse_counts(['code,count', 'HM-001,4', 'HM-002', 'HM-002', 'HM-001,3', 'HM-003,x'])
+        self.assertEqual(counts, {'HM-001': 7, 'HM-002': 2})
+        self.assertEqual(errors, ["Line 6: 'x' is not a whole number"])
+
+    def test_central_count_posts_variances_against_stock_not_at_branches(self):
+        stock_take = StockTake.objects.create(created_by=self.user)
+        # Central stock of HM-001 is 50 chain-wide less 20 at North.
+        unknown = stocktake.record_counts(stock_take, {'HM-001': 25, 'HM-002': 50, 'HM-404': 1})
+        self.assertEqual(unknown, ['HM-404'])
+        stocktake.record_counts(stock_take, {'HM-001': 2})
+        self.assertEqual(stocktake.summary(stock_take)['units'], -3)
+
+        self.assertEqual(stocktake.post(stock_take, self.user), 1)
+        self.assertEqual(Medicine.objects.get(code='HM-001').quantity, 47)
+        adjustment = StockAdjustment.objects.get()
+        self.assertEqual((adjustment.quantity_before, adjustment.quantity_after, adjustment.quantity), (30, 27, -3))
+        with self.assertRaises(stocktake.StockTakeClosed):
+            stocktake.post(stock_take, self.user)
+
+    def test_branch_count_through_views(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('stock_take_list'), {'branch': self.north.pk, 'note': 'Year end'})
+        stock_take = StockTake.objects.get()
+        upload = SimpleUploadedFile('counts.csv', b'\xef\xbb\xbfHM-001,15\nHM-002,4\n')
+        self.client.post(reverse('stock_take_upload', args=[stock_take.pk]), {'file': upload})
+        response = self.client.get(reverse('stock_take_detail', args=[stock_take.pk]))
+        self.assertEqual(response.context['summary']['differing'], 2)
+
+        self.client.post(reverse('stock_take_post', args=[stock_take.pk]))
+        stock = dict(BranchStock.objects.values_list('medicine__code', 'quantity'))
+        self.assertEqual(stock, {'HM-001': 15, 'HM-002': 4})
+        self.assertEqual(Medicine.objects.get(code='HM-001').quantity, 45)
+        medicine = Medicine.objects.get(code='HM-002')
+        self.assertEqual((medicine.quantity, medicine.is_low_stock), (54, False))
+        response = self.client.get(reverse('stock_take_detail', args=[stock_take.pk]))
+        self.assertEqual([row['variance'] for row in response.context['variances']], [-5, 4])
@@ -0,0 +1,129 @@
+import gzip
+import json
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from pharmacy import sync
+from pharmacy.models import Branch, BranchStock, DailySales, Medicine, Sale, SyncOutbox
+
+
+class SyncIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch = Branch.objects.create(code='N', name='North')
+        cls.medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=100, displayed_quantity=95,
+            unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+        )
+        BranchStock.objects.create(branch=cls.branch, medicine=cls.medicine, quantity=40)
+
+    def rows(self, count, medicine='HM-001'):
+        return [
+            {
+                'uuid': str(uuid.uuid4()), 'medicine': medicine, 'quantity': 2, 'total_price': '4.00',
+                'created_at': datetime(2024, 3, 1, 9, i, tzinfo=dt_timezone.utc).isoformat(), 'created_by': None,
+            }
+            for i in range(count)
+        ]
+
+    def test_ingest_is_idempotent_and_applies_stock_once(self):
+        rows = self.rows(3) + self.rows(1, medicine='HM-404')
+        rows[0]['unit_cost'] = '0.80'
+        result = sync.ingest('N', rows)
+        self.assertEqual((result['accepted'], result['duplicates']), (3, 0))
+        self.assertEqual([row['uuid'] for row in result['rejected']], [rows[3]['uuid']])
+
+        result = sync.ingest('N', rows[:3])
+        self.assertEqual((result['accepted'], result['duplicates']), (0, 3))
+
+        self.medicine.refresh_from_db()
+        self.assertEqual((self.medicine.quantity, self.medicine.is_low_stock), (94, True))
+        self.assertEqual(BranchStock.objects.get(branch=self.branch).quantity, 34)
+        rollup = DailySales.objects.get(medicine=self.medicine)
+        self.assertEqual((rollup.date, rollup.quantity, rollup.amount), (date(2024, 3, 1), 6, 12))
+        # The branch's cost where it sent one, else the central unit price.
+        self.assertEqual(rollup.cost, Decimal('5.60'))
+        # The offline sale time is kept, not the time of the sync.
+        self.assertEqual(Sale.objects.earliest('created_at').created_at, datetime(2024, 3, 1, 9, 0, tzinfo=dt_timezone.utc))
+
+    def test_malformed_rows_are_rejected_one_by_one(self):
+        rows = self.rows(8)
+        rows[1]['quantity'] = -5
+        rows[2]['total_price'] = 'abc'
+        rows[3]['unit_cost'] = 'NaN'
+        rows[4]['created_at'] = '2024-03-01T09:00:00'
+        rows[5]['created_at'] = 20240301
+        del rows[6]['medicine']
+        rows[7]['uuid'] = 'not-a-uuid'
+        result = sync.ingest('N', rows + [['not', 'a', 'sale']])
+        self.assertEqual((result['accepted'], result['duplicates']), (1, 0))
+        self.assertEqual([(row['uuid'], row['error']) for row in result['rejected']], [
+            (rows[1]['uuid'], 'Invalid or missing quantity'),
+            (rows[2]['uuid'], 'Invalid or missing total_price'),
+            (rows[3]['uuid'], 'Invalid or missing unit_cost'),
+            (rows[4]['uuid'], 'Invalid or missing created_at'),
+            (rows[5]['uuid'], 'Invalid or missing created_at'),
+            (rows[6]['uuid'], 'Invalid or missing medicine'),
+            ('not-a-uuid', 'Invalid or missing uuid'),
+            (None, 'A sale must be an object'),
+        ])
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.quantity, 98)
+
+    @override_settings(SYNC_TOKEN='secret')
+    def test_malformed_batches_are_bad_requests(self):
+        url = reverse('sync_sales_ingest')
+        for body in [[], {'branch': 'N', 'sales': 5}, {'branch': 'N'}, 'x']:
+            response = self.client.post(url, json.dumps(body), content_type='application/json',
+                                        headers={'Authorization': 'Token secret'})
+            self.assertEqual(response.status_code, 400)
+
+    @override_settings(SYNC_TOKEN='secret')
+    def test_endpoint_takes_gzip_batches_with_token(self):
+        body = gzip.compress(json.dumps({'branch': 'N', 'sales': self.rows(2)}).encode())
+        url = reverse('sync_sales_ingest')
+        response = self.client.post(url, body, content_type='application/json',
+                                    headers={'Content-Encoding': 'gzip', 'Authorization': 'Token wrong'})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(url, body, content_type='application/json',
+                                    headers={'Content-Encoding': 'gzip', 'Authorization': 'Token secret'})
+        self.assertEqual(response.json(), {'accepted': 2, 'duplicates': 0, 'rejected': []})
+
+
+@override_settings(SYNC_URL='http://central.example/sync/sales/', SYNC_BRANCH='N')
+class SyncPushTests(TestCase):
+    def test_push_sends_batches_and_marks_outcomes(self):
+        medicine = Medicine.objects.create(
+            code='HM-001', item_description='Paracetamol', quantity=100,
+            unit_price=1, selling_price=2, expiry_date=date(2100, 1, 1),
+        )
+        for _ in range(5):
+            sync.queue(Sale.objects.create(medicine=medicine, quantity=1))
+        batches = []
+
+        def send(data):
+            batches.append(data)
+            rejected = [{'uuid': data['sales'][0]['uuid'], 'error': 'Unknown medicine'}] if len(batches) == 1 else []
+            return {'accepted': len(data['sales']) - len(rejected), 'duplicates': 0, 'rejected': rejected}
+
+        totals = sync.push(batch_size=2, send=send)
+
+        self.assertEqual([len(batch['sales']) for batch in batches], [2, 2, 1])
+        self.assertEqual(totals, {'accepted': 4, 'duplicates': 0, 'rejected': 1})
+        self.assertEqual(sync.pending().count(), 0)
+        self.assertEqual(SyncOutbox.objects.exclude(error='').count(), 1)
+
+    def test_payload_keeps_zero_and_missing_costs_apart(self):
+        free = Medicine.objects.create(
+            code='HM-001', item_description='Sample', quantity=10, unit_price=0, selling_price=0,
+            expiry_date=date(2100, 1, 1),
+        )
+        sales = [Sale.objects.create(medicine=free, quantity=1) for _ in range(2)]
+        Sale.objects.filter(pk=sales[1].pk).update(unit_cost=None)
+        data = json.loads(json.dumps(sync.payload([sale.pk for sale in sales])))
+        self.assertEqual({sale['uuid']: sale['unit_cost'] for sale in data['sales']},
+                         {str(sales[0].uuid): '0.00', str(sales[1].uuid): None})
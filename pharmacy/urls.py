@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 from django.contrib.auth import views as auth_views
 from django.views.generic import RedirectView
 
@@ -23,16 +23,41 @@ urlpatterns = [
     path('roles/create/', views.role_create, name='role_create'),
     path('roles/<int:pk>/update/', views.role_update, name='role_update'),
     
+    # Branches
+    path('branches/', views.branch_list, name='branch_list'),
+    path('branches/create/', views.branch_create, name='branch_create'),
+    path('branches/<int:pk>/update/', views.branch_update, name='branch_update'),
+    path('branches/stock/', views.branch_stock, name='branch_stock'),
+    path('branches/transfers/', views.stock_transfer, name='stock_transfer'),
+
+    # Stock takes
+    path('stock-takes/', views.stock_take_list, name='stock_take_list'),
+    path('stock-takes/<int:pk>/', views.stock_take_detail, name='stock_take_detail'),
+    path('stock-takes/<int:pk>/upload/', views.stock_take_upload, name='stock_take_upload'),
+    path('stock-takes/<int:pk>/post/', views.stock_take_post, name='stock_take_post'),
+    path('stock-takes/<int:pk>/cancel/', views.stock_take_cancel, name='stock_take_cancel'),
+
+    # Audit trail
+    path('audit/', views.audit_log, name='audit_log'),
+
+    # Cashier shifts
+    path('shifts/', views.shift_list, name='shift_list'),
+    path('shifts/<int:pk>/', views.shift_detail, name='shift_detail'),
+    path('shifts/<int:pk>/close/', views.shift_close, name='shift_close'),
+    
     # Medicine Management
     path('medicines/', views.medicine_list, name='medicine_list'),
     path('medicines/add/', views.add_medicine, name='add_medicine'),
     path('medicines/<int:pk>/edit/', views.edit_medicine, name='edit_medicine'),
     path('medicines/<int:pk>/delete/', views.delete_medicine, name='delete_medicine'),
+    path('medicines/prices/', views.price_update, name='price_update'),
+    path('medicines/prices/preview.csv', views.price_update_preview, name='price_update_preview'),
     
     # Sales Management
     path('sales/', views.sale_list, name='sale_list'),
     path('sales/add/', views.add_sale, name='add_sale'),
     path('sales/<int:pk>/', views.sale_detail, name='sale_detail'),
+    path('sales/<int:pk>/receipt/', views.sale_receipt, name='sale_receipt'),
     
     # Medicine Inventory management
     path('inventory/', views.medicine_inventory_list, name='medicine_inventory_list'),
@@ -43,9 +68,29 @@ urlpatterns = [
     path('sales/<int:pk>/edit/', views.edit_sale, name='edit_sale'),
     path('sales/<int:pk>/delete/', views.delete_sale, name='delete_sale'),
     path('sales/report/', views.sales_report, name='sales_report'),
+    path('sales/analytics/', views.sales_analytics, name='sales_analytics'),
+    path('sales/margins/', views.margin_report, name='margin_report'),
+    path('sales/receipts/', views.receipt_reprint, name='receipt_reprint'),
     
     # Medicine management
     path('medicines/low-stock/', views.low_stock_medicines, name='low_stock_medicines'),
     path('medicines/expired/', views.expired_medicines, name='expired_medicines'),
     path('medicines/expiring-soon/', views.expiring_soon_medicines, name='expiring_soon_medicines'),
+    path('medicines/expiry-risk/', views.expiry_risk_report, name='expiry_risk_report'),
+    path('medicines/replenishment/', views.replenishment_suggestions, name='replenishment_suggestions'),
+
+    # Background jobs
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/enqueue/', views.job_enqueue, name='job_enqueue'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+
+    # Offline branch sync
+    path('sync/sales/', views.sync_sales_ingest, name='sync_sales_ingest'),
+
+    # JSON API
+    path('api/<str:resource>/', api.collection, name='api_collection'),
+    path('api/<str:resource>/<int:pk>/', api.item, name='api_item'),
+
+    # Performance metrics
+    path('perf/', views.perf_summary, name='perf_summary'),
 ]
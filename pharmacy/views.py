@@ -1,15 +1,37 @@
+import heapq
+import hmac
+import zlib
+from decimal import InvalidOperation
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import F, Sum
-from django.http import HttpResponseForbidden
-from django.contrib.auth import logout
-from django.views.decorators.http import require_http_methods
-from datetime import timedelta
-from .models import Medicine, Sale, MedicineInventory, Role, PharmacyUser
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Abs, Coalesce
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.contrib.auth import login, logout
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from datetime import datetime, timedelta
+from .models import (
+    Medicine, Sale, MedicineInventory, Role, PharmacyUser, Job, Branch, BranchStock, StockTransfer, StockTake,
+    PriceUpdate, AuditEntry, CashierDailySales,
+)
+from . import (
+    analytics, archive, branches, conditional, expiry, jobs, perf, pricing, receipts, replenishment, shifts, stocktake,
+    sync,
+)
+from .maintenance import ensure_medicine_status
 from .forms import (
     MedicineForm, SaleForm, UserRegistrationForm, CustomAuthenticationForm,
-    MedicineInventoryForm, UserUpdateForm, RoleForm
+    MedicineInventoryForm, UserUpdateForm, RoleForm, BranchForm, StockTransferForm, StockTakeForm,
+    StockCountUploadForm, PriceUpdateForm, SalesAnalyticsForm, ShiftOpenForm, ShiftCloseForm, ReceiptForm,
+    ReceiptReprintForm, AuditLogForm
 )
 
 def is_admin(user):
@@ -38,9 +60,11 @@ def dashboard(request):
         messages.warning(request, "Your account does not have a role assigned. Please contact an administrator.")
         return redirect('logout')
 
+    ensure_medicine_status()
     total_medicines = Medicine.objects.count()
-    low_stock = Medicine.objects.filter(quantity__lte=F('displayed_quantity')).count()
-    total_sales = Sale.objects.aggregate(Sum('total_price'))['total_price__sum'] or 0
+    low_stock = Medicine.objects.filter(is_low_stock=True).count()
+    # From the cashier rollup, which archived sales are still counted in.
+    total_sales = branches.scoped(CashierDailySales.objects, request.user).aggregate(Sum('amount'))['amount__sum'] or 0
     
     context = {
         'total_medicines': total_medicines,
@@ -54,7 +78,7 @@ def user_list(request):
     if not request.user.role or request.user.role.name != 'admin':
         return HttpResponseForbidden("Access Denied")
     
-    users = PharmacyUser.objects.all().order_by('username')
+    users = PharmacyUser.objects.select_related('role').order_by('username')
     return render(request, 'pharmacy/user_list.html', {
         'users': users
     })
@@ -177,11 +201,12 @@ def medicine_list(request):
     if not request.user.role or request.user.role.name not in ['admin', 'pharmacist', 'inventory']:
         return HttpResponseForbidden("Access Denied")
         
+    ensure_medicine_status()
     medicines = Medicine.objects.all().order_by('code')
-    return render(request, 'pharmacy/medicine_list.html', {
+    return conditional.respond(request, lambda: render(request, 'pharmacy/medicine_list.html', {
         'medicines': medicines,
         'title': 'All Medicines'
-    })
+    }), conditional.list_etag(request, medicines))
 
 @login_required
 def add_medicine(request):
@@ -193,14 +218,7 @@ def add_medicine(request):
         if form.is_valid():
             medicine = form.save(commit=False)
             
-            # Generate the next code
-            last_medicine = Medicine.objects.order_by('-code').first()
-            if last_medicine:
-                last_num = int(last_medicine.code.split('-')[1])
-                medicine.code = f'HM-{str(last_num + 1).zfill(3)}'
-            else:
-                medicine.code = 'HM-001'
-                
+            medicine.code = Medicine.next_code()
             medicine.save()
             messages.success(request, 'Medicine added successfully!')
             return redirect('medicine_list')
@@ -217,7 +235,7 @@ def edit_medicine(request, pk):
     if not request.user.role or request.user.role.name not in ['admin', 'pharmacist']:
         return HttpResponseForbidden("Access Denied")
         
-    medicine = get_object_or_404(Medicine, pk=pk)
+    medicine = get_object_or_404(Medicine.objects, pk=pk)
     if request.method == 'POST':
         form = MedicineForm(request.POST, instance=medicine)
         if form.is_valid():
@@ -238,9 +256,9 @@ def delete_medicine(request, pk):
     if not request.user.role or request.user.role.name not in ['admin', 'pharmacist']:
         return HttpResponseForbidden("Access Denied")
     
-    medicine = get_object_or_404(Medicine, pk=pk)
+    medicine = get_object_or_404(Medicine.objects, pk=pk)
     if request.method == 'POST':
-        medicine.delete()
+        medicine.soft_delete()
         messages.success(request, 'Medicine deleted successfully!')
         return redirect('medicine_list')
     
@@ -248,14 +266,83 @@ def delete_medicine(request, pk):
         'medicine': medicine
     })
 
+@login_required
+def price_update(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'pharmacist']:
+        return HttpResponseForbidden("Access Denied")
+
+    if request.method == 'POST':
+        form = PriceUpdateForm(request.POST)
+        if form.is_valid():
+            changed = pricing.apply(form.save(commit=False), request.user)
+            messages.success(request, f'Selling prices changed for {changed} medicines.')
+            return redirect('price_update')
+    else:
+        # The rule arrives as GET parameters, so a preview can be linked to
+        # and downloaded before anything is changed.
+        form = PriceUpdateForm(request.GET or None)
+
+    context = {}
+    if request.method == 'GET' and form.is_bound and form.is_valid():
+        rule = form.save(commit=False)
+        context = {
+            'rule': rule,
+            'summary': pricing.summary(rule),
+            'changes': islice(pricing.preview(rule), settings.PRICE_PREVIEW_ROWS),
+            'query': request.GET.urlencode(),
+        }
+    return render(request, 'pharmacy/price_update.html', {
+        'form': form,
+        'updates': PriceUpdate.objects.select_related('created_by').order_by('-created_at')[:20],
+        'row_limit': settings.PRICE_PREVIEW_ROWS,
+        **context,
+    })
+
+@login_required
+def price_update_preview(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'pharmacist']:
+        return HttpResponseForbidden("Access Denied")
+
+    form = PriceUpdateForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Choose a markup and rounding to preview.')
+        return redirect('price_update')
+    # Streamed: the full diff can run to every medicine in the catalogue.
+    return StreamingHttpResponse(
+        pricing.preview_csv(form.save(commit=False)),
+        content_type='text/csv',
+        headers={'Content-Disposition': 'attachment; filename="price-preview.csv"'},
+    )
+
 @login_required
 def sale_list(request):
     if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
         return HttpResponseForbidden("Access Denied")
         
-    sales = Sale.objects.all().order_by('-created_at')
+    today = timezone.localdate()
+    starts = [
+        ('today', "Today's Sales", today),
+        ('yesterday', "Yesterday's Sales", today - timedelta(days=1)),
+        ('weekly', "This Week's Sales", today - timedelta(days=today.weekday())),
+        ('monthly', "This Month's Sales", today.replace(day=1)),
+    ]
+    # One query from the earliest start, split into the tabs here.
+    sales = list(branches.scoped(Sale.objects, request.user).filter(
+        created_at__gte=analytics.day_start(min(start for _, _, start in starts)),
+    ).select_related('medicine', 'created_by').order_by('-created_at'))
+    days = {sale.pk: timezone.localtime(sale.created_at).date() for sale in sales}
+    periods = []
+    for period, label, start in starts:
+        end = start if period == 'yesterday' else today
+        in_period = [sale for sale in sales if start <= days[sale.pk] <= end]
+        periods.append((period, label, in_period, {
+            'count': len(in_period),
+            'total_quantity': sum(sale.quantity for sale in in_period),
+            'total_amount': sum(sale.total_price for sale in in_period),
+        }))
     return render(request, 'pharmacy/sale_list.html', {
-        'sales': sales
+        'sales': sales,
+        'periods': periods,
     })
 
 @login_required
@@ -268,17 +355,15 @@ def add_sale(request):
         if form.is_valid():
             sale = form.save(commit=False)
             sale.created_by = request.user
+            sale.branch = request.user.branch
             
-            # Update medicine quantity
-            medicine = sale.medicine
-            if medicine.quantity >= sale.quantity:
-                medicine.quantity -= sale.quantity
-                medicine.save()
-                sale.save()
+            try:
+                branches.record_sale(sale)
+            except branches.InsufficientStock as error:
+                messages.error(request, str(error))
+            else:
                 messages.success(request, 'Sale recorded successfully!')
                 return redirect('sale_list')
-            else:
-                messages.error(request, 'Insufficient stock!')
     else:
         form = SaleForm()
     
@@ -292,17 +377,66 @@ def sale_detail(request, pk):
     if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
         return HttpResponseForbidden("Access Denied")
     
-    sale = get_object_or_404(Sale, pk=pk)
-    return render(request, 'pharmacy/sale_detail.html', {
-        'sale': sale
-    })
+    sales = branches.scoped(Sale.objects, request.user).filter(pk=pk)
+    etag, last_modified = conditional.detail_validators(
+        request, sales, 'updated_at', 'medicine__updated_at', 'created_by__updated_at',
+    )
+    return conditional.respond(request, lambda: render(request, 'pharmacy/sale_detail.html', {
+        'sale': get_object_or_404(sales)
+    }), etag, last_modified)
+
+@login_required
+def sale_receipt(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
+        return HttpResponseForbidden("Access Denied")
+
+    form = ReceiptForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    format = form.cleaned_data['format']
+    # The archive is only looked in for a sale no longer in Sale.
+    for sales in archive.both(lambda sales: branches.scoped(sales, request.user).filter(pk=pk)):
+        receipt = next(receipts.payloads(sales), None)
+        if receipt is not None:
+            break
+    else:
+        raise Http404('No such sale')
+    return HttpResponse(b''.join(receipts.render([receipt], format)), content_type=receipts.FORMATS[format][0])
+
+@login_required
+def receipt_reprint(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
+        return HttpResponseForbidden("Access Denied")
+
+    form = ReceiptReprintForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    params = form.cleaned_data
+    if params['shift']:
+        lookups, name = {'shift_id': params['shift']}, f"shift-{params['shift']}"
+    else:
+        lookups = {
+            'created_at__gte': analytics.day_start(params['start_date']),
+            'created_at__lt': analytics.day_start(params['end_date'] + timedelta(days=1)),
+        }
+        name = f"{params['start_date']}-{params['end_date']}"
+    sales = archive.both(
+        lambda sales: branches.scoped(sales, request.user).filter(**lookups).order_by('created_at', 'pk'),
+    )
+    content_type, extension = receipts.FORMATS[params['format']]
+    # Streamed: rendered a chunk of sales at a time, as one document.
+    return StreamingHttpResponse(
+        receipts.render(receipts.payloads(*sales), params['format']),
+        content_type=content_type,
+        headers={'Content-Disposition': f'attachment; filename="receipts-{name}.{extension}"'},
+    )
 
 @login_required
 def edit_sale(request, pk):
     if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
         return HttpResponseForbidden("Access Denied")
     
-    sale = get_object_or_404(Sale, pk=pk)
+    sale = get_object_or_404(branches.scoped(Sale.objects, request.user), pk=pk)
     if request.method == 'POST':
         form = SaleForm(request.POST, instance=sale)
         if form.is_valid():
@@ -322,14 +456,9 @@ def delete_sale(request, pk):
     if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
         return HttpResponseForbidden("Access Denied")
     
-    sale = get_object_or_404(Sale, pk=pk)
+    sale = get_object_or_404(branches.scoped(Sale.objects, request.user), pk=pk)
     if request.method == 'POST':
-        # Restore medicine quantity
-        medicine = sale.medicine
-        medicine.quantity += sale.quantity
-        medicine.save()
-        
-        sale.delete()
+        branches.cancel_sale(sale, request.user)
         messages.success(request, 'Sale deleted successfully!')
         return redirect('sale_list')
     
@@ -357,17 +486,18 @@ def sales_report(request):
     else:
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    # Get sales for date range
-    sales = Sale.objects.filter(
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-    ).order_by('-created_at')
+    # Get sales for date range, recent and archived, newest first
+    hot, archived = archive.both(lambda sales: branches.scoped(sales, request.user).filter(
+        created_at__gte=analytics.day_start(start_date),
+        created_at__lt=analytics.day_start(end_date + timedelta(days=1)),
+    ).select_related('medicine', 'created_by').order_by('-created_at'))
+    sales = list(heapq.merge(hot, archived, key=attrgetter('created_at'), reverse=True))
     
     # Calculate totals
-    total_sales = sales.aggregate(
-        total_quantity=Sum('quantity'),
-        total_amount=Sum('total_price')
-    )
+    total_sales = {
+        'total_quantity': sum(sale.quantity for sale in sales),
+        'total_amount': sum(sale.total_price for sale in sales),
+    }
     
     context = {
         'sales': sales,
@@ -378,43 +508,131 @@ def sales_report(request):
     }
     return render(request, 'pharmacy/sales_report.html', context)
 
+@login_required
+def sales_analytics(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    form = SalesAnalyticsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    params = form.cleaned_data
+    return JsonResponse(analytics.cube(
+        params['start_date'], params['end_date'], period=params['period'], group=params['group'],
+        # Branch staff only ever see their own branch.
+        branch=request.user.branch or params['branch'], order=params['order'], top=params['top'],
+    ), encoder=DjangoJSONEncoder)
+
+@login_required
+def margin_report(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    data = request.GET.copy()
+    if not data:
+        data.setlist('group', ['medicine'])
+    data.setdefault('order', 'margin')
+    form = SalesAnalyticsForm(data)
+    context = {'form': form}
+    if form.is_valid():
+        params = form.cleaned_data
+        context['row_limit'] = params['top'] or settings.MARGIN_REPORT_ROWS
+        context['report'] = analytics.cube(
+            params['start_date'], params['end_date'], period=params['period'], group=params['group'],
+            branch=request.user.branch or params['branch'], order=params['order'], top=context['row_limit'],
+        )
+    return render(request, 'pharmacy/margin_report.html', context)
+
 @login_required
 def low_stock_medicines(request):
     if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
         return HttpResponseForbidden("Access Denied")
     
-    medicines = Medicine.objects.filter(quantity__lte=F('displayed_quantity'))
-    context = {'medicines': medicines, 'title': 'Low Stock Medicines'}
-    return render(request, 'pharmacy/medicine_list.html', context)
+    ensure_medicine_status()
+    medicines = Medicine.objects.filter(is_low_stock=True).select_related('forecast')
+    context = {'medicines': medicines, 'title': 'Low Stock Medicines', 'show_forecast': True}
+    return conditional.respond(
+        request, lambda: render(request, 'pharmacy/medicine_list.html', context),
+        conditional.list_etag(request, medicines, 'forecast__generated_at'),
+    )
 
 @login_required
 def expired_medicines(request):
     if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
         return HttpResponseForbidden("Access Denied")
     
-    medicines = Medicine.objects.filter(expiry_date__lt=timezone.now().date())
+    ensure_medicine_status()
+    medicines = Medicine.objects.filter(is_expired=True)
     context = {'medicines': medicines, 'title': 'Expired Medicines'}
-    return render(request, 'pharmacy/medicine_list.html', context)
+    return conditional.respond(
+        request, lambda: render(request, 'pharmacy/medicine_list.html', context),
+        conditional.list_etag(request, medicines),
+    )
 
 @login_required
 def expiring_soon_medicines(request):
     if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
         return HttpResponseForbidden("Access Denied")
     
-    expiry_threshold = timezone.now().date() + timedelta(days=30)
-    medicines = Medicine.objects.filter(
-        expiry_date__gt=timezone.now().date(),
-        expiry_date__lte=expiry_threshold
+    ensure_medicine_status()
+    expiring = Medicine.objects.filter(is_expiring=True)
+
+    def render_page():
+        medicines = list(expiring.select_related('forecast'))
+        # Stock the forecast says will still be on the shelf when it expires.
+        for medicine in medicines:
+            if hasattr(medicine, 'forecast'):
+                expected = medicine.forecast.expected_until(medicine.expiry_date)
+                medicine.unsold_at_expiry = max(medicine.quantity - round(expected), 0)
+        context = {
+            'medicines': medicines, 'title': 'Medicines Expiring Soon',
+            'show_forecast': True, 'show_unsold': True,
+        }
+        return render(request, 'pharmacy/medicine_list.html', context)
+
+    return conditional.respond(
+        request, render_page, conditional.list_etag(request, expiring, 'forecast__generated_at'),
     )
-    context = {'medicines': medicines, 'title': 'Medicines Expiring Soon'}
-    return render(request, 'pharmacy/medicine_list.html', context)
+
+@login_required
+def expiry_risk_report(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    try:
+        horizon_days = int(request.GET.get('horizon', settings.EXPIRY_RISK_HORIZON_DAYS))
+        velocity_days = int(request.GET.get('velocity', settings.EXPIRY_VELOCITY_DAYS))
+    except ValueError:
+        horizon_days, velocity_days = settings.EXPIRY_RISK_HORIZON_DAYS, settings.EXPIRY_VELOCITY_DAYS
+    horizon_days, velocity_days = max(horizon_days, 1), max(velocity_days, 1)
+
+    rows, totals = expiry.expiry_risk(horizon_days=horizon_days, velocity_days=velocity_days)
+    return render(request, 'pharmacy/expiry_risk.html', {
+        'rows': rows,
+        'totals': totals,
+        'horizon_days': horizon_days,
+        'velocity_days': velocity_days,
+    })
+
+@login_required
+def replenishment_suggestions(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    suggestions = replenishment.suggestions()
+    return render(request, 'pharmacy/replenishment.html', {
+        'suggestions': suggestions,
+        'lead_time_days': settings.REPLENISHMENT_LEAD_TIME_DAYS,
+        'review_days': settings.REPLENISHMENT_REVIEW_DAYS,
+        'velocity_days': settings.REPLENISHMENT_VELOCITY_DAYS,
+    })
 
 @login_required
 def medicine_inventory_list(request):
     if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
         return HttpResponseForbidden("Access Denied")
     
-    inventories = MedicineInventory.objects.all().order_by('-created_at')
+    inventories = branches.scoped(MedicineInventory.objects, request.user).order_by('-created_at')
     return render(request, 'pharmacy/medicine_inventory_list.html', {
         'inventories': inventories
     })
@@ -426,14 +644,20 @@ def add_medicine_inventory(request):
     
     if request.method == 'POST':
         form = MedicineInventoryForm(request.POST)
+        if request.user.branch_id:
+            del form.fields['branch']
         if form.is_valid():
             inventory = form.save(commit=False)
             inventory.created_by = request.user
+            if request.user.branch_id:
+                inventory.branch = request.user.branch
             inventory.save()
             messages.success(request, 'Inventory record added successfully!')
             return redirect('medicine_inventory_list')
     else:
         form = MedicineInventoryForm()
+        if request.user.branch_id:
+            del form.fields['branch']
     
     return render(request, 'pharmacy/medicine_inventory_form.html', {
         'form': form,
@@ -445,10 +669,13 @@ def medicine_inventory_detail(request, pk):
     if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
         return HttpResponseForbidden("Access Denied")
     
-    inventory = get_object_or_404(MedicineInventory, pk=pk)
-    return render(request, 'pharmacy/medicine_inventory_detail.html', {
-        'inventory': inventory
-    })
+    inventories = branches.scoped(MedicineInventory.objects, request.user).filter(pk=pk)
+    etag, last_modified = conditional.detail_validators(
+        request, inventories, 'updated_at', 'medicine__updated_at', 'created_by__updated_at',
+    )
+    return conditional.respond(request, lambda: render(request, 'pharmacy/medicine_inventory_detail.html', {
+        'inventory': get_object_or_404(inventories)
+    }), etag, last_modified)
 
 @login_required
 def role_update(request, pk):
@@ -469,3 +696,370 @@ def role_update(request, pk):
         'form': form,
         'title': 'Update Role'
     })
+
+@login_required
+def branch_list(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    all_branches = Branch.objects.all().order_by('name')
+    return render(request, 'pharmacy/branch_list.html', {
+        'branches': all_branches
+    })
+
+@login_required
+def branch_create(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    if request.method == 'POST':
+        form = BranchForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Branch created successfully!')
+            return redirect('branch_list')
+    else:
+        form = BranchForm()
+
+    return render(request, 'pharmacy/branch_form.html', {
+        'form': form,
+        'title': 'Create Branch'
+    })
+
+@login_required
+def branch_update(request, pk):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    branch = get_object_or_404(Branch, pk=pk)
+    if request.method == 'POST':
+        form = BranchForm(request.POST, instance=branch)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Branch updated successfully!')
+            return redirect('branch_list')
+    else:
+        form = BranchForm(instance=branch)
+
+    return render(request, 'pharmacy/branch_form.html', {
+        'form': form,
+        'title': 'Update Branch'
+    })
+
+@login_required
+def branch_stock(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'pharmacist', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    # Branch staff see their own branch; head office picks one.
+    branch = request.user.branch
+    all_branches = None
+    if branch is None:
+        all_branches = Branch.objects.order_by('name')
+        branch_id = request.GET.get('branch', '')
+        if branch_id and not branch_id.isdigit():
+            raise Http404('No such branch')
+        branch = get_object_or_404(Branch, pk=branch_id) if branch_id else all_branches.first()
+
+    stock = []
+    if branch is not None:
+        # A branch holds tens of thousands of rows; plain dicts build far
+        # faster than model instances for a read-only table.
+        stock = BranchStock.objects.filter(branch=branch).values(
+            'quantity', 'medicine__code', 'medicine__item_description', 'medicine__quantity',
+            'medicine__displayed_quantity', 'medicine__expiry_date', 'medicine__is_expired',
+        ).order_by('medicine__code')
+    return render(request, 'pharmacy/branch_stock.html', {
+        'branch': branch,
+        'branches': all_branches,
+        'stock': stock,
+    })
+
+@login_required
+def stock_transfer(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    if request.method == 'POST':
+        form = StockTransferForm(request.POST, branch=request.user.branch)
+        if form.is_valid():
+            try:
+                branches.transfer(
+                    form.cleaned_data['medicine'], form.cleaned_data['from_branch'],
+                    form.cleaned_data['to_branch'], form.cleaned_data['quantity'], user=request.user,
+                )
+            except branches.InsufficientStock as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, 'Stock transferred successfully!')
+                return redirect('stock_transfer')
+    else:
+        form = StockTransferForm(branch=request.user.branch)
+
+    transfers = StockTransfer.objects.select_related('medicine', 'from_branch', 'to_branch', 'created_by')
+    if request.user.branch_id:
+        transfers = transfers.filter(
+            Q(from_branch_id=request.user.branch_id) | Q(to_branch_id=request.user.branch_id)
+        )
+    return render(request, 'pharmacy/stock_transfer.html', {
+        'form': form,
+        'transfers': transfers.order_by('-created_at')[:50],
+    })
+
+@login_required
+def stock_take_list(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    if request.method == 'POST':
+        form = StockTakeForm(request.POST)
+        if request.user.branch_id:
+            del form.fields['branch']
+        if form.is_valid():
+            stock_take = form.save(commit=False)
+            stock_take.created_by = request.user
+            if request.user.branch_id:
+                stock_take.branch = request.user.branch
+            stock_take.save()
+            messages.success(request, 'Stock take started. Upload or scan the counts.')
+            return redirect('stock_take_detail', pk=stock_take.pk)
+    else:
+        form = StockTakeForm()
+        if request.user.branch_id:
+            del form.fields['branch']
+
+    stock_takes = branches.scoped(StockTake.objects, request.user).select_related('branch', 'created_by')
+    return render(request, 'pharmacy/stock_take_list.html', {
+        'form': form,
+        'stock_takes': stock_takes.annotate(lines=Count('counts')).order_by('-created_at')[:50],
+    })
+
+@login_required
+def stock_take_detail(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    stock_take = get_object_or_404(branches.scoped(StockTake.objects, request.user), pk=pk)
+    if stock_take.status == StockTake.POSTED:
+        # Stock has moved on since; show what was posted.
+        adjustments = stock_take.adjustments.annotate(abs_quantity=Abs('quantity'))
+        context = {
+            'summary': {
+                'lines': stock_take.counts.count(),
+                **adjustments.aggregate(
+                    differing=Count('pk'), units=Coalesce(Sum('quantity'), 0),
+                    value=Coalesce(Sum(F('quantity') * F('medicine__unit_price')), 0,
+                                   output_field=Medicine.unit_price.field),
+                ),
+            },
+            'variances': adjustments.order_by('-abs_quantity', 'medicine__code').values(
+                'medicine__code', 'medicine__item_description',
+                expected=F('quantity_before'), counted=F('quantity_after'), variance=F('quantity'),
+            )[:settings.STOCK_TAKE_VARIANCE_ROWS],
+        }
+    else:
+        context = {
+            'summary': stocktake.summary(stock_take),
+            'variances': stocktake.largest_variances(stock_take, settings.STOCK_TAKE_VARIANCE_ROWS),
+        }
+    return render(request, 'pharmacy/stock_take_detail.html', {
+        'stock_take': stock_take,
+        'form': StockCountUploadForm(),
+        'row_limit': settings.STOCK_TAKE_VARIANCE_ROWS,
+        **context,
+    })
+
+@login_required
+@require_POST
+def stock_take_upload(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    stock_take = get_object_or_404(branches.scoped(StockTake.objects, request.user), pk=pk)
+    form = StockCountUploadForm(request.POST, request.FILES)
+    if not form.is_valid():
+        for error in form.non_field_errors():
+            messages.error(request, error)
+        return redirect('stock_take_detail', pk=pk)
+    try:
+        counts, errors = stocktake.parse_counts(form.count_lines())
+        unknown = stocktake.record_counts(stock_take, counts, replace=form.cleaned_data['replace'])
+    except UnicodeDecodeError:
+        messages.error(request, 'The file is not UTF-8 text.')
+    except stocktake.StockTakeClosed as error:
+        messages.error(request, str(error))
+    else:
+        messages.success(request, f'Recorded counts for {len(counts) - len(unknown)} items.')
+        if unknown:
+            messages.warning(request, f"Unknown codes skipped: {', '.join(unknown[:20])}"
+                                      f"{f' and {len(unknown) - 20} more' if len(unknown) > 20 else ''}")
+        for error in errors[:20]:
+            messages.warning(request, error)
+    return redirect('stock_take_detail', pk=pk)
+
+@login_required
+@require_POST
+def stock_take_post(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    stock_take = get_object_or_404(branches.scoped(StockTake.objects, request.user), pk=pk)
+    try:
+        adjusted = stocktake.post(stock_take, request.user)
+    except stocktake.StockTakeClosed as error:
+        messages.error(request, str(error))
+    else:
+        messages.success(request, f'Stock take posted: {adjusted} items adjusted.')
+    return redirect('stock_take_detail', pk=pk)
+
+@login_required
+@require_POST
+def stock_take_cancel(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'inventory']:
+        return HttpResponseForbidden("Access Denied")
+
+    stock_take = get_object_or_404(branches.scoped(StockTake.objects, request.user), pk=pk)
+    if StockTake.objects.filter(pk=pk, status=StockTake.OPEN).update(status=StockTake.CANCELLED):
+        messages.success(request, 'Stock take cancelled; stock was not changed.')
+    else:
+        messages.error(request, f'{stock_take} is no longer open')
+    return redirect('stock_take_list')
+
+@login_required
+def shift_list(request):
+    if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
+        return HttpResponseForbidden("Access Denied")
+
+    current = shifts.current(request.user)
+    form = ShiftOpenForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        try:
+            shift = shifts.open_shift(request.user, form.cleaned_data['opening_cash'])
+        except shifts.ShiftError as error:
+            messages.error(request, str(error))
+        else:
+            messages.success(request, 'Shift opened. Sales you record are added to its Z-report.')
+            return redirect('shift_detail', pk=shift.pk)
+
+    return render(request, 'pharmacy/shift_list.html', {
+        'form': form,
+        'current': current,
+        'shifts': shifts.visible(request.user).select_related('cashier', 'branch').order_by('-opened_at')[:50],
+    })
+
+@login_required
+def shift_detail(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
+        return HttpResponseForbidden("Access Denied")
+
+    # The Z-report as recorded; nothing here sums Sale.
+    shift = get_object_or_404(shifts.visible(request.user).select_related('cashier', 'branch', 'closed_by'), pk=pk)
+    return render(request, 'pharmacy/shift_detail.html', {
+        'shift': shift,
+        'lines': shift.lines.select_related('medicine').order_by('medicine__code'),
+        'form': None if shift.closed_at else ShiftCloseForm(),
+    })
+
+@login_required
+@require_POST
+def shift_close(request, pk):
+    if not request.user.role or request.user.role.name not in ['admin', 'cashier']:
+        return HttpResponseForbidden("Access Denied")
+
+    shift = get_object_or_404(shifts.visible(request.user), pk=pk)
+    form = ShiftCloseForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, 'Enter the cash counted in the drawer.')
+        return redirect('shift_detail', pk=pk)
+    try:
+        shifts.close(shift, form.cleaned_data['counted_cash'], request.user)
+    except shifts.ShiftError as error:
+        messages.error(request, str(error))
+    else:
+        messages.success(request, f'Shift closed. Drawer difference: ETB {shift.cash_difference:.2f}.')
+    return redirect('shift_detail', pk=pk)
+
+@login_required
+def audit_log(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    form = AuditLogForm(request.GET)
+    entries = AuditEntry.objects.all()
+    if form.is_valid():
+        filters = {name: value for name, value in form.cleaned_data.items() if value}
+        entries = entries.filter(**filters)
+    return render(request, 'pharmacy/audit_log.html', {
+        'form': form,
+        'entries': entries.order_by('-created_at', '-pk')[:settings.AUDIT_LOG_ROWS],
+        'row_limit': settings.AUDIT_LOG_ROWS,
+    })
+
+@login_required
+def perf_summary(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    # Request timings recorded by RequestMetricsMiddleware in this process.
+    return JsonResponse({'urls': perf.summarize(perf.recent())})
+
+@login_required
+def job_list(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    recent_jobs = Job.objects.select_related('created_by').order_by('-created_at')[:50]
+    return render(request, 'pharmacy/job_list.html', {
+        'jobs': recent_jobs,
+        'task_names': sorted(settings.JOB_TASKS),
+    })
+
+@login_required
+@require_POST
+def job_enqueue(request):
+    if not request.user.role or request.user.role.name != 'admin':
+        return HttpResponseForbidden("Access Denied")
+
+    name = request.POST.get('name')
+    if name not in settings.JOB_TASKS:
+        messages.error(request, f'Unknown job: {name}')
+    else:
+        job = jobs.enqueue(name, user=request.user)
+        messages.success(request, f'Job {job.name} #{job.pk} queued.')
+    return redirect('job_list')
+
+@login_required
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    is_admin = request.user.role and request.user.role.name == 'admin'
+    if not is_admin and job.created_by_id != request.user.pk:
+        return HttpResponseForbidden("Access Denied")
+
+    return JsonResponse({
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.progress_message,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    })
+
+@csrf_exempt
+@require_POST
+def sync_sales_ingest(request):
+    # Called by branch instances, not browsers: a shared token instead of a
+    # session and CSRF cookie.
+    token = request.headers.get('Authorization', '').removeprefix('Token ')
+    if not settings.SYNC_TOKEN or not hmac.compare_digest(token, settings.SYNC_TOKEN):
+        return HttpResponseForbidden("Access Denied")
+    try:
+        data = sync.decode(request)
+        result = sync.ingest(data['branch'], data['sales'])
+    except (sync.SyncError, KeyError, TypeError, ValueError, InvalidOperation, zlib.error) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse(result)
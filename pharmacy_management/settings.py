@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
+from decouple import Csv, config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -23,9 +26,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-8*_%d_f^#x(_uy&ui+lwo(wm*569ezvfx-fcs2f!8f40@+$zz2'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config('DJANGO_DEBUG', default=True, cast=bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = config('DJANGO_ALLOWED_HOSTS', default='localhost,127.0.0.1', cast=Csv())
 
 
 # Application definition
@@ -36,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'pharmacy',
     'crispy_forms',
@@ -44,10 +48,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'pharmacy.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pharmacy.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,10 +86,38 @@ WSGI_APPLICATION = 'pharmacy_management.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': config('PHARMACY_DB_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+    }
+}
+
+# Write-ahead logging lets the job workers and the scheduler write while
+# pages are being read; it adds -wal and -shm files next to the database.
+SQLITE_WAL = config('PHARMACY_SQLITE_WAL', default=True, cast=bool)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pharmacy',
     }
 }
 
+# Session storage profile:
+#   db             - Django's default; a SELECT on every authenticated request
+#                    against the same SQLite file sales are written to.
+#   cached_db      - reads come from the cache, the database is only touched
+#                    on login/logout or when the session changes. LocMemCache
+#                    is per process, so with `serve --processes N` a logout is
+#                    only seen by the worker that handled it until the cached
+#                    copy expires; use db or a shared cache there.
+#   signed_cookies - no server-side state at all; sessions cannot be revoked
+#                    before SESSION_COOKIE_AGE and the payload must stay small.
+SESSION_PROFILE = config('PHARMACY_SESSION_PROFILE', default='cached_db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_PROFILE]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -122,6 +157,30 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Vendored assets are served by WhiteNoise straight from STATIC_ROOT. Run
+# `manage.py collectstatic` after changing anything under static/: it writes
+# content-hashed copies (cached by browsers for a year, marked immutable) plus
+# pre-built .gz and .br variants so nothing is compressed per request.
+#
+# The manifest storage cannot build any URL until collectstatic has written
+# its manifest, so on a fresh checkout, with DEBUG on and under `manage.py
+# test` the plain storage is used instead and WhiteNoise serves the files
+# unhashed from the app static directories.
+STATIC_MANIFEST = not DEBUG and sys.argv[1:2] != ['test'] and (STATIC_ROOT / 'staticfiles.json').exists()
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+WHITENOISE_USE_FINDERS = not STATIC_MANIFEST
+# A file added since the last collectstatic is missing from the manifest;
+# it gets its unhashed URL rather than an error.
+WHITENOISE_MANIFEST_STRICT = False
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -137,6 +196,171 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Embedded WSGI server used by `manage.py serve` and the desktop launcher
+SERVER_HOST = config('PHARMACY_HOST', default='127.0.0.1')
+SERVER_PORT = config('PHARMACY_PORT', default=8000, cast=int)
+SERVER_THREADS = config('PHARMACY_THREADS', default=8, cast=int)
+SERVER_PROCESSES = config('PHARMACY_PROCESSES', default=1, cast=int)
+SERVER_CONNECTION_LIMIT = config('PHARMACY_CONNECTION_LIMIT', default=100, cast=int)
+SERVER_BACKLOG = config('PHARMACY_BACKLOG', default=1024, cast=int)
+SERVER_KEEP_ALIVE = config('PHARMACY_KEEP_ALIVE', default=120, cast=int)
+SERVER_SHUTDOWN_TIMEOUT = config('PHARMACY_SHUTDOWN_TIMEOUT', default=30, cast=int)
+
+# Per-request query/timing instrumentation (pharmacy.middleware). Off by
+# default; when off the middleware removes itself at startup.
+PERF_METRICS = config('PHARMACY_PERF_METRICS', default=False, cast=bool)
+PERF_LOG_FILE = config('PHARMACY_PERF_LOG', default=str(BASE_DIR / 'perf.log'))
+# The same SQL statement this many times in one request is reported as a
+# likely N+1 pattern.
+PERF_DUPLICATE_THRESHOLD = 3
+
+# Replenishment suggestions (pharmacy.replenishment). Demand is averaged over
+# the last VELOCITY_DAYS of the daily sales rollup; SERVICE_LEVEL_Z is the
+# normal quantile for the chance of not running out during the lead time
+# (1.65 is about 95%).
+REPLENISHMENT_VELOCITY_DAYS = config('PHARMACY_VELOCITY_DAYS', default=90, cast=int)
+REPLENISHMENT_LEAD_TIME_DAYS = config('PHARMACY_LEAD_TIME_DAYS', default=7, cast=int)
+REPLENISHMENT_REVIEW_DAYS = config('PHARMACY_REVIEW_DAYS', default=14, cast=int)
+REPLENISHMENT_SERVICE_LEVEL_Z = config('PHARMACY_SERVICE_LEVEL_Z', default=1.65, cast=float)
+
+# Demand forecasts (pharmacy.forecasting, `manage.py forecast_demand`).
+FORECAST_HISTORY_DAYS = config('PHARMACY_FORECAST_HISTORY_DAYS', default=365, cast=int)
+FORECAST_WINDOW_DAYS = config('PHARMACY_FORECAST_WINDOW_DAYS', default=28, cast=int)
+FORECAST_ALPHA = config('PHARMACY_FORECAST_ALPHA', default=0.1, cast=float)
+FORECAST_HORIZON_DAYS = config('PHARMACY_FORECAST_HORIZON_DAYS', default=30, cast=int)
+
+# Expiry windows: the "expiring soon" list, and the expiry-risk report
+# (pharmacy.expiry), which scores stock expiring within the horizon
+# against the sales rate over the last EXPIRY_VELOCITY_DAYS.
+EXPIRING_SOON_DAYS = config('PHARMACY_EXPIRING_SOON_DAYS', default=30, cast=int)
+EXPIRY_RISK_HORIZON_DAYS = config('PHARMACY_EXPIRY_RISK_HORIZON_DAYS', default=180, cast=int)
+EXPIRY_VELOCITY_DAYS = config('PHARMACY_EXPIRY_VELOCITY_DAYS', default=30, cast=int)
+
+# Background jobs (pharmacy.jobs, `manage.py run_workers`). JOB_TASKS maps the
+# names jobs are enqueued under to the functions that run them. A failed job
+# is retried after JOB_RETRY_DELAY seconds, doubling on each attempt. While a
+# job runs, a thread refreshes its heartbeat every JOB_HEARTBEAT_INTERVAL
+# seconds; a running job with no heartbeat for JOB_STALE_AFTER seconds is
+# taken to have lost its worker and is requeued.
+JOB_TASKS = {
+    'forecast_demand': 'pharmacy.tasks.forecast_demand',
+    'rebuild_sales_rollup': 'pharmacy.tasks.rebuild_sales_rollup',
+    'purge_sessions': 'pharmacy.tasks.purge_sessions',
+    'optimize_database': 'pharmacy.tasks.optimize_database',
+    'refresh_medicine_status': 'pharmacy.tasks.refresh_medicine_status',
+    'sync_sales': 'pharmacy.tasks.sync_sales',
+    'archive_sales': 'pharmacy.tasks.archive_sales',
+}
+JOB_WORKERS = config('PHARMACY_JOB_WORKERS', default=2, cast=int)
+JOB_POLL_INTERVAL = config('PHARMACY_JOB_POLL_INTERVAL', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 30
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_STALE_AFTER = 600
+
+# Nightly maintenance run by `manage.py run_scheduler`. Each entry names a
+# JOB_TASKS task, a five-field cron spec in TIME_ZONE and optional kwargs.
+SCHEDULE = {
+    'medicine-status': {'cron': '1 0 * * *', 'task': 'refresh_medicine_status'},
+    'purge-sessions': {'cron': '15 2 * * *', 'task': 'purge_sessions'},
+    'refresh-rollup': {'cron': '30 2 * * *', 'task': 'rebuild_sales_rollup', 'kwargs': {'days': 3}},
+    'forecast-demand': {'cron': '45 2 * * *', 'task': 'forecast_demand'},
+    # Before the weekly VACUUM, which then gives back the space.
+    'archive-sales': {'cron': '50 2 * * 0', 'task': 'archive_sales'},
+    'optimize-database': {'cron': '0 3 * * 1-6', 'task': 'optimize_database'},
+    'vacuum-database': {'cron': '0 3 * * 0', 'task': 'optimize_database', 'kwargs': {'vacuum': True}},
+}
+
+# Offline branch sync (pharmacy.sync). On a branch instance set SYNC_URL to
+# the central server's /sync/sales/ endpoint and SYNC_BRANCH to this branch's
+# code there; sales are queued locally and pushed by `manage.py sync_sales`,
+# which the scheduler runs every few minutes. On the central server set only
+# SYNC_TOKEN (the same value as the branches) to accept their batches.
+SYNC_URL = config('PHARMACY_SYNC_URL', default='')
+SYNC_TOKEN = config('PHARMACY_SYNC_TOKEN', default='')
+SYNC_BRANCH = config('PHARMACY_SYNC_BRANCH', default='')
+SYNC_BATCH_SIZE = config('PHARMACY_SYNC_BATCH_SIZE', default=1000, cast=int)
+SYNC_TIMEOUT = config('PHARMACY_SYNC_TIMEOUT', default=30, cast=int)
+if SYNC_URL:
+    SCHEDULE['sync-sales'] = {'cron': '*/5 * * * *', 'task': 'sync_sales'}
+
+# Variance rows shown on a stock take page, largest first; the totals
+# always cover every line.
+STOCK_TAKE_VARIANCE_ROWS = config('PHARMACY_STOCK_TAKE_VARIANCE_ROWS', default=500, cast=int)
+
+# Changes listed on the price update preview page; the CSV download
+# streams all of them.
+PRICE_PREVIEW_ROWS = config('PHARMACY_PRICE_PREVIEW_ROWS', default=200, cast=int)
+
+# Sales analytics (pharmacy.analytics): how long an answer is reused for
+# the same parameters, and the most grouped rows returned without ?top=.
+ANALYTICS_CACHE_SECONDS = config('PHARMACY_ANALYTICS_CACHE_SECONDS', default=300, cast=int)
+ANALYTICS_MAX_ROWS = config('PHARMACY_ANALYTICS_MAX_ROWS', default=10000, cast=int)
+
+# Rows on the margin report page, largest first.
+MARGIN_REPORT_ROWS = config('PHARMACY_MARGIN_REPORT_ROWS', default=200, cast=int)
+
+# JSON API (pharmacy.api): rows per page when ?limit= is not given, and the
+# most a client may ask for.
+API_PAGE_SIZE = config('PHARMACY_API_PAGE_SIZE', default=100, cast=int)
+API_MAX_PAGE_SIZE = config('PHARMACY_API_MAX_PAGE_SIZE', default=10000, cast=int)
+
+# Printed receipts (pharmacy.receipts): characters per line, 42 for an 80mm
+# roll or 32 for 58mm, and the lines above and below each sale, separated
+# by '|'.
+RECEIPT_WIDTH = config('PHARMACY_RECEIPT_WIDTH', default=42, cast=int)
+RECEIPT_HEADER = config('PHARMACY_RECEIPT_HEADER', default='Pharmacy', cast=Csv(delimiter='|'))
+RECEIPT_FOOTER = config('PHARMACY_RECEIPT_FOOTER', default='Thank you', cast=Csv(delimiter='|'))
+
+# Sale archive (pharmacy.archive): sales older than ARCHIVE_AFTER_DAYS are
+# moved out of the Sale table, ARCHIVE_CHUNK_SIZE per transaction, by
+# `manage.py archive_sales`, which the scheduler runs weekly.
+ARCHIVE_AFTER_DAYS = config('PHARMACY_ARCHIVE_AFTER_DAYS', default=730, cast=int)
+ARCHIVE_CHUNK_SIZE = config('PHARMACY_ARCHIVE_CHUNK_SIZE', default=2000, cast=int)
+
+# Audit trail of user, role, price and stock changes (pharmacy.audit),
+# written by a background thread every AUDIT_FLUSH_INTERVAL seconds or once
+# AUDIT_BATCH_SIZE changes are waiting. 0 means no thread: a full batch is
+# written by the commit that fills it and the rest at exit.
+AUDIT_ENABLED = config('PHARMACY_AUDIT_ENABLED', default=True, cast=bool)
+AUDIT_FLUSH_INTERVAL = config('PHARMACY_AUDIT_FLUSH_INTERVAL', default=1.0, cast=float)
+AUDIT_BATCH_SIZE = config('PHARMACY_AUDIT_BATCH_SIZE', default=500, cast=int)
+# Entries shown on the audit log page, newest first.
+AUDIT_LOG_ROWS = config('PHARMACY_AUDIT_LOG_ROWS', default=200, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'perf_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': PERF_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 3,
+            'delay': True,
+            'formatter': 'message',
+        },
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'pharmacy.perf': {
+            'handlers': ['perf_file'] if PERF_METRICS else [],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'pharmacy.scheduler': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 